@@ -1,18 +1,32 @@
 import os
+import time
 import pandas as pd
 import plotly.express as px
 import streamlit as st
 from datetime import date
-import plotly.graph_objects as go
 
 from modules import vanda_xasset_api as xa
 from modules import vanda_track_api as vt
+from modules import dashboards, freshness, http_client, rate_limit, series_cache, sharding, tracing
 from modules.data_explorer import unified_search
-from modules.chart_config import add_item, remove_item, clear_items, get_items
-from modules.utils import outer_merge_on_date
+from modules import catalog, expressions
+from modules.chart_config import (add_item, remove_item, clear_items, get_items, get_cached_series,
+                                  cache_series, prune_series_cache, get_aligned, set_aligned, clear_data_cache,
+                                  get_derived, add_derived, remove_derived, item_key)
+from modules.utils import is_mock, outer_merge_on_date, zscore_normalize
+from modules.fetch import fetch_items, MAX_WORKERS, DEADLINE_S
+from modules.figure import build_figure, DEFAULT_COLORS, LOD_POINTS, WEBGL_THRESHOLD
 
 st.set_page_config(page_title="Vanda Chart Studio (v6+)", layout="wide")
 
+# Spans recorded during this rerun (API calls, parsing, merge, figure build, serialization)
+trace = tracing.start("rerun")
+
+# Search index is process-wide: built on the first run, reused by every session/rerun
+catalog.get_index()
+# Background pre-warming of the most used series shortly after their publication times
+prefetcher = freshness.start_prefetcher()
+
 # ---------- Sidebar: API Keys ----------
 with st.sidebar:
     st.title("Vanda Chart Studio")
@@ -40,6 +54,83 @@ with st.sidebar:
         if "VANDATRACK_API_KEY" in st.session_state:
             vt.set_key(st.session_state["VANDATRACK_API_KEY"])
 
+    with st.expander("⚙️ Performance", expanded=False):
+        st.number_input("Max concurrent fetches", min_value=1, max_value=32,
+                        value=MAX_WORKERS, step=1, key="fetch_workers")
+        st.number_input("Render deadline (seconds)", min_value=5, max_value=600,
+                        value=int(DEADLINE_S), step=5, key="fetch_deadline")
+        st.checkbox("Stream VandaTrack retail pulls page by page (large histories)",
+                    value=False, key="stream_pages")
+        # Sharding is process-wide (shared caches, shared shard pool): set with VANDA_SHARD at deployment
+        st.caption(f"Date-range sharding of long histories: {sharding.SHARD_UNIT.title() or 'Off'}")
+        # Pool size is shared by every session: set with VANDA_HTTP_POOL_SIZE at deployment
+        hs = http_client.stats()
+        st.caption(
+            f"HTTP (pool of {http_client.POOL_SIZE}): {hs['requests']} requests · {hs['retries']} retries · "
+            f"{hs['connections_reused']} reused / {hs['connections_opened']} opened connections"
+        )
+        ms = series_cache.stats()
+        st.caption(
+            f"Shared series cache: {ms['entries']} series · {ms['bytes'] / 2**20:,.1f} / "
+            f"{ms['max_bytes'] / 2**20:,.0f} MB · {ms['hits']} hits · {ms['misses']} misses · "
+            f"{ms['coalesced']} coalesced · {ms['evictions']} evicted"
+        )
+        rl = rate_limit.totals()
+        if rl["enabled"]:
+            st.caption(
+                f"Rate limit: {rl['granted']} sent · {rl['throttled']} throttled "
+                f"({rl['wait_s']:,.1f}s waiting) · {rl['rejected']} rejected · "
+                f"{rl['queued']} queued · {rl['upstream_429']} upstream 429s"
+            )
+        if prefetcher is not None:
+            ps = prefetcher.stats()
+            st.caption(f"Prefetch: {ps['tracked']} tracked items · {ps['warmed']} pre-warmed · {ps['failed']} failed")
+
+    with st.expander("💾 Dashboards", expanded=False):
+        dash_name = st.text_input("Dashboard name", key="dash_name")
+        with_snapshot = st.checkbox("Include data snapshot (opens without network)", value=True)
+        if st.button("Save dashboard", disabled=not dash_name.strip()):
+            snap_df = st.session_state.get("last_merged") if with_snapshot else None
+            dashboards.save_dashboard(dash_name, list(get_items()),
+                                      dict(st.session_state.get("chart_settings", {})), snap_df,
+                                      derived=list(get_derived()))
+            st.success(f"Saved “{dash_name}”" + (" with data snapshot." if snap_df is not None else "."))
+
+        saved = dashboards.list_dashboards()
+        if saved:
+            pick = st.selectbox("Saved dashboards", saved)
+            d1, d2, d3 = st.columns(3)
+            if d1.button("Load"):
+                dash = dashboards.load_dashboard(pick)
+                if dash is not None:
+                    st.session_state["chart_items"] = dash["items"]
+                    st.session_state["chart_settings"] = dash["settings"]
+                    st.session_state["derived_series"] = dash.get("derived", [])
+                    # Drop per-series widget state so the loaded styles take effect
+                    for k in [k for k in st.session_state if str(k).startswith(("chart_type_", "chart_axis_", "chart_color_"))]:
+                        del st.session_state[k]
+                    if dash["data"] is not None:
+                        st.session_state["snapshot"] = {"name": pick, "at": dash["snapshot_at"], "data": dash["data"]}
+                        st.session_state["last_merged"] = dash["data"]
+                    else:
+                        st.session_state.pop("snapshot", None)
+            if d2.button("Refresh"):
+                dashboards.refresh_in_background(pick)
+            if d3.button("Delete"):
+                dashboards.delete_dashboard(pick)
+                st.rerun()
+            status = dashboards.refresh_status(pick)
+            if status == "running":
+                st.caption("Refreshing in background…")
+            elif status:
+                st.caption(f"Last background refresh: {status}")
+                snap = st.session_state.get("snapshot")
+                if status == "done" and snap and snap["name"] == pick:
+                    dash = dashboards.load_dashboard(pick)
+                    if dash and dash["data"] is not None and dash["snapshot_at"] != snap["at"]:
+                        st.session_state["snapshot"] = {"name": pick, "at": dash["snapshot_at"], "data": dash["data"]}
+                        st.session_state["last_merged"] = dash["data"]
+
 st.title("📊 Vanda Chart Studio — v6+")
 st.write("VandaXAsset advanced options + VandaTrack overlays, with mixed chart types, dual axes, and per-series colors.")
 
@@ -55,12 +146,14 @@ with c2:
 source_sel = "All"
 if do_search and kw.strip():
     with st.spinner("Searching catalogs…"):
-        res = unified_search(kw.strip(), source=source_sel)
+        with tracing.span("search", query=kw.strip()) as sp:
+            res = unified_search(kw.strip(), source=source_sel)
+            sp["rows"] = 0 if res is None else len(res)
     if res is None or res.empty:
         st.warning("No results. Try another term or change source.")
     else:
-        st.caption("Results (click a row, then choose how to add):")
-        st.dataframe(res.head(200), use_container_width=True)
+        st.caption(f"Top {len(res)} results, best match first (click a row, then choose how to add):")
+        st.dataframe(res, use_container_width=True)
         st.markdown("**Add selection to chart**")
         series_id = st.text_input(
             "Series ID (from results)",
@@ -127,10 +220,70 @@ if do_search and kw.strip():
                 })
                 st.success(f"Added: {label}")
 
+# ---------- Browse Catalog by Facet ----------
+FACET_LABELS = {
+    "asset_type": "Asset type", "asset_subtype": "Asset subtype", "geography": "Geography",
+    "region": "Region", "dm_em": "DM / EM", "investor_type": "Investor type", "model_id": "Model",
+}
+
+
+def _use_in_quick_add(series_id: str):
+    st.session_state["series_id_quick"] = series_id
+    st.session_state["source_quick"] = "VandaXAsset"
+
+
+with st.expander("🧭 Browse catalog by facet"):
+    cat_index = catalog.get_index()
+    facets = cat_index.facets
+    narrow = st.text_input("Narrow by keyword (optional)", key="facet_kw")
+    # Selections from the previous run drive every count; widgets below only display them
+    facet_filters = {c: st.session_state.get(f"facet_{c}", []) for c in facets.facets}
+    with tracing.span("facets") as sp:
+        base = facets.bitset(cat_index.lookup(narrow)) if narrow.strip() else None
+
+        facet_path = ""
+        level_cols = st.columns(4)
+        for level in range(len(level_cols) * 3):
+            kids = facets.children(facet_path, facet_filters, base)
+            if not kids:
+                break
+            pick = level_cols[level % len(level_cols)].selectbox(
+                "Path" if level == 0 else f"Level {level + 1}", ["(any)"] + list(kids),
+                format_func=lambda v, k=kids: v if v == "(any)" else f"{v} ({k[v]})",
+                key=f"facet_path_{facet_path}",
+            )
+            if pick == "(any)":
+                break
+            facet_path = f"{facet_path}/{pick}" if facet_path else pick
+
+        counts = facets.counts(facet_filters, facet_path, base)
+        facet_cols = st.columns(3)
+        for i, col in enumerate(facets.facets):
+            facet_cols[i % 3].multiselect(
+                FACET_LABELS.get(col, col), list(counts[col]),
+                format_func=lambda v, c=counts[col]: f"{v} ({c[v]})",
+                key=f"facet_{col}",
+            )
+        hits = facets.rows(facets.mask(facet_filters, facet_path, base))
+        sp["rows"] = len(hits)
+
+    st.caption(f"{len(hits):,} of {len(cat_index):,} series")
+    if len(hits):
+        show = [c for c in ["series_id", "name", "description", "asset_type", "geography",
+                            "investor_type", "frequency", "model_id"] if c in cat_index.df.columns]
+        browse = cat_index.df.iloc[hits[:500]]
+        st.dataframe(browse[show], use_container_width=True, hide_index=True)
+        names = dict(zip(browse["series_id"], browse["name"] if "name" in browse.columns else browse["series_id"]))
+        b1, b2 = st.columns([3, 1])
+        pick_id = b1.selectbox("Series", list(names), key="facet_pick",
+                               format_func=lambda v: f"{v} — {names[v] or ''}")
+        b2.write(" ")
+        b2.button("Use in Quick Add", on_click=_use_in_quick_add, args=(pick_id,))
+
 # ---------- Quick Add by Series ID ----------
 st.subheader("⚡ Quick Add by Series ID")
-series_id_quick = st.text_input("Series ID / Ticker", placeholder="e.g. USEQCOMB or AAPL")
-source_quick = st.selectbox("Source", ["VandaXAsset", "VandaTrack"])
+series_id_quick = st.text_input("Series ID / Ticker", placeholder="e.g. USEQCOMB or AAPL", key="series_id_quick")
+source_quick = st.selectbox("Source", ["VandaXAsset", "VandaTrack"], key="source_quick")
 label_quick = st.text_input("Label (optional)", value="")
 
 if source_quick == "VandaXAsset":
@@ -139,25 +292,25 @@ if source_quick == "VandaXAsset":
         "Day-over-Day (DoD)": "dod", "Week-over-Week (WoW)": "wow",
         "Month-over-Month (MoM)": "mom", "Year-over-Year (YoY)": "yoy"
     }
-    freq_display = st.selectbox("Frequency", list(freq_map.keys()), index=0)
+    freq_display = st.selectbox("Frequency", list(freq_map.keys()), index=0, key="quick_freq")
     freq = freq_map[freq_display]
 
     rolling_map = {"None": None, "1M": "1m", "3M": "3m", "6M": "6m", "12M": "12m"}
-    rolling_display = st.selectbox("Rolling Sum", list(rolling_map.keys()), index=0)
+    rolling_display = st.selectbox("Rolling Sum", list(rolling_map.keys()), index=0, key="quick_rolling")
     rolling_sum = rolling_map[rolling_display]
 
     z_map = {"Raw": None, "Z-Score All Years": "all", "Z-Score 2Y": "2y", "Z-Score 5Y": "5y"}
-    z_display = st.selectbox("Type", list(z_map.keys()), index=0)
+    z_display = st.selectbox("Type", list(z_map.keys()), index=0, key="quick_z")
     z_score = z_map[z_display]
 
     fields = xa.fields_for_series(series_id_quick) if series_id_quick else []
     if fields:
-        field_name_q = st.selectbox("Field", fields)
+        field_name_q = st.selectbox("Field", fields, key="quick_field")
     else:
-        field_name_q = st.text_input("Field (manual)")
+        field_name_q = st.text_input("Field (manual)", key="quick_field_manual")
 
-    start_q = st.date_input("Start", value=date(2022, 1, 1))
-    end_q = st.date_input("End", value=date.today())
+    start_q = st.date_input("Start", value=date(2022, 1, 1), key="quick_start")
+    end_q = st.date_input("End", value=date.today(), key="quick_end")
 
     if st.button("➕ Add to Chart (Quick - XAsset)"):
         add_item({
@@ -174,23 +327,73 @@ if source_quick == "VandaXAsset":
         st.success(f"Added {series_id_quick or '(no id)'} (XAsset)")
 
 else:  # VandaTrack
-    vt_kind_q = st.selectbox("Endpoint", ["Retail", "Options"])
-    vt_type_q = st.selectbox("Metric", ["net", "buy", "sell"])
-    start_q = st.date_input("Start", value=date(2022, 1, 1))
-    end_q = st.date_input("End", value=date.today())
+    vt_kind_q = st.selectbox("Endpoint", ["Retail", "Options"], key="quick_endpoint")
+    if vt_kind_q == "Options":
+        o1, o2, o3, o4 = st.columns(4)
+        callputs_q = o1.multiselect("Call / Put", ["call", "put"], default=["put"], key="quick_callput")
+        moneyness_q = o2.multiselect("Moneyness", ["ITM", "ATM", "OTM"], default=["OTM"], key="quick_moneyness")
+        sizes_q = o3.multiselect("Size", ["small", "medium", "large"], default=["small"], key="quick_size")
+        # Value columns the API returned for the last grid fetched in this session
+        grid_fields = st.session_state.get("options_fields") or []
+        if grid_fields:
+            field_q = o4.selectbox("Value column", [""] + grid_fields, key="quick_options_field_pick",
+                                   format_func=lambda f: f or "First column")
+        else:
+            field_q = o4.text_input("Value column (optional)", key="quick_options_field",
+                                    help="Defaults to the first column the API returns").strip()
+    else:
+        vt_type_q = st.selectbox("Metric", ["net", "buy", "sell"], key="quick_metric")
+    start_q = st.date_input("Start", value=date(2022, 1, 1), key="quick_start")
+    end_q = st.date_input("End", value=date.today(), key="quick_end")
     ticker_value = series_id_quick.strip()
-    label_auto = f"Aggregate {vt_kind_q} Flow ({vt_type_q})" if ticker_value == "" else (label_quick or f"{ticker_value} ({vt_kind_q})")
     if st.button("➕ Add to Chart (Quick - VandaTrack)"):
-        add_item({
-            "api": "track",
-            "endpoint": vt_kind_q.lower(),
-            "ticker": ticker_value if ticker_value else None,
-            "type": vt_type_q,
-            "from": str(start_q),
-            "to": str(end_q),
-            "label": label_auto,
-        })
-        st.success(f"Added {label_auto}")
+        if vt_kind_q == "Options":
+            # Every combination in one concurrent grid fetch; the chart items then read the cache
+            try:
+                grid = vt.options_grid(ticker_value or None, callputs_q, moneyness_q, sizes_q,
+                                       from_date=str(start_q), to_date=str(end_q))
+            except ValueError as e:
+                grid = None
+                st.warning(str(e))
+            cells = list(dict.fromkeys(c[:3] for c in grid.columns)) if grid is not None else []
+            if cells:
+                fields = list(dict.fromkeys(grid.columns.get_level_values("field")))
+                st.session_state["options_fields"] = fields
+                if field_q and field_q not in fields:
+                    st.warning(f"Value column “{field_q}” is not in the API's response "
+                               f"(available: {', '.join(fields)}); nothing added.")
+                    cells = []
+                    grid = None
+            for cp, mny, sz in cells:
+                name = f"{ticker_value or 'Aggregate'} {cp} {mny} {sz}" + (f" {field_q}" if field_q else "")
+                add_item({
+                    "api": "track",
+                    "endpoint": "options",
+                    "ticker": ticker_value if ticker_value else None,
+                    "callput": cp,
+                    "moneyness": mny,
+                    "size": sz,
+                    "field": field_q or None,
+                    "from": str(start_q),
+                    "to": str(end_q),
+                    "label": (label_quick or name) if len(cells) == 1 else name,
+                })
+            if cells:
+                st.success(f"Added {len(cells)} options series")
+            elif grid is not None:
+                st.warning("No options data returned for that selection.")
+        else:
+            label_auto = f"Aggregate {vt_kind_q} Flow ({vt_type_q})" if ticker_value == "" else (label_quick or f"{ticker_value} ({vt_kind_q})")
+            add_item({
+                "api": "track",
+                "endpoint": vt_kind_q.lower(),
+                "ticker": ticker_value if ticker_value else None,
+                "type": vt_type_q,
+                "from": str(start_q),
+                "to": str(end_q),
+                "label": label_auto,
+            })
+            st.success(f"Added {label_auto}")
 
 # ---------- Chart Configuration ----------
 st.subheader("🧩 Chart Configuration")
@@ -210,6 +413,41 @@ else:
     if st.button("Clear All"):
         clear_items()
 
+    # Derived series: computed from the aligned frame at render time, no extra API calls
+    with st.expander("➗ Derived series (spreads, ratios, rebased…)", expanded=bool(get_derived())):
+        st.caption("Refer to series by label in backticks, e.g. `AAPL buy` - `AAPL sell`, "
+                   "`SPX` / `MSCI World`, rebase(rolling_mean(`NVDA net`, 20), 100). "
+                   "Functions: " + ", ".join(sorted(expressions.FUNCTIONS)) + ". "
+                   "Windows are a count of observations or a period like \"3m\".")
+        for idx, d in enumerate(get_derived()):
+            dc1, dc2 = st.columns([9, 1])
+            dc1.write(f"**{d['label']}** = `{d['expr']}`")
+            if dc2.button("Remove", key=f"rm_derived_{idx}"):
+                remove_derived(idx)
+                st.rerun()
+        # Expressions read the aligned frame's columns (a retail item "X" charts as "X buy", ...)
+        last_merged = st.session_state.get("last_merged")
+        columns = [c for c in last_merged.columns if c != "date"] if last_merged is not None else []
+        if columns:
+            st.caption("Series in the last render: " + ", ".join(f"`{c}`" for c in columns))
+        dl1, dl2 = st.columns([1, 3])
+        derived_label = dl1.text_input("Label", key="derived_label")
+        derived_expr = dl2.text_input("Expression", key="derived_expr")
+        if st.button("➕ Add derived series", disabled=not (derived_label.strip() and derived_expr.strip())):
+            known = columns + [d["label"] for d in get_derived()]
+            try:
+                expr = expressions.compile_expression(derived_expr)
+                unknown = [r for r in expr.refs if r not in known]
+                if columns and unknown:
+                    raise expressions.ExpressionError(f"unknown series: {', '.join(unknown)}")
+                if derived_label.strip() in known + [it.get("label") for it in items]:
+                    raise expressions.ExpressionError(f"label “{derived_label.strip()}” is already on the chart")
+            except expressions.ExpressionError as e:
+                st.warning(f"Can't add derived series: {e}")
+            else:
+                add_derived(derived_label.strip(), expr.text)
+                st.success(f"Added derived series {derived_label.strip()}")
+
 # ---------- Render Combined Chart ----------
 st.subheader("📈 Render Combined Chart")
 
@@ -217,17 +455,11 @@ st.subheader("📈 Render Combined Chart")
 if "chart_settings" not in st.session_state:
     st.session_state["chart_settings"] = {}
 
-# Default color palette (fallbacks)
-DEFAULT_COLORS = [
-    "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
-    "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"
-]
-
 # Settings panel
 if items:
     st.markdown("### 🎨 Chart Settings per Series")
-    for i, it in enumerate(items):
-        label = it.get("label", f"Series {i+1}")
+    series_labels = [it.get("label", f"Series {i+1}") for i, it in enumerate(items)]
+    for i, label in enumerate(series_labels + [d["label"] for d in get_derived()]):
         settings = st.session_state["chart_settings"].get(label, {"type": "Line", "axis": "Left", "color": DEFAULT_COLORS[i % len(DEFAULT_COLORS)]})
 
         c1, c2, c3 = st.columns([2, 1, 1])
@@ -251,141 +483,175 @@ if items:
 
 normalize = st.checkbox("Normalize to Z-score per series (client-side)", value=False)
 show_markers = st.checkbox("Show markers on lines", value=False)
-
-if st.button("Render Combined Chart", type="primary"):
+use_lod = st.checkbox("Level-of-detail rendering (downsample long series, WebGL above "
+                      f"{WEBGL_THRESHOLD:,} points)", value=True)
+lod_points = LOD_POINTS
+full_res_export = True
+if use_lod:
+    c1, c2 = st.columns([1, 1])
+    with c1:
+        lod_points = st.number_input("Target points per series", min_value=200, max_value=20000,
+                                     value=LOD_POINTS, step=100)
+    with c2:
+        full_res_export = st.checkbox("Full resolution in HTML export", value=True)
+
+merged = None
+r1, r2 = st.columns([3, 1])
+render_clicked = r1.button("Render Combined Chart", type="primary")
+refetch_clicked = r2.button("↻ Refetch all", help="Drop this session's fetched series and fetch all of them again "
+                                                        "(shared caches still answer fresh entries)")
+if render_clicked or refetch_clicked:
     if not items:
         st.warning("Add at least one series first.")
     else:
-        dfs = []
-        for it in items:
-            try:
-                if it["api"] == "xasset":
-                    df = xa.timeseries(
-                        series_id=it["series_id"],
-                        field_name=it.get("field_name"),
-                        start_date=it.get("from"),
-                        end_date=it.get("to"),
-                        label=it.get("label"),
-                        frequency=it.get("frequency"),
-                        rolling_sum=it.get("rolling_sum"),
-                        z_score=it.get("z_score"),
-                    )
+        if refetch_clicked:
+            clear_data_cache()
+        prune_series_cache(items)
+        # Only series not fetched earlier in this session go to the network
+        todo = [it for it in items if get_cached_series(it) is None]
+        fallbacks = {}
+        if todo:
+            progress_bar = st.progress(0.0, text=f"Fetching {len(todo)} series…")
+
+            def on_tick(done, total, pages):
+                rows = sum(r for _, r in pages.values())
+                extra = f" · {sum(p for p, _ in pages.values())} pages / {rows:,} rows streamed" if pages else ""
+                progress_bar.progress(done / total, text=f"Fetched {done}/{total} series{extra}")
+
+            with tracing.span("fetch_items", series=len(todo)):
+                results = fetch_items(
+                    todo,
+                    max_workers=st.session_state.get("fetch_workers"),
+                    deadline=st.session_state.get("fetch_deadline"),
+                    stream=st.session_state.get("stream_pages", False),
+                    on_tick=on_tick,
+                )
+            progress_bar.empty()
+            for it, (df, err) in zip(todo, results):
+                if err is not None:
+                    st.warning(f"Failed to fetch data for {it.get('label')}: {err}")
+                elif is_mock(df):
+                    # Charted this time, but not memoized: the next Render retries it
+                    st.warning(f"No data from the API for {it.get('label')}; showing placeholder data.")
+                    fallbacks[item_key(it)] = df
                 else:
-                    if it.get("endpoint") == "retail":
-                        df = vt.retail_flow(
-                            tickers=it.get("ticker"),
-                            flow_type=it.get("type", "net"),
-                            from_date=it.get("from"),
-                            to_date=it.get("to"),
-                            label=it.get("label"),
-                        )
-                    else:
-                        df = vt.options_flow(
-                            tickers=it.get("ticker"),
-                            callput=it.get("callput", "put"),
-                            moneyness=it.get("moneyness", "OTM"),
-                            size=it.get("size", "small"),
-                            from_date=it.get("from"),
-                            to_date=it.get("to"),
-                            label=it.get("label"),
-                        )
-                dfs.append(df)
-            except Exception as e:
-                st.warning(f"Failed to fetch data for {it.get('label')}: {e}")
-
-        merged = outer_merge_on_date(dfs)
+                    cache_series(it, df)
+        dfs = [df for df in (fallbacks.get(item_key(it), get_cached_series(it)) for it in items) if df is not None]
+
+        with tracing.span("merge", series=len(dfs)) as sp:
+            merged = outer_merge_on_date(dfs)
+            sp["rows"] = 0 if merged is None else len(merged)
+        st.session_state["last_merged"] = merged
+        st.session_state.pop("snapshot", None)
         if merged is None or merged.empty:
             st.warning("No data to plot.")
+            merged = None
+        else:
+            set_aligned(items, merged)
+elif st.session_state.get("snapshot") is not None:
+    # Saved dashboard snapshot: no network calls
+    snap = st.session_state["snapshot"]
+    merged = snap["data"].copy()
+    st.caption(f"Showing saved snapshot of “{snap['name']}” from {snap['at']} — press Render to refetch.")
+elif items:
+    # Restyling / toggles: rebuild the figure from the memoized frame, no refetch or re-merge
+    merged = get_aligned(items)
+    if merged is None and all(get_cached_series(it) is not None for it in items):
+        # Items removed or reordered: re-align from memoized series without touching the network
+        with tracing.span("merge", series=len(items), memo=True):
+            merged = outer_merge_on_date([get_cached_series(it) for it in items])
+        if merged is not None and not merged.empty:
+            set_aligned(items, merged)
+            st.session_state["last_merged"] = merged
         else:
-            # ensure date col
-            if "date" in merged.columns:
-                merged["date"] = pd.to_datetime(merged["date"], errors="coerce")
+            merged = None
+    if merged is not None:
+        merged = merged.copy(deep=False)  # the steps below must not touch the memoized frame
+
+if merged is not None:
+    with tracing.span("prepare", rows=len(merged)):
+        # ensure date col
+        if "date" in merged.columns:
+            merged["date"] = pd.to_datetime(merged["date"], errors="coerce")
+        else:
+            merged.rename(columns={merged.columns[0]: "date"}, inplace=True)
+            merged["date"] = pd.to_datetime(merged["date"], errors="coerce")
+
+        merged = merged.sort_values("date")
+
+    # derived series from the aligned frame (before normalization, so they see raw values)
+    if get_derived():
+        with tracing.span("derived", series=len(get_derived())):
+            merged, derived_errors = expressions.apply_derived(merged, get_derived())
+        for msg in derived_errors:
+            st.warning(f"Derived series skipped — {msg}")
+
+    # normalize if requested
+    if normalize:
+        with tracing.span("normalize", series=merged.shape[1] - 1):
+            merged = zscore_normalize(merged)
+
+    # build figure (level-of-detail for display; full resolution for export if requested)
+    with tracing.span("figure.build", series=merged.shape[1] - 1, lod=lod_points if use_lod else None):
+        fig = build_figure(
+            merged, st.session_state["chart_settings"], show_markers=show_markers,
+            lod_points=lod_points if use_lod else None,
+        )
+    export_fig = fig
+    if use_lod and full_res_export:
+        with tracing.span("figure.build", series=merged.shape[1] - 1, lod=None, export=True):
+            export_fig = build_figure(merged, st.session_state["chart_settings"],
+                                      show_markers=show_markers, lod_points=None)
+
+    with tracing.span("serialize.plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    with tracing.span("serialize.csv") as sp:
+        csv_bytes = merged.to_csv(index=False).encode("utf-8")
+        sp["bytes"] = len(csv_bytes)
+    st.download_button(
+        "Download CSV (merged)",
+        csv_bytes,
+        file_name="combined_data.csv",
+        mime="text/csv",
+    )
+    with tracing.span("serialize.html") as sp:
+        html = export_fig.to_html(include_plotlyjs="cdn")
+        sp["bytes"] = len(html)
+    st.download_button(
+        "Download HTML chart",
+        html,
+        file_name="combined_chart.html",
+        mime="text/html",
+    )
+
+# ---------- Profiling ----------
+if trace is not None:
+    trace.finish()
+    traces = st.session_state.setdefault("traces", [])
+    if trace.spans:
+        traces.append(trace)
+        del traces[:-10]  # keep the last 10 profiled reruns
+    with st.sidebar:
+        with st.expander("⏱️ Profiling", expanded=False):
+            if not traces:
+                st.caption("No profiled reruns yet — render a chart or run a search.")
             else:
-                merged.rename(columns={merged.columns[0]: "date"}, inplace=True)
-                merged["date"] = pd.to_datetime(merged["date"], errors="coerce")
-
-            merged = merged.sort_values("date")
-
-            # normalize if requested
-            if normalize:
-                for c in merged.columns:
-                    if c == "date":
-                        continue
-                    s = merged[c]
-                    if pd.api.types.is_numeric_dtype(s):
-                        std = s.std(skipna=True)
-                        merged[c] = (s - s.mean(skipna=True)) / (std if std else 1.0)
-
-            # build figure
-            fig = go.Figure()
-
-            # add each series with its chart type / axis / color
-            for col in [c for c in merged.columns if c != "date"]:
-                settings = st.session_state["chart_settings"].get(col, None)
-                if settings is None:
-                    # fallback settings if not set (e.g., label mismatch)
-                    idx = len(fig.data) % len(DEFAULT_COLORS)
-                    settings = {"type": "Line", "axis": "Left", "color": DEFAULT_COLORS[idx]}
-
-                chart_type = settings["type"].lower()
-                axis_side = settings["axis"].lower()
-                color = settings["color"]
-
-                axis_ref = "y" if axis_side == "left" else "y2"
-
-                if chart_type == "bar":
-                    fig.add_trace(
-                        go.Bar(x=merged["date"], y=merged[col], name=col, yaxis=axis_ref, marker_color=color)
-                    )
-                elif chart_type == "scatter":
-                    fig.add_trace(
-                        go.Scatter(x=merged["date"], y=merged[col],
-                                   mode="markers", name=col, yaxis=axis_ref,
-                                   marker=dict(color=color))
-                    )
-                else:  # line
-                    mode = "lines+markers" if show_markers else "lines"
-                    fig.add_trace(
-                        go.Scatter(x=merged["date"], y=merged[col],
-                                   mode=mode, name=col, yaxis=axis_ref,
-                                   line=dict(color=color),
-                                   marker=dict(color=color))
-                    )
-
-            # dual y-axes if any series is on right
-            use_right = any(v.get("axis") == "Right" for v in st.session_state["chart_settings"].values())
-            layout_args = dict(
-                title="Combined Chart",
-                legend_title="Series",
-                xaxis_title="Date",
-                yaxis_title="Left Axis",
-                template="plotly_white",
-                hovermode="x unified",
-                height=650,
-                barmode="group",
-            )
-            if use_right:
-                layout_args["yaxis2"] = dict(
-                    title="Right Axis",
-                    overlaying="y",
-                    side="right",
-                    showgrid=False,
-                )
-
-            fig.update_layout(**layout_args)
-            fig.update_traces(marker_line_width=0)
-
-            st.plotly_chart(fig, use_container_width=True)
-
-            st.download_button(
-                "Download CSV (merged)",
-                merged.to_csv(index=False).encode("utf-8"),
-                file_name="combined_data.csv",
-                mime="text/csv",
-            )
-            st.download_button(
-                "Download HTML chart",
-                fig.to_html(include_plotlyjs="cdn"),
-                file_name="combined_chart.html",
-                mime="text/html",
-            )
+                labels = [
+                    f"{time.strftime('%H:%M:%S', time.localtime(t.started_at))} · "
+                    f"{t.elapsed_ms():,.0f} ms · {len(t.spans)} spans"
+                    for t in traces
+                ]
+                pick = st.selectbox("Rerun", range(len(traces)), index=len(traces) - 1,
+                                    format_func=lambda i: labels[i], key="trace_pick")
+                t = traces[pick]
+                summary = pd.DataFrame(t.summary())
+                st.dataframe(summary.round({"total_ms": 1, "max_ms": 1}), hide_index=True,
+                             use_container_width=True)
+                stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(t.started_at))
+                p1, p2 = st.columns(2)
+                p1.download_button("JSON", t.to_json(), file_name=f"vanda_trace_{stamp}.json",
+                                   mime="application/json")
+                p2.download_button("Trace file", t.to_chrome_trace(), file_name=f"vanda_trace_{stamp}.trace.json",
+                                   mime="application/json",
+                                   help="Chrome trace format — open in chrome://tracing or ui.perfetto.dev")
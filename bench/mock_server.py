@@ -0,0 +1,210 @@
+"""
+Local stand-in for the VandaXAsset and VandaTrack HTTP APIs, for offline benchmarks.
+
+Serves deterministic, realistically shaped payloads whose size follows the request
+(date range, ticker count) and the server config (catalog size, fields per series),
+with optional injected latency per request:
+
+    /timeseries      [{"date", "value"}, ...] business days in [start_date, end_date]
+    /filter-list     catalog rows (CATALOG_ROWS)
+    /field-mappings  series_id x field_name rows
+    /tickers/api/    {ticker: {date: value}}; paginated {"count", "next", "results"} when pagination=true
+    /option/api/     [{"date", "ticker", "volume", "premium"}, ...]
+
+    python -m bench.mock_server --port 8765 --latency-ms 40
+"""
+import json
+import time
+import zlib
+import argparse
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+# === Config (set via configure() or start()) ===
+HISTORY_START = "2000-01-03"
+HISTORY_END = "2024-12-31"
+CATALOG_ROWS = 2000
+FIELDS_PER_SERIES = 4
+PAGE_ROWS = 5000          # rows per /tickers/api/ page when paginated
+LATENCY_S = 0.0
+ERRORS: Dict[str, int] = {}  # path prefix -> HTTP status to answer with instead (failure tests)
+
+_ASSET_TYPES = ["Equity", "FX", "Rates", "Credit", "Commodities", "Crypto"]
+_GEOGRAPHIES = ["AMER", "EMEA", "APAC"]
+_FIELDS = ["net_flow", "position", "z_score", "aum", "buy", "sell", "volume", "price"]
+
+def configure(catalog_rows: Optional[int] = None, fields_per_series: Optional[int] = None,
+              page_rows: Optional[int] = None, latency_ms: Optional[float] = None,
+              errors: Optional[Dict[str, int]] = None):
+    global CATALOG_ROWS, FIELDS_PER_SERIES, PAGE_ROWS, LATENCY_S, ERRORS
+    if catalog_rows is not None:
+        CATALOG_ROWS = max(1, int(catalog_rows))
+    if fields_per_series is not None:
+        FIELDS_PER_SERIES = max(1, min(int(fields_per_series), len(_FIELDS)))
+    if page_rows is not None:
+        PAGE_ROWS = max(1, int(page_rows))
+    if latency_ms is not None:
+        LATENCY_S = max(0.0, float(latency_ms)) / 1000.0
+    if errors is not None:
+        ERRORS = dict(errors)
+    _payload.cache_clear()
+
+# === Payload generation ===
+def _rng(*key) -> np.random.Generator:
+    return np.random.default_rng(zlib.crc32("|".join(map(str, key)).encode()))
+
+def _dates(start: Optional[str], end: Optional[str]) -> pd.DatetimeIndex:
+    s = max(pd.Timestamp(start or HISTORY_START), pd.Timestamp(HISTORY_START))
+    e = min(pd.Timestamp(end or HISTORY_END), pd.Timestamp(HISTORY_END))
+    return pd.bdate_range(s, e)
+
+def _walk(key: str, dates: pd.DatetimeIndex) -> np.ndarray:
+    # Generated over the full history and sliced, so overlapping ranges agree
+    full = pd.bdate_range(HISTORY_START, HISTORY_END)
+    values = _rng(key).normal(0, 1, len(full)).cumsum().round(4)
+    return values[full.searchsorted(dates)] if len(dates) else values[:0]
+
+def series_ids(n: Optional[int] = None) -> List[str]:
+    n = CATALOG_ROWS if n is None else n
+    return [f"BENCH{_ASSET_TYPES[i % len(_ASSET_TYPES)][:3].upper()}{i:06d}" for i in range(n)]
+
+def _timeseries(q: Dict[str, str]) -> List[Dict]:
+    dates = _dates(q.get("start_date"), q.get("end_date"))
+    values = _walk(f"{q.get('series_id')}:{q.get('field_name')}", dates)
+    return [{"date": d, "value": v} for d, v in zip(dates.strftime("%Y-%m-%d"), values.tolist())]
+
+def _filter_list() -> List[Dict]:
+    rows = []
+    for i, sid in enumerate(series_ids()):
+        asset = _ASSET_TYPES[i % len(_ASSET_TYPES)]
+        geo = _GEOGRAPHIES[i % len(_GEOGRAPHIES)]
+        rows.append({
+            "series_id": sid,
+            "name": f"{asset} flow {i}",
+            "description": f"Synthetic {asset.lower()} investor flow series {i} ({geo})",
+            "asset_type": asset,
+            "geography": geo,
+            "frequency": "Daily" if i % 3 else "Weekly",
+        })
+    return rows
+
+def _field_mappings() -> List[Dict]:
+    return [{"series_id": sid, "field_name": f}
+            for sid in series_ids() for f in _FIELDS[:FIELDS_PER_SERIES]]
+
+def _ticker_dict(tickers: List[str], ftype: str, dates: pd.DatetimeIndex) -> Dict[str, Dict]:
+    labels = dates.strftime("%Y-%m-%d")
+    return {t: dict(zip(labels, _walk(f"{t}:{ftype}", dates).tolist())) for t in tickers or ["Aggregate"]}
+
+def _options(q: Dict[str, List[str]]) -> List[Dict]:
+    dates = _dates(_one(q, "from_date"), _one(q, "to_date"))
+    labels = dates.strftime("%Y-%m-%d")
+    key = f"{_one(q, 'callput')}:{_one(q, 'moneyness')}:{_one(q, 'size')}"
+    rows = []
+    for t in q.get("tickers") or ["Aggregate"]:
+        vol = np.abs(_walk(f"{t}:{key}:vol", dates)).round(0)
+        prem = _walk(f"{t}:{key}:prem", dates)
+        rows.extend({"date": d, "ticker": t, "volume": v, "premium": p}
+                    for d, v, p in zip(labels, vol.tolist(), prem.tolist()))
+    return rows
+
+def _one(q: Dict[str, List[str]], name: str) -> Optional[str]:
+    v = q.get(name)
+    return v[-1] if v else None
+
+@lru_cache(maxsize=256)
+def _payload(path: str, query: str, host: str) -> bytes:
+    q = parse_qs(query)
+    if path == "/timeseries":
+        data = _timeseries({k: v[-1] for k, v in q.items()})
+    elif path == "/filter-list":
+        data = _filter_list()
+    elif path == "/field-mappings":
+        data = _field_mappings()
+    elif path == "/tickers/api/":
+        tickers, ftype = q.get("tickers", []), _one(q, "type") or "net"
+        dates = _dates(_one(q, "from_date"), _one(q, "to_date"))
+        if _one(q, "pagination") != "true":
+            data = _ticker_dict(tickers, ftype, dates)
+        else:
+            per_page = max(1, PAGE_ROWS // max(1, len(tickers)))
+            pages = max(1, -(-len(dates) // per_page))
+            page = min(max(1, int(_one(q, "page") or 1)), pages)
+            nxt = None
+            if page < pages:
+                nq = {k: v for k, v in q.items() if k != "page"}
+                nxt = f"http://{host}{path}?{urlencode({**nq, 'page': page + 1}, doseq=True)}"
+            data = {
+                "count": len(dates) * max(1, len(tickers)),
+                "next": nxt,
+                "results": _ticker_dict(tickers, ftype, dates[(page - 1) * per_page: page * per_page]),
+            }
+    elif path == "/option/api/":
+        data = _options(q)
+    else:
+        raise KeyError(path)
+    return json.dumps(data).encode()
+
+# === Server ===
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs behind the pooled session
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if LATENCY_S:
+            time.sleep(LATENCY_S)
+        failing = [s for p, s in ERRORS.items() if parts.path.startswith(p)]
+        try:
+            if failing:
+                body, status = b'{"detail": "injected failure"}', failing[0]
+            else:
+                body = _payload(parts.path, parts.query, self.headers.get("Host", ""))
+                status = 200
+        except KeyError:
+            body, status = b'{"detail": "not found"}', 404
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # async fan-out opens many connections at once
+
+def start(port: int = 0, **config) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the server on a daemon thread; returns (server, base_url). Stop with server.shutdown()."""
+    configure(**config)
+    server = _Server(("127.0.0.1", port), _Handler)
+    threading.Thread(target=server.serve_forever, name="bench-mock-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve mock VandaXAsset / VandaTrack endpoints.")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--catalog-rows", type=int, default=CATALOG_ROWS)
+    ap.add_argument("--fields-per-series", type=int, default=FIELDS_PER_SERIES)
+    ap.add_argument("--page-rows", type=int, default=PAGE_ROWS)
+    args = ap.parse_args(argv)
+    configure(args.catalog_rows, args.fields_per_series, args.page_rows, args.latency_ms)
+    server = _Server(("127.0.0.1", args.port), _Handler)
+    print(f"Serving on http://127.0.0.1:{args.port}  "
+          f"(VANDA_BASE_URL / VANDATRACK_BASE_URL point the app here)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Record VandaXAsset responses for the local-transform parity test (tests/test_transforms.py).
+
+For each variant, stores the base daily series (with the lookback the local derivation needs)
+and the API's own server-side variant for the same request, so the comparison runs offline:
+
+    VANDA_XASSET_API_KEY=... python -m bench.record_parity SERIES_ID --field net_flow \\
+        --start 2022-01-01 --end 2024-12-31 \\
+        --variant frequency=weekly --variant frequency=mom --variant rolling_sum=3m,z_score=2y
+"""
+import os
+import json
+import argparse
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from modules import http_client, transforms
+from modules import vanda_xasset_api as xa
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "tests", "fixtures", "transforms")
+_KEYS = ("frequency", "rolling_sum", "z_score")
+
+def _parse_variant(spec: str) -> Dict[str, str]:
+    out = {}
+    for part in filter(None, spec.split(",")):
+        k, _, v = part.partition("=")
+        if k not in _KEYS or not v:
+            raise ValueError(f"bad variant {spec!r}: expected e.g. frequency=weekly,rolling_sum=3m")
+        out[k] = v
+    return out
+
+def _get(params: Dict) -> List[Dict]:
+    r = http_client.get(f"{xa.BASE}/timeseries", params=params, headers=xa._headers(), timeout=60)
+    r.raise_for_status()
+    return r.json()
+
+def record(series_id: str, field_name: Optional[str], start: str, end: str, variant: Dict[str, str]) -> str:
+    params = {"series_id": series_id}
+    if field_name:
+        params["field_name"] = field_name
+    lb = transforms.lookback(variant.get("frequency"), variant.get("rolling_sum"), variant.get("z_score"))
+    base_start = None if lb is None else (pd.Timestamp(start) - lb).strftime("%Y-%m-%d")
+    base = _get({**params, **({"start_date": base_start} if base_start else {}), "end_date": end})
+    api = _get({**params, **variant, "start_date": start, "end_date": end})
+    fixture = {"series_id": series_id, "field_name": field_name, "start_date": start, "end_date": end,
+               **{k: variant.get(k) for k in _KEYS}, "base": base, "api": api}
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    name = "_".join([series_id, field_name or "default"] + [f"{k}-{v}" for k, v in sorted(variant.items())])
+    path = os.path.join(FIXTURE_DIR, f"{name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixture, f)
+    return path
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Record API responses for the transform parity test.")
+    ap.add_argument("series_id")
+    ap.add_argument("--field", default=None)
+    ap.add_argument("--start", required=True)
+    ap.add_argument("--end", required=True)
+    ap.add_argument("--variant", action="append", required=True,
+                    help="frequency=...,rolling_sum=...,z_score=... (repeatable)")
+    args = ap.parse_args(argv)
+    if not xa.have_key():
+        ap.error("set VANDA_XASSET_API_KEY to record real API responses")
+    for spec in args.variant:
+        print(record(args.series_id, args.field, args.start, args.end, _parse_variant(spec)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Offline benchmark suite: times search, field lookup, every fetch function, alignment and
+figure construction against the local mock server (bench/mock_server.py) over growing
+catalog sizes, series counts and history lengths, and flags regressions against a baseline.
+
+    python -m bench.run --save-baseline            # record bench/baseline.json on this machine
+    python -m bench.run                            # compare; exits 1 on regressions
+    python -m bench.run --quick --latency-ms 30    # smaller grid, with network latency
+
+Disk and memory caches and sharding are switched off so every fetch measures the request path.
+Timings are machine-specific: compare against a baseline recorded on the same machine.
+"""
+import io
+import os
+import sys
+import asyncio
+import json
+import time
+import argparse
+import platform
+import statistics
+import contextlib
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules import catalog, disk_cache, http_client, rate_limit, series_cache, sharding
+from modules import vanda_xasset_api as xa
+from modules import vanda_track_api as vt
+from modules.data_explorer import unified_search
+from modules.fetch import fetch_items
+from modules.figure import build_figure, LOD_POINTS
+from modules.utils import outer_merge_on_date
+
+from . import mock_server
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+TOLERANCE = 0.25      # slower than baseline by more than this fraction ...
+MIN_DELTA_S = 0.002   # ... and by more than this many seconds counts as a regression
+
+GRIDS = {
+    "full":  {"catalog": [1000, 5000, 20000], "series": [1, 10, 50], "years": [1, 5, 20]},
+    "quick": {"catalog": [500, 2000], "series": [1, 5], "years": [1, 5]},
+}
+SEARCH_QUERIES = ["equity", "flow 12", "synthetic fx amer", "apac rates weekly", "nomatch"]
+
+# === Timing ===
+def _time(fn: Callable[[], object], repeat: int) -> List[float]:
+    times = []
+    fn()  # warm-up: imports, lazy indexes and the mock server's payload cache
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+class Suite:
+    def __init__(self, repeat: int, only: Optional[str] = None):
+        self.repeat = repeat
+        self.only = only
+        self.results: Dict[str, Dict] = {}
+
+    def run(self, name: str, fn: Callable[[], object], **params):
+        case = name + ("[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]" if params else "")
+        if self.only and self.only not in case:
+            return
+        times = _time(fn, self.repeat)
+        self.results[case] = {"median_s": statistics.median(times), "min_s": min(times)}
+        print(f"  {case:<52} {statistics.median(times) * 1000:10.1f} ms", file=sys.stderr)
+
+def _range(years: int):
+    end = pd.Timestamp(mock_server.HISTORY_END)
+    return (end - pd.DateOffset(years=years)).strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+def _expect(df: pd.DataFrame, rows: int, what: str):
+    """Fetch functions fall back to mock data on errors; make sure we timed the real path."""
+    if df is None or len(df) != rows or any("mock" in str(c) for c in df.columns):
+        raise RuntimeError(f"{what}: expected {rows} rows from the mock server, got "
+                           f"{0 if df is None else len(df)} ({list(getattr(df, 'columns', []))})")
+
+def _synthetic(n_series: int, years: int) -> List[pd.DataFrame]:
+    """Per-series daily frames with staggered starts, like a mixed chart."""
+    start, end = _range(years)
+    dates = pd.bdate_range(start, end)
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(n_series):
+        d = dates[(i * 7) % max(1, len(dates) // 4):]
+        frames.append(pd.DataFrame({"date": d, f"series {i}": rng.normal(0, 1, len(d)).cumsum()}))
+    return frames
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _run_async(coro):
+    """Run on one long-lived event loop, so its connection pool stays warm like a service's would."""
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
+def _close_loop():
+    global _loop
+    if _loop is not None:
+        _loop.run_until_complete(http_client.aclose())
+        _loop.close()
+        _loop = None
+
+def _gather_timeseries(ids: List[str], start: str, end: str) -> List[pd.DataFrame]:
+    """All series concurrently from one thread through the async API."""
+    async def run():
+        return await asyncio.gather(*(xa.timeseries_async(s, start_date=start, end_date=end) for s in ids))
+    return _run_async(run())
+
+# === Cases ===
+def bench_catalog(suite: Suite, sizes: List[int]):
+    for n in sizes:
+        mock_server.configure(catalog_rows=n)
+        suite.run("catalog.build_index", lambda: catalog.refresh_index(include_live=True), catalog=n)
+        catalog.refresh_index(include_live=True)
+        suite.run("unified_search", lambda: [unified_search(q) for q in SEARCH_QUERIES], catalog=n)
+
+        ids = mock_server.series_ids(n)
+        suite.run("fields_for_series.cold", lambda: (xa.field_index(force=True), xa.fields_for_series(ids[-1])),
+                  catalog=n)
+        xa.field_index(force=True)
+        if len(xa.fields_for_series(ids[-1])) != mock_server.FIELDS_PER_SERIES:
+            raise RuntimeError("fields_for_series did not resolve against the mock catalog")
+        sample = ids[:: max(1, n // 1000)]
+        suite.run("fields_for_series.warm", lambda: [xa.fields_for_series(s) for s in sample],
+                  catalog=n, lookups=len(sample))
+    catalog.refresh_index(include_live=False)
+
+def bench_xasset(suite: Suite, series: List[int], years: List[int]):
+    sid = mock_server.series_ids(1)[0]
+    suite.run("xa.filter_list", xa.filter_list)
+    suite.run("xa.field_mappings", xa.field_mappings)
+    for y in years:
+        start, end = _range(y)
+        _expect(xa.timeseries(sid, start_date=start, end_date=end), len(pd.bdate_range(start, end)),
+                "xa.timeseries")
+        suite.run("xa.timeseries", lambda: xa.timeseries(sid, start_date=start, end_date=end), years=y)
+        suite.run("xa.timeseries", lambda: xa.timeseries(sid, start_date=start, end_date=end,
+                                                          frequency="weekly", z_score="2y"),
+                  years=y, transform="weekly+z2y")
+    start, end = _range(max(years))
+    for n in series:
+        items = [{"api": "xasset", "series_id": s, "from": start, "to": end, "label": s}
+                 for s in mock_server.series_ids(n)]
+        suite.run("fetch_items.xasset", lambda: fetch_items(items, deadline=600), series=n, years=max(years))
+        ids = [it["series_id"] for it in items]
+        suite.run("xa.timeseries_async.gather", lambda: _gather_timeseries(ids, start, end),
+                  series=n, years=max(years))
+
+def bench_track(suite: Suite, series: List[int], years: List[int]):
+    for n in series:
+        tickers = [f"TKR{i}" for i in range(n)]
+        for y in years:
+            start, end = _range(y)
+            rows = len(pd.bdate_range(start, end)) * n
+            _expect(vt.retail_flow(tickers, "net", start, end), rows, "vt.retail_flow")
+            suite.run("vt.retail_flow", lambda: vt.retail_flow(tickers, "net", start, end),
+                      tickers=n, years=y, type="net")
+            suite.run("vt.retail_flow", lambda: vt.retail_flow(tickers, "all", start, end),
+                      tickers=n, years=y, type="all")
+            suite.run("vt.retail_flow", lambda: vt.retail_flow(tickers, "net", start, end, stream=True),
+                      tickers=n, years=y, type="net", stream=1)
+            _expect(vt.options_flow(tickers, from_date=start, to_date=end), rows, "vt.options_flow")
+            suite.run("vt.options_flow", lambda: vt.options_flow(tickers, from_date=start, to_date=end),
+                      tickers=n, years=y)
+
+def bench_render(suite: Suite, series: List[int], years: List[int]):
+    for n in series:
+        for y in years:
+            frames = _synthetic(n, y)
+            suite.run("outer_merge_on_date", lambda: outer_merge_on_date(frames), series=n, years=y)
+            merged = outer_merge_on_date(frames)
+            suite.run("build_figure", lambda: build_figure(merged, {}, lod_points=LOD_POINTS),
+                      series=n, years=y, lod=LOD_POINTS)
+            suite.run("build_figure", lambda: build_figure(merged, {}), series=n, years=y, lod=0)
+            fig = build_figure(merged, {}, lod_points=LOD_POINTS)
+            suite.run("figure.to_json", fig.to_json, series=n, years=y, lod=LOD_POINTS)
+
+# === Baseline ===
+def compare(current: Dict[str, Dict], baseline: Dict[str, Dict],
+            tolerance: float = TOLERANCE, min_delta: float = MIN_DELTA_S) -> List[Dict]:
+    rows = []
+    for case, res in current.items():
+        cur = res["median_s"]
+        base = baseline.get(case, {}).get("median_s")
+        status = "new"
+        if base is not None:
+            if cur > base * (1 + tolerance) and cur - base > min_delta:
+                status = "REGRESSION"
+            elif cur < base * (1 - tolerance) and base - cur > min_delta:
+                status = "faster"
+            else:
+                status = "ok"
+        rows.append({"case": case, "median_s": cur, "baseline_s": base, "status": status})
+    return rows
+
+def report(rows: List[Dict]) -> str:
+    lines = [f"{'case':<52} {'ms':>10} {'baseline':>10} {'change':>8}  status"]
+    for r in rows:
+        base = r["baseline_s"]
+        change = f"{(r['median_s'] / base - 1) * 100:+.0f}%" if base else ""
+        base_ms = f"{base * 1000:.1f}" if base is not None else "-"
+        lines.append(f"{r['case']:<52} {r['median_s'] * 1000:10.1f} {base_ms:>10} {change:>8}  {r['status']}")
+    return "\n".join(lines)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Offline performance benchmarks against a local mock API.")
+    ap.add_argument("--quick", action="store_true", help="smaller grid")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per case (median reported)")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="injected latency per mock request")
+    ap.add_argument("--only", default=None, help="run cases whose name contains this string")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown fraction")
+    ap.add_argument("--json", default=None, help="also write results to this file")
+    args = ap.parse_args(argv)
+
+    grid = GRIDS["quick" if args.quick else "full"]
+    server, base_url = mock_server.start(latency_ms=args.latency_ms)
+    xa.BASE = base_url
+    vt.VT_BASE_TICKERS = f"{base_url}/tickers/api/"
+    vt.VT_BASE_OPTIONS = f"{base_url}/option/api/"
+    xa.set_key("bench")
+    vt.set_key("bench")
+    disk_cache.set_enabled(False)
+    series_cache.set_enabled(False)
+    rate_limit.set_enabled(False)
+    sharding.configure(unit="")
+    http_client.reset_stats()
+
+    suite = Suite(repeat=max(1, args.repeat), only=args.only)
+    try:
+        # Silence the fetch modules' debug prints so they don't flood the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            bench_catalog(suite, grid["catalog"])
+            bench_xasset(suite, grid["series"], grid["years"])
+            bench_track(suite, grid["series"], grid["years"])
+            bench_render(suite, grid["series"], grid["years"])
+    finally:
+        _close_loop()
+        server.shutdown()
+
+    meta = {
+        "grid": "quick" if args.quick else "full",
+        "repeat": suite.repeat,
+        "latency_ms": args.latency_ms,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.node(),
+        "at": pd.Timestamp.now().isoformat(timespec="seconds"),
+    }
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("meta", {}).get("latency_ms") != args.latency_ms:
+            print("[WARN] baseline was recorded with a different --latency-ms", file=sys.stderr)
+        baseline = saved.get("results", {})
+    rows = compare(suite.results, baseline, tolerance=args.tolerance)
+    print(report(rows))
+    st = http_client.stats()
+    print(f"\nHTTP: {st['requests']} requests, {st['retries']} retries, {st['errors']} errors")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": suite.results}, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": suite.results}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    regressions = [r for r in rows if r["status"] == "REGRESSION"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""
+Shared pytest fixtures. Tests run offline against bench/mock_server.py with the disk cache,
+shared memo and prefetcher off, so every call reaches the (local) server.
+"""
+import os
+
+os.environ.setdefault("VANDA_DISK_CACHE", "0")
+os.environ.setdefault("VANDA_PREFETCH", "0")
+
+import pytest
+
+from bench import mock_server
+from modules import disk_cache, rate_limit, series_cache, sharding
+from modules import vanda_xasset_api as xa
+from modules import vanda_track_api as vt
+
+@pytest.fixture(scope="session")
+def mock_api():
+    server, base_url = mock_server.start()
+    yield base_url
+    server.shutdown()
+
+@pytest.fixture
+def apis(mock_api, monkeypatch):
+    """Both API modules pointed at the mock server, with caches and rate limiting off."""
+    monkeypatch.setattr(xa, "BASE", mock_api)
+    monkeypatch.setattr(vt, "VT_BASE_TICKERS", f"{mock_api}/tickers/api/")
+    monkeypatch.setattr(vt, "VT_BASE_OPTIONS", f"{mock_api}/option/api/")
+    monkeypatch.setattr(xa, "_API_KEY", "test")
+    monkeypatch.setattr(vt, "_API_KEY", "test")
+    monkeypatch.setattr(disk_cache, "_ENABLED", False)
+    monkeypatch.setattr(series_cache, "_ENABLED", False)
+    monkeypatch.setattr(rate_limit, "_ENABLED", False)
+    monkeypatch.setattr(sharding, "SHARD_UNIT", "")
+    return mock_api
@@ -0,0 +1,183 @@
+"""
+Headless batch renderer: chart item lists (the dict schema chart_config.add_item stores)
+-> fetched, aligned data and CSV / Parquet / HTML outputs, without Streamlit.
+
+    python batch_render.py charts/*.json --out out/ --formats csv,html --workers 4
+
+Each input JSON file is one of:
+  - a list of items                         (one chart, named after the file)
+  - {"items": [...], "settings": {...}, "normalize": false, "name": "..."}
+  - {"charts": [<chart object>, ...]}       (several charts)
+"settings" uses the app's chart_settings schema: label -> {"type", "axis", "color"}.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from . import vanda_xasset_api as xa
+from . import vanda_track_api as vt
+from .fetch import fetch_items, MAX_WORKERS
+from .figure import build_figure
+from .utils import is_mock, outer_merge_on_date, zscore_normalize
+
+# Placeholder label for shared fetches; swapped for each chart's own label afterwards
+_SHARED_LABEL = "\x00shared"
+FORMATS = ("csv", "parquet", "html")
+
+# === Loading ===
+def _chart(obj, default_name: str) -> Dict:
+    if isinstance(obj, list):
+        obj = {"items": obj}
+    return {
+        "name": obj.get("name") or default_name,
+        "items": obj.get("items", []),
+        "settings": obj.get("settings", {}),
+        "normalize": bool(obj.get("normalize", False)),
+    }
+
+def load_charts(paths: List[str]) -> List[Dict]:
+    charts = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if isinstance(data, dict) and "charts" in data:
+            for i, c in enumerate(data["charts"]):
+                charts.append(_chart(c, f"{stem}_{i + 1}"))
+        else:
+            charts.append(_chart(data, stem))
+    return charts
+
+# === Fetch planning: each distinct series once per batch ===
+def series_key(it: Dict) -> str:
+    """Identity of the upstream request behind an item (its display label excluded when set)."""
+    req = {k: v for k, v in it.items() if k != "label" or not v}
+    return json.dumps(req, sort_keys=True, default=str)
+
+def _relabel(df: pd.DataFrame, label: str) -> pd.DataFrame:
+    return df.rename(columns={c: label + c[len(_SHARED_LABEL):]
+                              for c in df.columns if str(c).startswith(_SHARED_LABEL)})
+
+def fetch_shared(charts: List[Dict], max_workers: int = MAX_WORKERS,
+                 deadline: float = 600) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """
+    Fetch the union of all charts' series concurrently; returns (key -> frame, key -> error).
+    Placeholder frames the API modules return when a request fails count as errors.
+    """
+    unique: Dict[str, Dict] = {}
+    for chart in charts:
+        for it in chart["items"]:
+            key = series_key(it)
+            if key not in unique:
+                unique[key] = {**it, "label": _SHARED_LABEL} if it.get("label") else dict(it)
+    keys = list(unique)
+    results = fetch_items([unique[k] for k in keys], max_workers=max_workers, deadline=deadline)
+    frames, errors = {}, {}
+    for key, (df, err) in zip(keys, results):
+        if err is not None:
+            errors[key] = str(err)
+        elif is_mock(df):
+            errors[key] = "request failed (placeholder data returned)"
+        else:
+            frames[key] = df
+    return frames, errors
+
+# === Rendering (runs in worker processes) ===
+def render_chart(chart: Dict, frames: List[pd.DataFrame], out_dir: str, formats: List[str]) -> Dict:
+    merged = outer_merge_on_date(frames)
+    name = chart["name"]
+    if merged is None or merged.empty:
+        return {"chart": name, "rows": 0, "files": [], "error": "no data"}
+    if chart["normalize"]:
+        merged = zscore_normalize(merged)
+    written = []
+    base = os.path.join(out_dir, re.sub(r"[^\w.-]+", "_", name))
+    if "csv" in formats:
+        merged.to_csv(base + ".csv", index=False)
+        written.append(base + ".csv")
+    if "parquet" in formats:
+        merged.to_parquet(base + ".parquet", index=False)
+        written.append(base + ".parquet")
+    if "html" in formats:
+        fig = build_figure(merged, chart["settings"], lod_points=None)
+        fig.update_layout(title=name)
+        fig.write_html(base + ".html", include_plotlyjs="cdn")
+        written.append(base + ".html")
+    return {"chart": name, "rows": int(len(merged)), "files": written, "error": None}
+
+def run_batch(charts: List[Dict], out_dir: str, formats: List[str],
+              workers: int = 4, fetch_workers: int = MAX_WORKERS) -> List[Dict]:
+    os.makedirs(out_dir, exist_ok=True)
+    frames, errors = fetch_shared(charts, max_workers=fetch_workers)
+    for key, err in errors.items():
+        print(f"[WARN] fetch failed for {key}: {err}", file=sys.stderr)
+
+    results: List[Optional[Dict]] = []  # None: rendered below, in order
+    jobs = []
+    for chart in charts:
+        failed = [str(it.get("label") or it.get("series_id") or it.get("ticker"))
+                  for it in chart["items"] if series_key(it) in errors]
+        if failed:
+            # Don't write a chart with series missing as if it were complete
+            results.append({"chart": chart["name"], "rows": 0, "files": [],
+                            "error": f"fetch failed for {', '.join(failed)}"})
+            continue
+        results.append(None)
+        dfs = []
+        for it in chart["items"]:
+            df = frames.get(series_key(it))
+            if df is not None:
+                dfs.append(_relabel(df, it["label"]) if it.get("label") else df)
+        jobs.append((chart, dfs))
+
+    if workers <= 1 or len(jobs) <= 1:
+        rendered = [render_chart(c, dfs, out_dir, formats) for c, dfs in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futures = [ex.submit(render_chart, c, dfs, out_dir, formats) for c, dfs in jobs]
+            rendered = [f.result() for f in futures]
+    done = iter(rendered)
+    return [r if r is not None else next(done) for r in results]
+
+# === CLI ===
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Render Vanda chart configurations without the UI.")
+    ap.add_argument("configs", nargs="+", help="chart JSON files")
+    ap.add_argument("--out", default="out", help="output directory")
+    ap.add_argument("--formats", default="csv,html", help=f"comma list of {', '.join(FORMATS)}")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="render processes")
+    ap.add_argument("--fetch-workers", type=int, default=MAX_WORKERS, help="concurrent downloads")
+    ap.add_argument("--xasset-key", default=None, help="defaults to VANDA_XASSET_API_KEY")
+    ap.add_argument("--vt-key", default=None, help="defaults to VANDATRACK_API_KEY")
+    args = ap.parse_args(argv)
+
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    bad = [f for f in formats if f not in FORMATS]
+    if bad:
+        ap.error(f"unknown format(s): {', '.join(bad)}")
+    if args.xasset_key:
+        xa.set_key(args.xasset_key)
+    if args.vt_key:
+        vt.set_key(args.vt_key)
+
+    charts = load_charts(args.configs)
+    n_series = len({series_key(it) for c in charts for it in c["items"]})
+    print(f"{len(charts)} charts, {n_series} distinct series", file=sys.stderr)
+    results = run_batch(charts, args.out, formats, workers=args.workers, fetch_workers=args.fetch_workers)
+    failed = 0
+    for r in results:
+        if r["error"]:
+            failed += 1
+            print(f"[WARN] {r['chart']}: {r['error']}", file=sys.stderr)
+        else:
+            print(f"{r['chart']}: {r['rows']} rows -> {', '.join(r['files'])}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
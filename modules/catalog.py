@@ -0,0 +1,246 @@
+import os
+import re
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from . import rate_limit
+from . import vanda_xasset_api as xa
+
+# === Config ===
+MAPPING_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "mapping.csv")
+INCLUDE_LIVE = os.getenv("VANDA_CATALOG_LIVE", "0") in ("1", "true", "True")
+FACETS = ["asset_type", "asset_subtype", "geography", "region", "dm_em", "investor_type", "model_id"]
+PATH_FACET = "key"  # "/"-separated hierarchy, browsed level by level
+# Text search: indexed columns and their weight in the relevance score (model and geography
+# codes match at a lower weight so "CFTC" or "EMEA" find series without outranking names)
+SEARCH_FIELDS = {"series_id": 3.0, "name": 2.0, "benchmark": 1.5, "description": 1.0,
+                 "model_id": 0.75, "geography": 0.5, "region": 0.5, "country": 0.5}
+MIN_COVERAGE = 0.5   # share of the query's trigrams a row must contain (in any field)
+TOP_K = 200
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_lock = threading.Lock()
+_index: Optional["CatalogIndex"] = None
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(str(text).lower())
+
+def trigrams(text: str) -> Set[str]:
+    """Distinct trigrams of each token, padded so word starts and ends count ("  n", " na", ..., "q ")."""
+    out: Set[str] = set()
+    for tok in tokenize(text):
+        padded = f"  {tok} "
+        out.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return out
+
+# === Facets ===
+Filters = Dict[str, Iterable[str]]
+
+class FacetIndex:
+    """
+    Bitmap index over the catalog's categorical columns, for faceted browsing with live counts.
+    Each facet column is categorical-encoded once and every value gets a bitset of the rows
+    carrying it (a Python int, bit i = row i). Values selected within a facet are OR-ed, facets
+    are AND-ed, and a count is one AND plus a popcount, so no query rescans the DataFrame.
+    Every directory prefix of the `key` path is indexed the same way for drill-down.
+    """
+
+    def __init__(self, df: pd.DataFrame, facets: List[str] = FACETS, path_col: str = PATH_FACET):
+        self.n = len(df)
+        self.all = (1 << self.n) - 1
+        self.facets = [c for c in facets if c in df.columns]
+        self.bits: Dict[str, Dict[str, int]] = {}
+        for col in self.facets:
+            cat = pd.Categorical(df[col])
+            codes = np.asarray(cat.codes)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(cat.categories) + 1))
+            self.bits[col] = {str(v): self.bitset(order[bounds[i]:bounds[i + 1]])
+                              for i, v in enumerate(cat.categories)}
+
+        rows_by_path: Dict[str, List[int]] = {}
+        self._children: Dict[str, List[str]] = {}
+        if path_col in df.columns:
+            for row, key in enumerate(df[path_col].tolist()):
+                if not isinstance(key, str):
+                    continue
+                parts = key.strip("/").split("/")[:-1]  # last part is the file name
+                for i in range(1, len(parts) + 1):
+                    prefix = "/".join(parts[:i])
+                    if prefix not in rows_by_path:
+                        rows_by_path[prefix] = []
+                        self._children.setdefault("/".join(parts[:i - 1]), []).append(prefix)
+                    rows_by_path[prefix].append(row)
+        self.paths: Dict[str, int] = {p: self.bitset(r) for p, r in rows_by_path.items()}
+        for kids in self._children.values():
+            kids.sort()
+
+    def bitset(self, rows: Iterable[int]) -> int:
+        """Row positions -> bitset."""
+        flags = np.zeros(self.n, dtype=bool)
+        flags[np.fromiter(rows, dtype=np.int64)] = True
+        return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
+    def rows(self, mask: int) -> np.ndarray:
+        """Bitset -> sorted row positions."""
+        raw = np.frombuffer(mask.to_bytes((self.n + 7) // 8, "little"), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(raw, bitorder="little")[:self.n])
+
+    def mask(self, filters: Optional[Filters] = None, path: Optional[str] = None,
+             base: Optional[int] = None, exclude: Optional[str] = None) -> int:
+        """Rows matching every facet selection (and under `path`, and within `base`)."""
+        m = self.all if base is None else base
+        for col, values in (filters or {}).items():
+            values = list(values or [])
+            if col == exclude or not values:
+                continue
+            col_bits = self.bits.get(col, {})
+            sel = 0
+            for v in values:
+                sel |= col_bits.get(str(v), 0)
+            m &= sel
+        if path:
+            m &= self.paths.get(path.strip("/"), 0)
+        return m
+
+    def counts(self, filters: Optional[Filters] = None, path: Optional[str] = None,
+               base: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Per facet value, how many rows the selection would match with that value picked.
+        A facet's own selection is left out of its counts, so alternatives stay visible.
+        """
+        out = {}
+        for col in self.facets:
+            m = self.mask(filters, path, base, exclude=col)
+            out[col] = {v: (b & m).bit_count() for v, b in self.bits[col].items()}
+        return out
+
+    def children(self, path: str = "", filters: Optional[Filters] = None,
+                 base: Optional[int] = None) -> Dict[str, int]:
+        """Next level below `path`: child name -> matching rows under the selection."""
+        m = self.mask(filters, None, base)
+        path = (path or "").strip("/")
+        return {child.rsplit("/", 1)[-1]: (self.paths[child] & m).bit_count()
+                for child in self._children.get(path, [])}
+
+class CatalogIndex:
+    """
+    Ranked trigram index over a series catalog's text columns (SEARCH_FIELDS), plus facets.
+    Each trigram maps to an array of (row, field) codes, with one extra "any field" code per
+    row, so scoring a query is a single bincount over the postings of its trigrams:
+      - coverage: share of the query's trigrams found anywhere in the row (filters out noise,
+        tolerates typos and word order)
+      - per field, Dice similarity 2*matched / (query + field trigrams), weighted by field,
+        so exact ids and short names that match closely rank above passing mentions.
+    """
+
+    def __init__(self, df: pd.DataFrame, fields: Dict[str, float] = SEARCH_FIELDS):
+        self.df = df.reset_index(drop=True)
+        n = len(self.df)
+        self.fields = [c for c in fields if c in self.df.columns]
+        self._weights = np.array([fields[c] for c in self.fields], dtype=float)
+        self._weights /= self._weights.sum() if len(self.fields) else 1.0
+        width = len(self.fields) + 1  # last slot: any field
+        self._width = width
+        self._lens = np.zeros((n, len(self.fields)), dtype=np.int32)
+        postings: Dict[str, List[int]] = {}
+        for f, col in enumerate(self.fields):
+            for row, value in enumerate(self.df[col].tolist()):
+                if value is None or value != value:  # None / NaN
+                    continue
+                grams = trigrams(value)
+                self._lens[row, f] = len(grams)
+                for g in grams:
+                    postings.setdefault(g, []).append(row * width + f)
+        for codes in postings.values():
+            codes.extend(sorted({c - c % width + width - 1 for c in codes}))
+        self._postings = {g: np.array(codes, dtype=np.int32) for g, codes in postings.items()}
+        self.facets = FacetIndex(self.df)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def rank(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(row positions, scores) of every matching row, best first; all rows unscored for an empty query."""
+        grams = trigrams(query)
+        n = len(self.df)
+        if not grams:
+            return np.arange(n), np.zeros(n)
+        arrays = [self._postings[g] for g in grams if g in self._postings]
+        if not arrays:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        q = len(grams)
+        matched = np.bincount(np.concatenate(arrays), minlength=n * self._width).reshape(n, self._width)
+        coverage = matched[:, -1] / q
+        rows = np.flatnonzero(coverage >= MIN_COVERAGE)
+        dice = 2.0 * matched[rows, :-1] / (q + self._lens[rows])
+        scores = coverage[rows] + dice @ self._weights
+        order = np.lexsort((rows, -scores))
+        return rows[order], scores[order]
+
+    def lookup(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """Row positions matching the query, most relevant first (catalog order for an empty query)."""
+        rows, _ = self.rank(query)
+        return rows[:limit].tolist()
+
+    def search(self, query: str, filters: Optional[Filters] = None, path: Optional[str] = None,
+               limit: Optional[int] = TOP_K) -> pd.DataFrame:
+        """Top `limit` matches within the facet selection, with a relevance `score` column for text queries."""
+        rows, scores = self.rank(query)
+        if filters or path:
+            m = self.facets.mask(filters, path)
+            keep = np.fromiter((m >> int(r) & 1 for r in rows), dtype=bool, count=len(rows))
+            rows, scores = rows[keep], scores[keep]
+        out = self.df.iloc[rows[:limit]]
+        if query.strip():
+            out = out.assign(score=scores[:limit].round(3))
+        return out
+
+# === Catalog loading ===
+def load_mapping(path: str = MAPPING_CSV) -> pd.DataFrame:
+    try:
+        df = pd.read_csv(path, dtype=str)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] could not read catalog {path}: {e}")
+        return pd.DataFrame(columns=["series_id"])
+    df = df.dropna(subset=["series_id"]).drop_duplicates(subset=["series_id"])
+    df["source"] = "VandaXAsset"
+    return df
+
+def _load_live() -> pd.DataFrame:
+    # Imported lazily: data_explorer imports this module
+    from .data_explorer import load_catalog_xasset
+    live = load_catalog_xasset()
+    if live.empty or "series_id" not in live.columns:
+        return pd.DataFrame()
+    return live.astype({"series_id": str})
+
+def build_index(include_live: bool = INCLUDE_LIVE) -> CatalogIndex:
+    df = load_mapping()
+    if include_live and xa.have_key():
+        try:
+            live = _load_live()
+        except rate_limit.RateLimited as e:
+            print(f"[WARN] live catalog skipped: {e}")
+            live = pd.DataFrame()
+        if not live.empty:
+            df = pd.concat([df, live[~live["series_id"].isin(df["series_id"])]], ignore_index=True)
+    return CatalogIndex(df.astype(object).where(df.notna(), None))
+
+def get_index(include_live: bool = INCLUDE_LIVE) -> CatalogIndex:
+    """Process-wide index, built once and shared by all sessions."""
+    global _index
+    with _lock:
+        if _index is None:
+            _index = build_index(include_live=include_live)
+        return _index
+
+def refresh_index(include_live: bool = INCLUDE_LIVE) -> CatalogIndex:
+    global _index
+    idx = build_index(include_live=include_live)
+    with _lock:
+        _index = idx
+    return idx
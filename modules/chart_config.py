@@ -1,5 +1,9 @@
+import json
+import hashlib
 import streamlit as st
 
+from .utils import is_mock
+
 def ensure_state():
     if "chart_items" not in st.session_state:
         st.session_state["chart_items"] = []
@@ -15,7 +19,61 @@ def remove_item(idx: int):
 
 def clear_items():
     st.session_state["chart_items"] = []
+    st.session_state["derived_series"] = []
 
 def get_items():
     ensure_state()
-    return st.session_state["chart_items"]
\ No newline at end of file
+    return st.session_state["chart_items"]
+
+# === Data memo (per session): fetched series and the aligned frame ===
+def item_key(item: dict) -> str:
+    """Identity of one item: its request parameters and label (the label names its columns)."""
+    return json.dumps(item, sort_keys=True, default=str)
+
+def items_hash(items) -> str:
+    return hashlib.sha1("\n".join(item_key(it) for it in items).encode("utf-8")).hexdigest()
+
+def _series_memo() -> dict:
+    return st.session_state.setdefault("series_memo", {})
+
+def get_cached_series(item: dict):
+    return _series_memo().get(item_key(item))
+
+def cache_series(item: dict, df):
+    """Keep a fetched frame; failed fetches (None) and placeholder mock frames are not kept."""
+    if df is None or is_mock(df):
+        return
+    _series_memo()[item_key(item)] = df
+
+def prune_series_cache(items):
+    """Forget series no longer on the chart."""
+    keep = {item_key(it) for it in items}
+    memo = _series_memo()
+    for k in [k for k in memo if k not in keep]:
+        del memo[k]
+
+def get_aligned(items):
+    """The aligned frame for exactly this item list, or None."""
+    entry = st.session_state.get("aligned_memo")
+    if entry is not None and entry["key"] == items_hash(items):
+        return entry["data"]
+    return None
+
+def set_aligned(items, merged):
+    st.session_state["aligned_memo"] = {"key": items_hash(items), "data": merged}
+
+def clear_data_cache():
+    st.session_state.pop("series_memo", None)
+    st.session_state.pop("aligned_memo", None)
+
+# === Derived series (expressions over chart labels, see modules/expressions.py) ===
+def get_derived():
+    return st.session_state.setdefault("derived_series", [])
+
+def add_derived(label: str, expr: str):
+    get_derived().append({"label": label, "expr": expr})
+
+def remove_derived(idx: int):
+    derived = get_derived()
+    if 0 <= idx < len(derived):
+        derived.pop(idx)
@@ -0,0 +1,157 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import pandas as pd
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from . import rate_limit
+from .fetch import fetch_items
+from .utils import is_mock, outer_merge_on_date
+
+# === Config ===
+DASHBOARD_DIR = os.getenv("VANDA_DASHBOARD_DIR", "dashboards")
+
+try:
+    import pyarrow  # noqa: F401
+    _SNAP_EXT = ".parquet"
+except ImportError:
+    _SNAP_EXT = ".pkl.gz"
+
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vanda-dash-refresh")
+_refresh_lock = threading.Lock()
+_refreshing: Dict[str, Future] = {}
+
+def _slug(name: str) -> str:
+    """Readable and collision-safe: "a b" and "a_b" share the readable part, not the hash."""
+    readable = re.sub(r"[^\w.-]+", "_", name.strip()) or "dashboard"
+    digest = hashlib.blake2b(name.strip().encode("utf-8"), digest_size=4).hexdigest()
+    return f"{readable}-{digest}"
+
+def _paths(name: str):
+    base = os.path.join(DASHBOARD_DIR, _slug(name))
+    return base + ".json", base + _SNAP_EXT
+
+def _write_snapshot(path: str, merged: pd.DataFrame):
+    tmp = path + ".tmp"
+    if _SNAP_EXT == ".parquet":
+        merged.to_parquet(tmp, index=False, compression="zstd")
+    else:
+        merged.to_pickle(tmp, compression="gzip")
+    os.replace(tmp, path)
+
+def _read_snapshot(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_pickle(path, compression="gzip")
+
+def save_dashboard(name: str, items: List[Dict], settings: Dict[str, Dict],
+                   merged: Optional[pd.DataFrame] = None, derived: Optional[List[Dict]] = None) -> str:
+    """
+    Save items + per-series styles (+ derived series expressions) under `name`; with `merged`
+    (the aligned frame, before derived series and client-side normalization) a compressed
+    snapshot is stored so the dashboard reopens offline.
+    """
+    os.makedirs(DASHBOARD_DIR, exist_ok=True)
+    meta_path, snap_path = _paths(name)
+    has_snapshot = merged is not None and not merged.empty
+    if has_snapshot:
+        _write_snapshot(snap_path, merged)
+    elif os.path.exists(snap_path):
+        os.remove(snap_path)
+    meta = {
+        "name": name,
+        "items": items,
+        "settings": settings,
+        "derived": derived or [],
+        "saved_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "snapshot": has_snapshot,
+        "snapshot_at": pd.Timestamp.now().isoformat(timespec="seconds") if has_snapshot else None,
+    }
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, default=str)
+    os.replace(tmp, meta_path)
+    return meta_path
+
+def list_dashboards() -> List[str]:
+    if not os.path.isdir(DASHBOARD_DIR):
+        return []
+    names = []
+    for fn in sorted(os.listdir(DASHBOARD_DIR)):
+        if fn.endswith(".json"):
+            try:
+                with open(os.path.join(DASHBOARD_DIR, fn), "r", encoding="utf-8") as f:
+                    names.append(json.load(f).get("name") or fn[:-5])
+            except (OSError, ValueError):
+                continue
+    return names
+
+def load_dashboard(name: str) -> Optional[Dict]:
+    """Returns the saved metadata plus 'data' (snapshot frame or None). No network calls."""
+    meta_path, snap_path = _paths(name)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    meta["data"] = None
+    if meta.get("snapshot") and os.path.exists(snap_path):
+        try:
+            meta["data"] = _read_snapshot(snap_path)
+        except Exception as e:
+            print(f"[WARN] could not read snapshot for {name}: {e}")
+    return meta
+
+def delete_dashboard(name: str):
+    for path in _paths(name):
+        if os.path.exists(path):
+            os.remove(path)
+
+# === Background refresh ===
+def _refresh(name: str) -> Dict:
+    meta = load_dashboard(name)
+    if meta is None:
+        raise ValueError(f"No dashboard named {name!r}")
+    with rate_limit.lane("background"):
+        results = fetch_items(meta["items"])
+    errors = []
+    for it, (df, err) in zip(meta["items"], results):
+        if err is not None:
+            errors.append(f"{it.get('label')}: {err}")
+        elif is_mock(df):
+            errors.append(f"{it.get('label')}: no data from the API")
+    if errors:
+        # A partial or placeholder refresh must not replace the last good snapshot
+        return {"rows": 0, "errors": errors, "saved": False}
+    merged = outer_merge_on_date([df for df, _ in results])
+    save_dashboard(name, meta["items"], meta["settings"], merged, meta.get("derived"))
+    return {"rows": 0 if merged is None else int(len(merged)), "errors": [], "saved": True}
+
+def refresh_in_background(name: str) -> Future:
+    """Refetch a dashboard's series off the UI thread and rewrite its snapshot."""
+    with _refresh_lock:
+        fut = _refreshing.get(name)
+        if fut is None or fut.done():
+            fut = _refresh_pool.submit(_refresh, name)
+            _refreshing[name] = fut
+        return fut
+
+def refresh_status(name: str) -> Optional[str]:
+    """None (never refreshed), 'running', 'done' or 'failed: ...'."""
+    with _refresh_lock:
+        fut = _refreshing.get(name)
+    if fut is None:
+        return None
+    if not fut.done():
+        return "running"
+    err = fut.exception()
+    if err is not None:
+        return f"failed: {err}"
+    errors = fut.result()["errors"]
+    if errors:
+        more = f" (+{len(errors) - 3} more)" if len(errors) > 3 else ""
+        return f"failed, previous snapshot kept: {'; '.join(errors[:3])}{more}"
+    return "done"
@@ -1,6 +1,7 @@
 import pandas as pd
-from typing import Literal
+from typing import Dict, List, Literal, Optional
 from . import vanda_xasset_api as xa
+from . import catalog
 
 def load_catalog_xasset() -> pd.DataFrame:
     fl = xa.filter_list()
@@ -22,14 +23,13 @@ def load_catalog_xasset() -> pd.DataFrame:
         return cat
     return pd.DataFrame()
 
-def unified_search(keyword: str, source: Literal["All","VandaXAsset","VandaTrack"]="All") -> pd.DataFrame:
+def unified_search(keyword: str, source: Literal["All","VandaXAsset","VandaTrack"]="All",
+                   filters: Optional[Dict[str, List[str]]] = None, path: Optional[str] = None) -> pd.DataFrame:
     keyword = (keyword or "").strip()
     frames = []
     if source in ["All","VandaXAsset"]:
-        xcat = load_catalog_xasset()
-        if not xcat.empty and keyword:
-            mask = xcat.astype(str).apply(lambda c: c.str.contains(keyword, case=False, na=False))
-            xcat = xcat.loc[mask.any(axis=1)]
+        # Local inverted index (data/mapping.csv, optionally merged with the live catalog)
+        xcat = catalog.get_index().search(keyword, filters=filters, path=path)
         if not xcat.empty:
             frames.append(xcat)
     if not frames:
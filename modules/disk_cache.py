@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import pandas as pd
+from typing import Callable, Dict, Optional, List, Tuple
+
+from . import tracing
+
+# === Config ===
+CACHE_DIR = os.getenv("VANDA_CACHE_DIR", os.path.join(".cache", "timeseries"))
+MAX_BYTES = int(float(os.getenv("VANDA_CACHE_MAX_MB", "512")) * 1024 * 1024)
+_ENABLED = os.getenv("VANDA_DISK_CACHE", "1") not in ("0", "false", "False")
+TAIL_TTL_S = float(os.getenv("VANDA_CACHE_TAIL_TTL", "900"))  # open last day, when no ttl says otherwise
+
+try:
+    import pyarrow  # noqa: F401
+    _EXT = ".parquet"
+except ImportError:
+    _EXT = ".pkl"
+
+_lock = threading.RLock()
+_index: Optional[Dict[str, Dict]] = None
+
+Fetcher = Callable[[Optional[str], Optional[str]], pd.DataFrame]
+
+def set_enabled(flag: bool):
+    global _ENABLED
+    _ENABLED = bool(flag)
+
+def is_enabled() -> bool:
+    return _ENABLED
+
+# === Keys & index ===
+def _normalize(params: Dict) -> Dict:
+    """Drop empty values and sort list params so equivalent requests share a key."""
+    out = {}
+    for k, v in params.items():
+        if v is None or v == "" or v == []:
+            continue
+        if isinstance(v, (list, tuple)):
+            v = sorted(str(x).strip().upper() for x in v)
+        out[k] = v
+    return out
+
+def make_key(namespace: str, params: Dict) -> str:
+    raw = json.dumps({"ns": namespace, "p": _normalize(params)}, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24]
+
+def _index_path() -> str:
+    return os.path.join(CACHE_DIR, "index.json")
+
+def _load_index() -> Dict[str, Dict]:
+    global _index
+    if _index is None:
+        try:
+            with open(_index_path(), "r", encoding="utf-8") as f:
+                _index = json.load(f)
+        except (OSError, ValueError):
+            _index = {}
+    return _index
+
+def _save_index():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = _index_path() + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(_index, f)
+    os.replace(tmp, _index_path())
+
+# === Frame IO ===
+def _read(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+def _write(key: str, df: pd.DataFrame) -> Tuple[str, int]:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, key + _EXT)
+    tmp = path + ".tmp"
+    if _EXT == ".parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, path)
+    return path, os.path.getsize(path)
+
+def _evict():
+    """Drop least-recently-used entries until the cache fits in MAX_BYTES."""
+    idx = _load_index()
+    total = sum(e.get("bytes", 0) for e in idx.values())
+    for key, entry in sorted(idx.items(), key=lambda kv: kv[1].get("atime", 0)):
+        if total <= MAX_BYTES:
+            break
+        try:
+            os.remove(entry["path"])
+        except OSError:
+            pass
+        total -= entry.get("bytes", 0)
+        del idx[key]
+
+def clear():
+    with _lock:
+        for entry in _load_index().values():
+            try:
+                os.remove(entry["path"])
+            except OSError:
+                pass
+        _index.clear()
+        _save_index()
+
+def stats() -> Dict:
+    with _lock:
+        idx = _load_index()
+        return {
+            "entries": len(idx),
+            "bytes": sum(e.get("bytes", 0) for e in idx.values()),
+            "max_bytes": MAX_BYTES,
+            "format": _EXT.lstrip("."),
+        }
+
+# === Range helpers ===
+def _day(s: str, offset: int = 0) -> str:
+    return (pd.Timestamp(s) + pd.Timedelta(days=offset)).strftime("%Y-%m-%d")
+
+def _today() -> str:
+    return pd.Timestamp.today().strftime("%Y-%m-%d")
+
+def _merge(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    if old is None or old.empty:
+        out = new
+    elif new is None or new.empty:
+        out = old
+    else:
+        out = pd.concat([old, new], ignore_index=True)
+    if out is None or out.empty or "date" not in out.columns:
+        return out
+    out["date"] = pd.to_datetime(out["date"], errors="coerce")
+    id_cols = [c for c in ("date", "ticker") if c in out.columns]
+    out = out.drop_duplicates(subset=id_cols, keep="last")
+    return out.sort_values(id_cols).reset_index(drop=True)
+
+def _slice(df: pd.DataFrame, start: Optional[str], end: Optional[str]) -> pd.DataFrame:
+    if df.empty or "date" not in df.columns:
+        return df
+    mask = pd.Series(True, index=df.index)
+    if start:
+        mask &= df["date"] >= pd.Timestamp(start)
+    if end:
+        mask &= df["date"] <= pd.Timestamp(end)
+    return df.loc[mask].reset_index(drop=True)
+
+def _open(entry: Dict) -> bool:
+    """Was the entry's last day still open (the day of the fetch) when it was fetched?"""
+    fetched = entry.get("fetched_at")
+    day = _today() if fetched is None else time.strftime("%Y-%m-%d", time.localtime(fetched))
+    return entry["to"] >= day
+
+def _expired(entry: Dict) -> bool:
+    """An open entry past its "fresh_until"; closed ranges don't change."""
+    return _open(entry) and entry.get("fresh_until", 0) <= time.time()
+
+def _gaps(entry: Dict, start: Optional[str], end: str) -> List[Tuple[Optional[str], str]]:
+    """
+    Date ranges missing from a cached entry. Days after a closed entry are always missing;
+    an open entry's last day (and anything after it) is re-fetched once it has expired, so
+    data published later the same day is picked up.
+    """
+    gaps = []
+    cov_from, cov_to = entry.get("from"), entry["to"]
+    if cov_from is not None and (start is None or start < cov_from):
+        gaps.append((start, _day(cov_from, -1)))
+    if (end > cov_to and not _open(entry)) or (end >= cov_to and _expired(entry)):
+        gaps.append((cov_to, end))
+    return gaps
+
+# === Public entry point ===
+def get_range(namespace: str,
+              params: Dict,
+              start: Optional[str],
+              end: Optional[str],
+              fetch: Fetcher,
+              incremental: bool = True,
+              ttl: Optional[Callable[[pd.DataFrame], Optional[float]]] = None) -> pd.DataFrame:
+    """
+    Return the frame for `params` over [start, end], reading from the on-disk cache.
+      - namespace: endpoint name, e.g. "xasset.timeseries"
+      - params: request parameters excluding the date range
+      - fetch(start, end): performs the network call and raises on failure
+      - incremental: when True only the missing date range is fetched and merged in;
+        set False for server-side transforms (z-scores, rolling sums) that depend on the window
+      - ttl(frame): seconds until new data can appear upstream (see freshness.ttl_for,
+        TAIL_TTL_S when None); an entry covering today is tail-refreshed (or, when not
+        incremental, refetched) once that has passed
+    A start of None means "full history"; an end of None means today.
+    """
+    if not _ENABLED:
+        return fetch(start, end)
+
+    end = end or _today()
+    if not incremental:
+        params = {**params, "__from": start, "__to": end}
+    key = make_key(namespace, params)
+
+    with tracing.span("cache.read", namespace=namespace) as sp:
+        with _lock:
+            entry = _load_index().get(key)
+            cached = None
+            if entry is not None:
+                try:
+                    cached = _read(entry["path"])
+                except (OSError, ValueError):
+                    entry, cached = None, None
+        hit = entry is not None and not (_gaps(entry, start, end) if incremental else _expired(entry))
+        sp["result"] = "hit" if hit else "miss" if entry is None else "partial"
+
+    if hit:
+        with _lock:
+            entry["atime"] = time.time()
+            _save_index()
+        return _slice(cached, start, end) if incremental else cached
+
+    if entry is None:
+        merged = fetch(start, end)
+        if merged is None or merged.empty:
+            return merged if merged is not None else pd.DataFrame()
+        merged = _merge(None, merged)
+        cov_from, cov_to = start, end
+    elif not incremental:
+        try:
+            merged = fetch(start, end)
+        except Exception as e:
+            print(f"[WARN] disk_cache refresh failed for {namespace}: {e}")
+            return cached
+        if merged is None or merged.empty:
+            return cached
+        merged = _merge(None, merged)
+        cov_from, cov_to = start, end
+    else:
+        merged = cached
+        try:
+            for g_start, g_end in _gaps(entry, start, end):
+                merged = _merge(merged, fetch(g_start, g_end))
+        except Exception as e:
+            # Serve what we have rather than failing the whole range; retried next time
+            print(f"[WARN] disk_cache gap fetch failed for {namespace}: {e}")
+            return _slice(cached, start, end)
+        cov_from = None if start is None or entry.get("from") is None else min(start, entry["from"])
+        cov_to = max(end, entry["to"])
+
+    with _lock:
+        try:
+            path, size = _write(key, merged)
+        except Exception as e:
+            print(f"[WARN] disk_cache write failed: {e}")
+            return _slice(merged, start, end)
+        entry = {
+            "namespace": namespace,
+            "path": path,
+            "bytes": size,
+            "from": cov_from,
+            # Never mark future days as covered; they are fetched again once published
+            "to": min(cov_to, _today()),
+            "atime": time.time(),
+            "fetched_at": time.time(),
+        }
+        secs = ttl(merged) if ttl is not None else None
+        entry["fresh_until"] = entry["fetched_at"] + (TAIL_TTL_S if secs is None else secs)
+        _load_index()[key] = entry
+        _evict()
+        _save_index()
+    return _slice(merged, start, end) if incremental else merged
@@ -0,0 +1,321 @@
+"""
+Derived series: expressions over the labels already on the chart, evaluated on the aligned
+frame from outer_merge_on_date, so they cost no upstream calls.
+
+    `AAPL buy` - `AAPL sell`
+    SPX / `MSCI World` * 100
+    rebase(rolling_mean(`NVDA net`, 20), 100, "2024-01-02")
+    pct_change(GOLD, "1y")
+
+Labels are written in backticks (bare names work for labels that are valid identifiers).
+Arithmetic is + - * / ** on float64 (constant parts are folded once at compile time), and
+quoted text is only accepted where a period or date goes; functions:
+
+    shift(x, n)                 lag by n observations, or by a period ("1w", "3m", "1y")
+    diff(x, n=1)                x - shift(x, n)
+    pct_change(x, n=1)          x / shift(x, n) - 1
+    rolling_sum|mean|std|min|max(x, window)    window: n observations or a period
+    rebase(x, base=100, at=None)               x scaled to `base` at its first value (or at `at`)
+    zscore(x, window="all")     "all", "2y" or "5y", as in the chart items
+    ffill(x)                    carry the last value forward (mixing frequencies)
+    log(x) exp(x) abs(x) sqrt(x)
+
+Observation-based operations (shift/diff/rolling with a count) act on the series' own
+non-missing rows, so a weekly series shifted by 1 is last week's value, not the previous
+row of the merged daily frame. An expression is parsed once into a tree of closures
+(compile_expression caches by text); evaluation is whole-column numpy/pandas work.
+"""
+import re
+import ast
+import threading
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import VariableOffsetWindowIndexer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import transforms
+
+# === Config ===
+MAX_LENGTH = 2000     # characters per expression
+MAX_CACHED = 256      # compiled expressions kept
+
+_PERIOD_RE = re.compile(r"^\s*(\d+)\s*([dwmy])\s*$", re.IGNORECASE)
+_PERIOD_UNITS = {"d": "days", "w": "weeks", "m": "months", "y": "years"}
+_REF_RE = re.compile(r"`([^`]*)`")
+
+_lock = threading.Lock()
+_compiled: Dict[str, "Expression"] = {}
+
+class ExpressionError(ValueError):
+    """The expression can't be parsed or evaluated (message is shown to the user)."""
+
+# === Helpers on date-indexed series ===
+def _period(window) -> Optional[pd.DateOffset]:
+    """'3m' -> DateOffset(months=3); None for an observation count."""
+    if isinstance(window, str):
+        m = _PERIOD_RE.match(window)
+        if m is None:
+            raise ExpressionError(f"bad period {window!r} (expected e.g. 5d, 2w, 3m, 1y)")
+        return pd.DateOffset(**{_PERIOD_UNITS[m.group(2).lower()]: int(m.group(1))})
+    if isinstance(window, (int, float)) and float(window).is_integer():
+        return None
+    raise ExpressionError(f"window must be a whole number of observations or a period, got {window!r}")
+
+def _count(window, minimum: int = 0) -> int:
+    n = int(window)
+    if n < minimum:
+        raise ExpressionError(f"window must be at least {minimum}, got {n}")
+    return n
+
+def _series(x, name: str) -> pd.Series:
+    if not isinstance(x, pd.Series):
+        raise ExpressionError(f"{name}() needs a series, got {x!r}")
+    return x
+
+def _shift(x, n=1) -> pd.Series:
+    s = _series(x, "shift")
+    obs = s.dropna()
+    offset = _period(n)
+    if offset is None:
+        return obs.shift(_count(n)).reindex(s.index)
+    # Last observation on or before t - offset, at the dates the series is observed
+    prev = obs.reindex(obs.index - offset, method="ffill").to_numpy()
+    return pd.Series(prev, index=obs.index).reindex(s.index)
+
+def _diff(x, n=1) -> pd.Series:
+    return _series(x, "diff") - _shift(x, n)
+
+def _pct_change(x, n=1) -> pd.Series:
+    return _series(x, "pct_change") / _shift(x, n) - 1.0
+
+def _rolling(how: str) -> Callable:
+    def run(x, window) -> pd.Series:
+        s = _series(x, f"rolling_{how}")
+        obs = s.dropna()
+        offset = _period(window)
+        if offset is None:
+            n = _count(window, minimum=1)
+            roll = obs.rolling(n, min_periods=n)
+        else:
+            roll = obs.rolling(VariableOffsetWindowIndexer(index=obs.index, offset=offset), min_periods=1)
+        return getattr(roll, how)().reindex(s.index)
+    run.__name__ = f"rolling_{how}"
+    return run
+
+def _rebase(x, base=100.0, at=None) -> pd.Series:
+    s = _series(x, "rebase")
+    obs = s.dropna()
+    if obs.empty:
+        return s
+    if at is None:
+        ref = obs.iloc[0]
+    else:
+        try:
+            before = obs.loc[:pd.Timestamp(at)]
+        except (TypeError, ValueError):
+            raise ExpressionError(f"rebase(): bad date {at!r}")
+        ref = before.iloc[-1] if not before.empty else obs.iloc[0]
+    return s / ref * float(base) if ref else s * np.nan
+
+def _zscore(x, window="all") -> pd.Series:
+    s = _series(x, "zscore")
+    if window != "all" and window not in transforms.Z_WINDOWS:
+        raise ExpressionError(f"zscore() window must be 'all' or one of {sorted(transforms.Z_WINDOWS)}")
+    return transforms.zscore(s.dropna(), window).reindex(s.index)
+
+def _ffill(x) -> pd.Series:
+    return _series(x, "ffill").ffill()
+
+def _ufunc(fn: Callable) -> Callable:
+    def run(x):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return fn(x)
+    return run
+
+# name -> (function, min args, max args)
+FUNCTIONS: Dict[str, Tuple[Callable, int, int]] = {
+    "shift": (_shift, 1, 2),
+    "diff": (_diff, 1, 2),
+    "pct_change": (_pct_change, 1, 2),
+    "rolling_sum": (_rolling("sum"), 2, 2),
+    "rolling_mean": (_rolling("mean"), 2, 2),
+    "rolling_std": (_rolling("std"), 2, 2),
+    "rolling_min": (_rolling("min"), 2, 2),
+    "rolling_max": (_rolling("max"), 2, 2),
+    "rebase": (_rebase, 1, 3),
+    "zscore": (_zscore, 1, 2),
+    "ffill": (_ffill, 1, 1),
+    "log": (_ufunc(np.log), 1, 1),
+    "exp": (_ufunc(np.exp), 1, 1),
+    "abs": (_ufunc(np.abs), 1, 1),
+    "sqrt": (_ufunc(np.sqrt), 1, 1),
+}
+
+# name -> argument positions that take a period or date string
+_TEXT_ARGS: Dict[str, Tuple[int, ...]] = {
+    "shift": (1,), "diff": (1,), "pct_change": (1,), "zscore": (1,), "rebase": (2,),
+    **{f"rolling_{how}": (1,) for how in ("sum", "mean", "std", "min", "max")},
+}
+
+# Operands are float64 scalars or float64 series, so ** can't turn into big-integer work
+_BINOPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Pow: np.power,
+}
+
+# === Compilation ===
+Node = Callable[[Dict[str, pd.Series]], object]
+
+class _Const:
+    """A constant node; kept as a value so operations on constants fold at compile time."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, cols):
+        return self.value
+
+def _number(value) -> np.float64:
+    try:
+        return np.float64(value)
+    except OverflowError:
+        raise ExpressionError(f"number too large: {str(value)[:20]}...")
+
+def _fold(fn: Callable, *args: _Const) -> _Const:
+    with np.errstate(all="ignore"):
+        return _Const(fn(*(a.value for a in args)))
+
+class Expression:
+    """A compiled expression: `refs` are the labels it reads, evaluate() computes it."""
+
+    def __init__(self, text: str, node: Node, refs: List[str]):
+        self.text = text
+        self.refs = refs
+        self._node = node
+
+    def evaluate(self, frame: pd.DataFrame, name: Optional[str] = None) -> pd.Series:
+        """
+        The derived values aligned to frame's rows. `frame` is the merged frame (a sorted
+        'date' column plus one column per label); it is not modified.
+        """
+        missing = [r for r in self.refs if r not in frame.columns]
+        if missing:
+            raise ExpressionError(f"unknown series: {', '.join(missing)}")
+        index = pd.DatetimeIndex(frame["date"])
+        columns = {r: pd.Series(frame[r].to_numpy(dtype="float64", na_value=np.nan), index=index)
+                   for r in self.refs}
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            out = self._node(columns)
+        if not isinstance(out, pd.Series):
+            raise ExpressionError("the expression must use at least one series")
+        values = out.to_numpy(dtype="float64", na_value=np.nan, copy=True)
+        values[~np.isfinite(values)] = np.nan  # x / 0 and log(0) show as gaps
+        return pd.Series(values, index=frame.index, name=name)
+
+def _compile(node: ast.AST, refs: Dict[str, str], used: List[str], text_ok: bool = False) -> Node:
+    """`text_ok`: the node is a period/date argument slot, where a string constant is allowed."""
+    if isinstance(node, ast.Expression):
+        return _compile(node.body, refs, used)
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        if not text_ok:
+            raise ExpressionError(f"text {node.value!r} is only allowed as a period or date argument")
+        return _Const(node.value)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+            and not isinstance(node.value, bool):
+        return _Const(_number(node.value))
+    if isinstance(node, ast.Name):
+        label = refs.get(node.id, node.id)
+        if label not in used:
+            used.append(label)
+        return lambda cols: cols[label]
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+        op = _BINOPS[type(node.op)]
+        left, right = _compile(node.left, refs, used), _compile(node.right, refs, used)
+        if isinstance(left, _Const) and isinstance(right, _Const):
+            return _fold(op, left, right)
+        return lambda cols: op(left(cols), right(cols))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _compile(node.operand, refs, used)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        if isinstance(operand, _Const):
+            return _fold(np.negative, operand)
+        return lambda cols: -operand(cols)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        name = node.func.id
+        if name not in FUNCTIONS:
+            raise ExpressionError(f"unknown function {name}(); available: {', '.join(sorted(FUNCTIONS))}")
+        fn, lo, hi = FUNCTIONS[name]
+        if not lo <= len(node.args) <= hi:
+            want = str(lo) if lo == hi else f"{lo}-{hi}"
+            raise ExpressionError(f"{name}() takes {want} arguments, got {len(node.args)}")
+        slots = _TEXT_ARGS.get(name, ())
+        args = [_compile(a, refs, used, text_ok=i in slots) for i, a in enumerate(node.args)]
+        return lambda cols: fn(*(a(cols) for a in args))
+    if isinstance(node, ast.Call) and node.keywords:
+        raise ExpressionError("function arguments are positional only")
+    raise ExpressionError(f"unsupported syntax: {ast.unparse(node)}")
+
+def compile_expression(text: str) -> Expression:
+    """Parse `text` once (cached by text); raises ExpressionError."""
+    text = (text or "").strip()
+    with _lock:
+        hit = _compiled.get(text)
+    if hit is not None:
+        return hit
+    if not text:
+        raise ExpressionError("empty expression")
+    if len(text) > MAX_LENGTH:
+        raise ExpressionError(f"expression longer than {MAX_LENGTH} characters")
+    # `Any label` -> a placeholder identifier, so the rest parses as Python syntax
+    refs: Dict[str, str] = {}
+
+    def placeholder(m) -> str:
+        name = f"_ref{len(refs)}"
+        refs[name] = m.group(1)
+        return name
+    source = _REF_RE.sub(placeholder, text)
+    if "`" in source:
+        raise ExpressionError("unbalanced backtick")
+    used: List[str] = []
+    try:
+        node = _compile(ast.parse(source, mode="eval"), refs, used)
+    except SyntaxError as e:
+        raise ExpressionError(f"syntax error: {e.msg}")
+    except RecursionError:
+        raise ExpressionError("expression is nested too deeply")
+    if isinstance(node, _Const):
+        raise ExpressionError("the expression must use at least one series")
+    expr = Expression(text, node, used)
+    with _lock:
+        if len(_compiled) >= MAX_CACHED:
+            _compiled.pop(next(iter(_compiled)))
+        _compiled[text] = expr
+    return expr
+
+# === Applying to the merged frame ===
+def apply_derived(merged: pd.DataFrame, derived: List[Dict]) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Add each {"label", "expr"} in `derived` as a column of `merged` (in order, so later
+    expressions may use earlier ones). Returns the new frame and one message per expression
+    that failed; `merged` itself is not modified.
+    """
+    errors = []
+    frame = merged
+    for d in derived or []:
+        label = d.get("label")
+        try:
+            if label in frame.columns:
+                raise ExpressionError(f"label {label!r} is already on the chart")
+            values = compile_expression(d.get("expr", "")).evaluate(frame, name=label)
+        except ExpressionError as e:
+            errors.append(f"{label}: {e}")
+            continue
+        except Exception as e:
+            errors.append(f"{label}: {type(e).__name__}: {e}")
+            continue
+        frame = frame.assign(**{label: values})
+    return frame, errors
@@ -0,0 +1,187 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from . import freshness, tracing
+from . import vanda_xasset_api as xa
+from . import vanda_track_api as vt
+
+# === Defaults (overridable per call or via env) ===
+MAX_WORKERS = int(os.getenv("VANDA_FETCH_WORKERS", "8"))
+DEADLINE_S = float(os.getenv("VANDA_FETCH_DEADLINE", "90"))
+TICK_S = 0.25  # progress callback interval while waiting
+# Merge single-ticker VandaTrack retail items into multi-ticker requests (see plan_batches)
+COALESCE = os.getenv("VANDA_COALESCE", "1") not in ("0", "false", "False")
+MAX_BATCH_TICKERS = int(os.getenv("VANDA_BATCH_TICKERS", "10"))
+
+FetchResult = Tuple[Optional[pd.DataFrame], Optional[Exception]]
+
+def fetch_item(it: Dict,
+               stream: bool = False,
+               on_page: Optional[Callable[[int, int], None]] = None,
+               track_use: bool = True) -> pd.DataFrame:
+    """
+    Fetch a single chart item (the dict schema stored by chart_config.add_item).
+    stream/on_page opt VandaTrack retail pulls into paginated streaming (see vt.retail_flow).
+    track_use counts the fetch towards the item's popularity for pre-warming (see freshness).
+    """
+    with tracing.span("fetch", api=it.get("api"), endpoint=it.get("endpoint"), label=it.get("label")) as sp:
+        df = _fetch_item(it, stream, on_page)
+        sp["rows"] = 0 if df is None else len(df)
+    if track_use:
+        freshness.record_use(it, df)
+    return df
+
+def _fetch_item(it: Dict, stream: bool, on_page: Optional[Callable[[int, int], None]]) -> pd.DataFrame:
+    if it["api"] == "xasset":
+        return xa.timeseries(
+            series_id=it["series_id"],
+            field_name=it.get("field_name"),
+            start_date=it.get("from"),
+            end_date=it.get("to"),
+            label=it.get("label"),
+            frequency=it.get("frequency"),
+            rolling_sum=it.get("rolling_sum"),
+            z_score=it.get("z_score"),
+        )
+    if it.get("endpoint") == "retail":
+        return vt.retail_flow(
+            tickers=it.get("ticker"),
+            flow_type=it.get("type", "net"),
+            from_date=it.get("from"),
+            to_date=it.get("to"),
+            label=it.get("label"),
+            stream=stream,
+            on_page=on_page,
+        )
+    return vt.options_flow(
+        tickers=it.get("ticker"),
+        callput=it.get("callput", "put"),
+        moneyness=it.get("moneyness", "OTM"),
+        size=it.get("size", "small"),
+        from_date=it.get("from"),
+        to_date=it.get("to"),
+        label=it.get("label"),
+        field=it.get("field"),
+    )
+
+def _batch_key(it: Dict) -> Optional[Tuple]:
+    """Items with equal keys can share one /tickers/api/ request; None if the item can't."""
+    ticker = it.get("ticker")
+    if it.get("api") != "track" or it.get("endpoint") != "retail":
+        return None
+    if not isinstance(ticker, str) or not ticker.strip() or "," in ticker:
+        return None
+    return ("retail", it.get("type", "net"), it.get("from"), it.get("to"))
+
+def plan_batches(items: List[Dict], coalesce: Optional[bool] = None) -> List[List[int]]:
+    """
+    Group item positions into fetch units: single-ticker VandaTrack retail items with the same
+    flow type and date range are merged (up to MAX_BATCH_TICKERS tickers per request), every
+    other item is a unit of its own. A ticker already in the open unit (e.g. the same ticker
+    under two labels, in any case) starts a new one, so each unit's tickers are distinct.
+    Units keep the order of their first item.
+    """
+    coalesce = COALESCE if coalesce is None else coalesce
+    units: List[List[int]] = []
+    open_units: Dict[Tuple, Tuple[List[int], set]] = {}
+    for i, it in enumerate(items):
+        key = _batch_key(it) if coalesce else None
+        if key is None:
+            units.append([i])
+            continue
+        ticker = it["ticker"].strip().upper()
+        unit, seen = open_units.get(key, (None, None))
+        if unit is None or len(unit) >= MAX_BATCH_TICKERS or ticker in seen:
+            unit, seen = open_units[key] = ([], set())
+            units.append(unit)
+        unit.append(i)
+        seen.add(ticker)
+    return units
+
+def fetch_batch(batch: List[Dict], track_use: bool = True) -> List[pd.DataFrame]:
+    """Fetch items merged by plan_batches with one request per flow type; one frame per item."""
+    if len(batch) == 1:
+        return [fetch_item(batch[0], track_use=track_use)]
+    first = batch[0]
+    tickers = [it["ticker"].strip() for it in batch]
+    with tracing.span("fetch.batch", api="track", endpoint="retail", tickers=len(tickers)) as sp:
+        frames = vt.retail_flow_many(
+            tickers,
+            flow_type=first.get("type", "net"),
+            from_date=first.get("from"),
+            to_date=first.get("to"),
+            labels={it["ticker"].strip(): it.get("label") for it in batch},
+        )
+        out = [frames[t] for t in tickers]
+        sp["rows"] = sum(len(df) for df in out)
+    if track_use:
+        for it, df in zip(batch, out):
+            freshness.record_use(it, df)
+    return out
+
+def fetch_items(items: List[Dict],
+                max_workers: Optional[int] = None,
+                deadline: Optional[float] = None,
+                stream: bool = False,
+                on_tick: Optional[Callable[[int, int, Dict[int, Tuple[int, int]]], None]] = None) -> List[FetchResult]:
+    """
+    Fetch all chart items concurrently on a bounded thread pool.
+      - max_workers: concurrency limit (defaults to MAX_WORKERS)
+      - deadline: seconds allowed for the whole batch (defaults to DEADLINE_S)
+      - stream: paginated streaming for VandaTrack retail pulls
+      - on_tick(done, total, pages): called on the calling thread while waiting, where
+        pages maps item index -> (pages_done, rows_so_far) for streaming items
+    Single-ticker retail items sharing a flow type and range are fetched together (plan_batches;
+    not when streaming, which reports progress per item).
+    Returns one (df, error) pair per item, in the original item order.
+    Items still running when the deadline passes are reported as TimeoutError.
+    """
+    if not items:
+        return []
+    units = plan_batches(items, coalesce=False if stream else None)
+    workers = max(1, min(max_workers or MAX_WORKERS, len(units)))
+    deadline = DEADLINE_S if deadline is None else deadline
+    progress: Dict[int, Tuple[int, int]] = {}
+
+    def run(unit: List[int]) -> List[pd.DataFrame]:
+        if len(unit) > 1:
+            return fetch_batch([items[i] for i in unit])
+        i = unit[0]
+
+        def on_page(pages: int, rows: int):
+            progress[i] = (pages, rows)
+        return [fetch_item(items[i], stream=stream, on_page=on_page if stream else None)]
+
+    ex = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vanda-fetch")
+    try:
+        futures = [ex.submit(tracing.bind(run), unit) for unit in units]
+        stop_at = time.monotonic() + deadline
+        pending = set(futures)
+        while pending:
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                break
+            _, pending = wait(pending, timeout=min(remaining, TICK_S) if on_tick else remaining)
+            if on_tick:
+                done = sum(len(u) for u, f in zip(units, futures) if f not in pending)
+                on_tick(done, len(items), dict(progress))
+        results: List[Optional[FetchResult]] = [None] * len(items)
+        for unit, fut in zip(units, futures):
+            if not fut.done():
+                fut.cancel()
+                err = TimeoutError(f"not finished within {deadline:.0f}s deadline")
+                outcome = [(None, err)] * len(unit)
+            elif fut.exception() is not None:
+                outcome = [(None, fut.exception())] * len(unit)
+            else:
+                outcome = [(df, None) for df in fut.result()]
+            for i, res in zip(unit, outcome):
+                results[i] = res
+        return results
+    finally:
+        # Don't block the rerun on stragglers past the deadline
+        ex.shutdown(wait=False, cancel_futures=True)
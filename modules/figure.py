@@ -0,0 +1,93 @@
+import pandas as pd
+import plotly.graph_objects as go
+from typing import Dict, Optional
+
+from .downsample import downsample
+
+# Default color palette (fallbacks)
+DEFAULT_COLORS = [
+    "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+    "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"
+]
+
+# === Level-of-detail defaults ===
+LOD_POINTS = 2000          # target points per trace when downsampling
+WEBGL_THRESHOLD = 5000     # switch line/scatter traces to Scattergl above this many points
+
+def build_figure(merged: pd.DataFrame,
+                 chart_settings: Dict[str, Dict],
+                 show_markers: bool = False,
+                 lod_points: Optional[int] = None,
+                 webgl_threshold: Optional[int] = WEBGL_THRESHOLD) -> go.Figure:
+    """
+    Build the combined chart from an aligned frame ('date' + one column per series).
+      - chart_settings: label -> {"type": Line|Bar|Scatter, "axis": Left|Right, "color": hex}
+      - lod_points: downsample each trace to ~this many points (LTTB for lines/scatter,
+        min/max buckets for bars); None sends full resolution
+      - webgl_threshold: line/scatter traces with more points than this use go.Scattergl
+    """
+    traces = []
+
+    # add each series with its chart type / axis / color
+    for col in [c for c in merged.columns if c != "date"]:
+        settings = chart_settings.get(col, None)
+        if settings is None:
+            # fallback settings if not set (e.g., label mismatch)
+            idx = len(traces) % len(DEFAULT_COLORS)
+            settings = {"type": "Line", "axis": "Left", "color": DEFAULT_COLORS[idx]}
+
+        chart_type = settings["type"].lower()
+        axis_side = settings["axis"].lower()
+        color = settings["color"]
+
+        axis_ref = "y" if axis_side == "left" else "y2"
+
+        x, y = merged["date"], merged[col]
+        if lod_points and pd.api.types.is_numeric_dtype(y) and len(y) > lod_points:
+            x, y = downsample(x.to_numpy(), y.to_numpy(), lod_points,
+                              method="minmax" if chart_type == "bar" else "lttb")
+        use_gl = webgl_threshold is not None and len(y) > webgl_threshold
+        scatter = go.Scattergl if use_gl else go.Scatter
+        marker = dict(color=color, line=dict(width=0))
+
+        if chart_type == "bar":
+            traces.append(
+                go.Bar(x=x, y=y, name=col, yaxis=axis_ref, marker=marker)
+            )
+        elif chart_type == "scatter":
+            traces.append(
+                scatter(x=x, y=y,
+                        mode="markers", name=col, yaxis=axis_ref,
+                        marker=marker)
+            )
+        else:  # line
+            mode = "lines+markers" if show_markers else "lines"
+            traces.append(
+                scatter(x=x, y=y,
+                        mode=mode, name=col, yaxis=axis_ref,
+                        line=dict(color=color),
+                        marker=marker)
+            )
+
+    # dual y-axes if any series is on right
+    use_right = any(v.get("axis") == "Right" for v in chart_settings.values())
+    layout_args = dict(
+        title="Combined Chart",
+        legend_title="Series",
+        xaxis_title="Date",
+        yaxis_title="Left Axis",
+        template="plotly_white",
+        hovermode="x unified",
+        height=650,
+        barmode="group",
+    )
+    if use_right:
+        layout_args["yaxis2"] = dict(
+            title="Right Axis",
+            overlaying="y",
+            side="right",
+            showgrid=False,
+        )
+
+    # One Figure construction instead of add_trace/update_* passes (each revalidates the figure)
+    return go.Figure(data=traces, layout=layout_args)
@@ -0,0 +1,290 @@
+"""
+Publication-aware cache expiry and background pre-warming.
+
+data/mapping.csv gives each XAsset series a `frequency`, a publication `lag` (days after
+the observation date) and an `update_time`. From those and the last date in a fetched
+frame we know when the next observation can appear:
+
+    next observation = last date + one period (business day / week / two weeks / month)
+    published at     = next observation + lag days, at update_time (UPDATE_TZ)
+
+Cached copies are fresh until then, so a weekly CFTC series fetched on Monday is not
+requested again until after its next release. Series without catalog metadata keep the
+caches' default expiry.
+
+The prefetcher records which chart items are used and, shortly after each one's
+expected publication, refetches the most used ones in the background so that morning
+chart loads are served from warm caches.
+"""
+import os
+import json
+import time
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from . import disk_cache, rate_limit
+
+# === Config ===
+UPDATE_TZ = os.getenv("VANDA_UPDATE_TZ", "UTC")
+RETRY_TTL_S = 900.0            # publication overdue: look again this soon
+MIN_TTL_S = 60.0
+MAX_TTL_S = 40 * 86400.0
+PREFETCH_ENABLED = os.getenv("VANDA_PREFETCH", "1") not in ("0", "false", "False")
+PREFETCH_TOP_N = int(os.getenv("VANDA_PREFETCH_TOP", "25"))
+PREFETCH_DELAY_S = float(os.getenv("VANDA_PREFETCH_DELAY", "600"))   # after expected publication
+PREFETCH_GIVE_UP_S = 86400.0   # stop retrying a publication that is this late
+TICK_S = 60.0
+# VandaTrack has no per-series metadata: assume a daily release (prefetch only)
+VT_SCHEDULE = {"frequency": "daily", "lag": 1,
+               "update_time": pd.Timedelta(os.getenv("VANDATRACK_UPDATE_TIME", "06:00:00"))}
+USAGE_PATH = os.path.join(os.path.dirname(disk_cache.CACHE_DIR) or ".", "usage.json")
+
+_PERIODS = {
+    "daily": pd.offsets.BDay(1),
+    "weekly": pd.DateOffset(weeks=1),
+    "bi-weekly": pd.DateOffset(weeks=2),
+    "monthly": pd.offsets.MonthEnd(1),
+}
+
+_lock = threading.Lock()
+_schedule: Optional[Dict[str, Dict]] = None
+
+# === Publication schedule ===
+def _now() -> pd.Timestamp:
+    return pd.Timestamp.now(tz=UPDATE_TZ).tz_localize(None)
+
+def _load_schedule() -> Dict[str, Dict]:
+    from .catalog import load_mapping  # catalog imports the XAsset module, which imports this one
+    df = load_mapping()
+    out = {}
+    for row in df.itertuples(index=False):
+        freq = str(getattr(row, "frequency", "") or "").strip().lower()
+        if freq not in _PERIODS and freq != "intraday":
+            continue
+        try:
+            lag = int(float(getattr(row, "lag", 0) or 0))
+        except (TypeError, ValueError):
+            lag = 0
+        try:
+            at = pd.Timedelta(str(getattr(row, "update_time", "") or "00:00:00"))
+        except ValueError:
+            at = pd.Timedelta(0)
+        out[str(row.series_id).upper()] = {"frequency": freq, "lag": lag, "update_time": at}
+    return out
+
+def schedule(series_id: str) -> Optional[Dict]:
+    """{"frequency", "lag", "update_time"} for a catalog series, or None."""
+    global _schedule
+    with _lock:
+        if _schedule is None:
+            _schedule = _load_schedule()
+        return _schedule.get(str(series_id).upper())
+
+def next_publication(meta: Dict, last_date: Optional[pd.Timestamp],
+                     now: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+    """When the observation after `last_date` is expected to be published (None for intraday)."""
+    period = _PERIODS.get(meta["frequency"])
+    if period is None:
+        return None
+    now = now or _now()
+    if last_date is None or pd.isna(last_date):
+        # No data to go by: the next daily slot
+        slot = now.normalize() + meta["update_time"]
+        return slot if slot > now else slot + pd.Timedelta(days=1)
+    next_obs = pd.Timestamp(last_date).normalize() + period
+    return next_obs + pd.Timedelta(days=meta["lag"]) + meta["update_time"]
+
+def _last_date(df: Optional[pd.DataFrame]) -> Optional[pd.Timestamp]:
+    if df is None or df.empty or "date" not in df.columns:
+        return None
+    return pd.to_datetime(df["date"], errors="coerce").max()
+
+def expires_in(series_id: str, df: Optional[pd.DataFrame], end: Optional[str] = None,
+               now: Optional[pd.Timestamp] = None) -> Optional[float]:
+    """
+    Seconds a fetched frame stays fresh, or None when the series has no catalog metadata.
+    A range that ends before the next observation and whose end date has already been
+    published never changes (maximum expiry); an overdue publication is re-checked every
+    RETRY_TTL_S.
+    """
+    meta = schedule(series_id)
+    if meta is None:
+        return None
+    now = now or _now()
+    if meta["frequency"] == "intraday":
+        return None
+    last = _last_date(df)
+    nxt = next_publication(meta, last, now)
+    if end and last is not None:
+        end_ts = pd.Timestamp(end)
+        next_obs = nxt.normalize() - pd.Timedelta(days=meta["lag"])
+        if next_obs > end_ts and end_ts + pd.Timedelta(days=meta["lag"]) + meta["update_time"] <= now:
+            return MAX_TTL_S
+    secs = (nxt - now).total_seconds()
+    if secs <= 0:
+        return RETRY_TTL_S
+    return min(MAX_TTL_S, max(MIN_TTL_S, secs))
+
+def ttl_for(series_id: str, end: Optional[str] = None) -> Callable[[pd.DataFrame], Optional[float]]:
+    """Expiry callback for series_cache / disk_cache: frame -> seconds (None = default)."""
+    return lambda df: expires_in(series_id, df, end)
+
+# === Usage tracking ===
+def _usage_key(item: Dict) -> str:
+    return json.dumps({k: v for k, v in item.items() if k != "label"}, sort_keys=True, default=str)
+
+_usage: Optional[Dict[str, Dict]] = None
+_usage_dirty = False
+
+def _load_usage() -> Dict[str, Dict]:
+    global _usage
+    if _usage is None:
+        try:
+            with open(USAGE_PATH, "r", encoding="utf-8") as f:
+                _usage = json.load(f)
+        except (OSError, ValueError):
+            _usage = {}
+    return _usage
+
+def save_usage():
+    """Persist usage counts (called by the prefetcher each pass)."""
+    global _usage_dirty
+    with _lock:
+        if not _usage_dirty:
+            return
+        data = json.dumps(_load_usage(), default=str)
+        _usage_dirty = False
+    try:
+        os.makedirs(os.path.dirname(USAGE_PATH) or ".", exist_ok=True)
+        tmp = USAGE_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, USAGE_PATH)
+    except OSError as e:
+        print(f"[WARN] could not save usage stats: {e}")
+
+def record_use(item: Dict, df: Optional[pd.DataFrame], count: bool = True):
+    """Note that a chart item was fetched (and the last date it returned)."""
+    global _usage_dirty
+    last = _last_date(df)
+    with _lock:
+        entry = _load_usage().setdefault(_usage_key(item), {"item": item, "count": 0})
+        if count:
+            entry["count"] += 1
+            entry["used_at"] = time.time()
+        if last is not None and not pd.isna(last):
+            entry["last_date"] = last.strftime("%Y-%m-%d")
+        entry["fetched_at"] = time.time()
+        _usage_dirty = True
+
+def most_used(n: int = PREFETCH_TOP_N) -> List[Dict]:
+    with _lock:
+        entries = [dict(e) for e in _load_usage().values()]
+    entries.sort(key=lambda e: (-e["count"], -e.get("used_at", 0)))
+    return entries[:n]
+
+# === Prefetcher ===
+def _meta_for(item: Dict) -> Optional[Dict]:
+    if item.get("api") == "xasset":
+        return schedule(item.get("series_id", ""))
+    return VT_SCHEDULE
+
+def due(entry: Dict, now: Optional[pd.Timestamp] = None) -> bool:
+    """Has this item's next publication (plus PREFETCH_DELAY_S) passed since it was last fetched?"""
+    meta = _meta_for(entry["item"])
+    if meta is None or meta["frequency"] == "intraday":
+        return False
+    now = now or _now()
+    last = pd.Timestamp(entry["last_date"]) if entry.get("last_date") else None
+    nxt = next_publication(meta, last, now)
+    ready_at = nxt + pd.Timedelta(seconds=PREFETCH_DELAY_S)
+    if now < ready_at or (now - ready_at).total_seconds() > PREFETCH_GIVE_UP_S:
+        return False
+    fetched_at = entry.get("fetched_at", 0)
+    # Already fetched after publication (data not out yet): retry at most every RETRY_TTL_S
+    ready_epoch = ready_at.tz_localize(UPDATE_TZ).timestamp()
+    return fetched_at < ready_epoch or time.time() - fetched_at > RETRY_TTL_S
+
+def _as_of_today(entry: Dict) -> Dict:
+    """
+    The item as the UI asks for it today: usage stores the "to" date of the day it was used,
+    and a range that ran up to that day is open-ended, so it now runs to today.
+    """
+    item = entry["item"]
+    used_at = entry.get("used_at") or entry.get("fetched_at")
+    if not item.get("to") or used_at is None:
+        return item
+    if str(item["to"]) < time.strftime("%Y-%m-%d", time.localtime(used_at)):
+        return item  # a closed historical range
+    return {**item, "to": pd.Timestamp.today().strftime("%Y-%m-%d")}
+
+def _background_fetch(fetch_item: Callable, item: Dict):
+    # Behind interactive renders in the rate limiter's queue
+    with rate_limit.lane("background"):
+        return fetch_item(item, track_use=False)
+
+class Prefetcher:
+    """Daemon thread that refetches due, frequently used items through the normal fetch path."""
+
+    def __init__(self, top_n: int = PREFETCH_TOP_N, tick: float = TICK_S, workers: int = 2):
+        self.top_n = top_n
+        self.tick = tick
+        self.warmed = 0
+        self.failed = 0
+        self.last_run: Optional[float] = None
+        self._stop = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vanda-prefetch")
+        self._thread = threading.Thread(target=self._loop, name="vanda-prefetcher", daemon=True)
+
+    def start(self) -> "Prefetcher":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def run_once(self) -> int:
+        """Refetch every due item among the most used; returns how many were scheduled."""
+        from .fetch import fetch_item  # fetch imports the API modules, which import this one
+        self.last_run = time.time()
+        todo = [e for e in most_used(self.top_n) if due(e)]
+        for e in todo:
+            # Usage (and due()) stay keyed by the recorded item; the fetch warms today's range
+            fut = self._pool.submit(_background_fetch, fetch_item, _as_of_today(e))
+            fut.add_done_callback(lambda f, it=e["item"]: self._done(it, f))
+        save_usage()
+        return len(todo)
+
+    def _done(self, item: Dict, fut):
+        if fut.exception() is not None:
+            self.failed += 1
+            print(f"[WARN] prefetch failed for {item.get('label') or item.get('series_id')}: {fut.exception()}")
+            return
+        self.warmed += 1
+        record_use(item, fut.result(), count=False)
+
+    def _loop(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[WARN] prefetch pass failed: {e}")
+
+    def stats(self) -> Dict:
+        return {"warmed": self.warmed, "failed": self.failed, "last_run": self.last_run,
+                "tracked": len(_load_usage())}
+
+_prefetcher: Optional[Prefetcher] = None
+
+def start_prefetcher() -> Optional[Prefetcher]:
+    """Process-wide prefetcher, started once (no-op when VANDA_PREFETCH=0)."""
+    global _prefetcher
+    if not PREFETCH_ENABLED:
+        return None
+    with _lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher().start()
+        return _prefetcher
@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import random
+import asyncio
+import weakref
+import threading
+import requests
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from . import rate_limit, tracing
+
+try:
+    import aiohttp
+except ImportError:  # async callers fall back to the pooled requests session on worker threads
+    aiohttp = None
+
+# === Config ===
+POOL_SIZE = int(os.getenv("VANDA_HTTP_POOL_SIZE", "16"))
+MAX_RETRIES = int(os.getenv("VANDA_HTTP_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("VANDA_HTTP_BACKOFF", "0.5"))
+BACKOFF_CAP = 20.0
+ASYNC_CONCURRENCY = int(os.getenv("VANDA_ASYNC_CONCURRENCY", "64"))  # requests in flight per event loop
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_stats = {"requests": 0, "retries": 0, "errors": 0, "retry_after_waits": 0}
+# event loop -> (aiohttp session or None, semaphore); aiohttp sessions are bound to their loop
+_async_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple]" = weakref.WeakKeyDictionary()
+
+def _new_session(pool_size: int) -> requests.Session:
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    return s
+
+def get_session() -> requests.Session:
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _new_session(POOL_SIZE)
+        return _session
+
+def configure(pool_size: Optional[int] = None,
+              max_retries: Optional[int] = None,
+              backoff_base: Optional[float] = None):
+    """
+    Change pool/retry settings (process-wide: call at startup, not per session). A new pool
+    size rebuilds the pooled session on next use; the old one is left to requests already
+    using it rather than closed under them.
+    """
+    global POOL_SIZE, MAX_RETRIES, BACKOFF_BASE, _session
+    with _lock:
+        if pool_size is not None and int(pool_size) != POOL_SIZE:
+            POOL_SIZE = int(pool_size)
+            _session = None
+        if max_retries is not None:
+            MAX_RETRIES = int(max_retries)
+        if backoff_base is not None:
+            BACKOFF_BASE = float(backoff_base)
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _backoff(attempt: int) -> float:
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+def _still_limited(url: str, params: Optional[Dict], headers: Optional[Dict[str, str]], resp):
+    """Out of retries on a 429: back the bucket off and raise, so callers don't fall back to mock data."""
+    delay = _retry_after(resp)
+    rate_limit.penalize(url, BACKOFF_CAP if delay is None else min(delay, BACKOFF_CAP), params, headers)
+    raise rate_limit.RateLimited(f"upstream still rate limiting after {MAX_RETRIES} retries (HTTP 429)")
+
+def _bump(name: str, n: int = 1):
+    with _lock:
+        _stats[name] += n
+
+def _throttled(sp: Dict, waited: float):
+    if waited:
+        sp["throttled_ms"] = sp.get("throttled_ms", 0.0) + waited * 1000.0
+
+def get(url: str,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 60) -> requests.Response:
+    """
+    GET through the shared pooled session.
+    Each attempt first waits for a slot from the rate limiter (rate_limit.RateLimited when
+    none comes in time). Retries connection errors, timeouts and 429/5xx responses with
+    exponential backoff, honouring Retry-After. A 429 that outlasts the retries raises
+    rate_limit.RateLimited; any other final response is returned as-is and callers still
+    raise_for_status().
+    """
+    session = get_session()
+    with tracing.span("http.get", url=urlsplit(url).path) as sp:
+        return _get(session, url, params, headers, timeout, sp)
+
+def _get(session: requests.Session, url: str, params: Optional[Dict],
+         headers: Optional[Dict[str, str]], timeout: float, sp: Dict) -> requests.Response:
+    attempt = 0
+    while True:
+        _throttled(sp, rate_limit.acquire(url, params, headers))
+        _bump("requests")
+        try:
+            resp = session.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= MAX_RETRIES:
+                _bump("errors")
+                raise
+            delay = _backoff(attempt)
+        else:
+            if resp.status_code not in RETRY_STATUS or attempt >= MAX_RETRIES:
+                if resp.status_code >= 400:
+                    _bump("errors")
+                sp.update(status=resp.status_code, bytes=len(resp.content), attempts=attempt + 1)
+                if resp.status_code == 429:
+                    _still_limited(url, params, headers, resp)
+                return resp
+            delay = _retry_after(resp)
+            if delay is not None:
+                _bump("retry_after_waits")
+                delay = min(delay, BACKOFF_CAP)
+            else:
+                delay = _backoff(attempt)
+            if resp.status_code == 429:
+                rate_limit.penalize(url, delay, params, headers)
+            resp.close()
+        _bump("retries")
+        attempt += 1
+        time.sleep(delay)
+
+# === Async ===
+class AsyncResponse:
+    """The parts of requests.Response the API modules use, over a body that was read in full."""
+
+    def __init__(self, url: str, status_code: int, headers, content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=None)
+
+def _loop_state() -> Tuple:
+    loop = asyncio.get_running_loop()
+    state = _async_state.get(loop)
+    if state is None:
+        session = None
+        if aiohttp is not None:
+            connector = aiohttp.TCPConnector(limit=ASYNC_CONCURRENCY, limit_per_host=0)
+            session = aiohttp.ClientSession(connector=connector, headers={"Accept-Encoding": "gzip, deflate"})
+        state = _async_state[loop] = (session, asyncio.Semaphore(ASYNC_CONCURRENCY))
+    return state
+
+def _query(params: Optional[Dict]) -> List[Tuple[str, str]]:
+    """requests-style query encoding: lists repeat the key, None values are dropped."""
+    items = []
+    for k, v in (params or {}).items():
+        for one in (v if isinstance(v, (list, tuple)) else [v]):
+            if one is not None:
+                items.append((k, str(one)))
+    return items
+
+async def aget(url: str,
+               params: Optional[Dict] = None,
+               headers: Optional[Dict[str, str]] = None,
+               timeout: float = 60):
+    """
+    Async counterpart of get(): same retries, backoff and counters, through one aiohttp
+    connection pool per event loop with at most ASYNC_CONCURRENCY requests in flight, so
+    hundreds of requests can be fanned out from a single thread. Without aiohttp, get()
+    runs on the loop's default executor under the same semaphore.
+    Close the pool with aclose() before the loop ends.
+    """
+    session, sem = _loop_state()
+    async with sem:
+        with tracing.span("http.get", url=urlsplit(url).path) as sp:
+            if session is None:
+                call = tracing.bind(lambda: _get(get_session(), url, params, headers, timeout, sp))
+                return await asyncio.get_running_loop().run_in_executor(None, call)
+            return await _aget(session, url, params, headers, timeout, sp)
+
+async def _aget(session, url: str, params: Optional[Dict], headers: Optional[Dict[str, str]],
+                timeout: float, sp: Dict) -> AsyncResponse:
+    attempt = 0
+    query = _query(params)
+    while True:
+        _throttled(sp, await rate_limit.acquire_async(url, params, headers))
+        _bump("requests")
+        try:
+            async with session.get(url, params=query, headers=headers,
+                                   timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+                resp = AsyncResponse(str(r.url), r.status, r.headers.copy(), await r.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt >= MAX_RETRIES:
+                _bump("errors")
+                raise
+            delay = _backoff(attempt)
+        else:
+            if resp.status_code not in RETRY_STATUS or attempt >= MAX_RETRIES:
+                if resp.status_code >= 400:
+                    _bump("errors")
+                sp.update(status=resp.status_code, bytes=len(resp.content), attempts=attempt + 1)
+                if resp.status_code == 429:
+                    _still_limited(url, params, headers, resp)
+                return resp
+            delay = _retry_after(resp)
+            if delay is not None:
+                _bump("retry_after_waits")
+                delay = min(delay, BACKOFF_CAP)
+            else:
+                delay = _backoff(attempt)
+            if resp.status_code == 429:
+                rate_limit.penalize(url, delay, params, headers)
+        _bump("retries")
+        attempt += 1
+        await asyncio.sleep(delay)
+
+async def aclose():
+    """Close the current event loop's connection pool."""
+    state = _async_state.pop(asyncio.get_running_loop(), None)
+    if state is not None and state[0] is not None:
+        await state[0].close()
+
+def stats() -> Dict:
+    """Request/retry counters plus connection reuse from the urllib3 pools."""
+    with _lock:
+        out = dict(_stats)
+        session = _session
+    opened, served = 0, 0
+    if session is not None:
+        for adapter in {id(a): a for a in session.adapters.values()}.values():
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                opened += pool.num_connections
+                served += pool.num_requests
+    out["connections_opened"] = opened
+    out["connections_reused"] = max(0, served - opened)
+    out["pool_size"] = POOL_SIZE
+    return out
+
+def reset_stats():
+    with _lock:
+        for k in _stats:
+            _stats[k] = 0
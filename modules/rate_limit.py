@@ -0,0 +1,271 @@
+"""
+Client-side rate limiting for upstream requests: one token bucket per (API key, endpoint).
+
+Every attempt made by http_client.get / aget takes a token from its bucket first. Buckets
+refill at `rate` requests per second up to `burst`; when empty, callers queue. Waiters are
+served by lane, then arrival, so interactive renders go ahead of background work:
+
+    with rate_limit.lane("background"):
+        fetch_item(item)
+
+Queues are bounded (MAX_QUEUE per bucket) and waits are capped per lane; past either limit
+the request fails fast with RateLimited instead of piling up. A 429 from upstream drains
+the bucket for its Retry-After so other callers back off too.
+
+    VANDA_RATE_LIMITS="/timeseries=10:20,/tickers/api/=5:10"   # path=rate[:burst]
+"""
+import os
+import time
+import heapq
+import asyncio
+import hashlib
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# === Config ===
+_ENABLED = os.getenv("VANDA_RATE_LIMIT", "1") not in ("0", "false", "False")
+DEFAULT_RATE = float(os.getenv("VANDA_RATE", "20"))     # requests per second per key and endpoint
+DEFAULT_BURST = float(os.getenv("VANDA_BURST", "40"))
+MAX_QUEUE = int(os.getenv("VANDA_RATE_QUEUE", "256"))   # waiting requests per bucket
+# lane -> (priority, longest wait in seconds before giving up)
+LANES = {
+    "interactive": (0, float(os.getenv("VANDA_RATE_MAX_WAIT", "30"))),
+    "background": (1, 300.0),
+}
+ASYNC_POLL_S = 0.05
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    out = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        path, _, value = part.partition("=")
+        rate, _, burst = value.partition(":")
+        try:
+            out[path.strip()] = (float(rate), float(burst or rate))
+        except ValueError:
+            print(f"[WARN] ignoring rate limit {part!r} (expected path=rate[:burst])")
+    return out
+
+# endpoint path (prefix) -> (rate, burst)
+LIMITS: Dict[str, Tuple[float, float]] = _parse_limits(os.getenv("VANDA_RATE_LIMITS", ""))
+
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar("vanda_rate_lane", default="interactive")
+_lock = threading.Lock()
+_buckets: Dict[Tuple[str, str], "TokenBucket"] = {}
+_seq = itertools.count()
+
+class RateLimited(Exception):
+    """
+    Over the request budget: the bucket's queue is full, the wait would be too long, or
+    upstream kept answering 429 after the retries.
+    """
+
+class TokenBucket:
+    """Tokens refill continuously; waiters are granted strictly in (lane priority, arrival) order."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = max(rate, 1e-6)
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int]] = []  # heap of (priority, seq)
+        self.stats = {"granted": 0, "throttled": 0, "rejected": 0, "wait_s": 0.0, "upstream_429": 0}
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self) -> bool:
+        """Grant the head waiter if a token is there (caller holds _cond)."""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.stats["granted"] += 1
+            return True
+        return False
+
+    def _enter(self, priority: int) -> Optional[Tuple[int, int]]:
+        """None when granted at once, else the caller's queue ticket."""
+        with self._cond:
+            if not self._waiters and self._take():
+                return None
+            if len(self._waiters) >= MAX_QUEUE:
+                self.stats["rejected"] += 1
+                raise RateLimited(f"rate limit queue full ({MAX_QUEUE} waiting)")
+            ticket = (priority, next(_seq))
+            heapq.heappush(self._waiters, ticket)
+            self.stats["throttled"] += 1
+            return ticket
+
+    def _poll(self, ticket: Tuple[int, int]) -> Optional[float]:
+        """None when granted, else seconds until the next token (caller holds _cond)."""
+        if self._waiters[0] == ticket and self._take():
+            heapq.heappop(self._waiters)
+            self._cond.notify_all()
+            return None
+        return max((1 - self.tokens) / self.rate, 0.001)
+
+    def _leave(self, ticket: Tuple[int, int], waited: float, granted: bool):
+        with self._cond:
+            self.stats["wait_s"] += waited
+            if not granted:
+                self.stats["rejected"] += 1
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def acquire(self, priority: int = 0, max_wait: float = 30.0) -> float:
+        """Block until a token is granted; returns seconds waited. Raises RateLimited."""
+        ticket = self._enter(priority)
+        if ticket is None:
+            return 0.0
+        t0 = time.monotonic()
+        granted = False
+        try:
+            with self._cond:
+                while True:
+                    delay = self._poll(ticket)
+                    if delay is None:
+                        granted = True
+                        return time.monotonic() - t0
+                    remaining = t0 + max_wait - time.monotonic()
+                    if remaining <= 0:
+                        raise RateLimited(f"no request budget within {max_wait:g}s")
+                    self._cond.wait(min(delay, remaining))
+        finally:
+            self._leave(ticket, time.monotonic() - t0, granted)
+
+    async def acquire_async(self, priority: int = 0, max_wait: float = 30.0) -> float:
+        """acquire() for coroutines: sleeps on the event loop instead of blocking it."""
+        ticket = self._enter(priority)
+        if ticket is None:
+            return 0.0
+        t0 = time.monotonic()
+        granted = False
+        try:
+            while True:
+                with self._cond:
+                    delay = self._poll(ticket)
+                if delay is None:
+                    granted = True
+                    return time.monotonic() - t0
+                remaining = t0 + max_wait - time.monotonic()
+                if remaining <= 0:
+                    raise RateLimited(f"no request budget within {max_wait:g}s")
+                await asyncio.sleep(min(delay, remaining, ASYNC_POLL_S))
+        finally:
+            self._leave(ticket, time.monotonic() - t0, granted)
+
+    def penalize(self, seconds: float):
+        """Upstream said 429: hand out no tokens for `seconds`."""
+        with self._cond:
+            self._refill(time.monotonic())
+            # A floor, not a sum: repeated 429s for the same window don't stack up
+            self.tokens = min(self.tokens, -seconds * self.rate)
+            self.stats["upstream_429"] += 1
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            self._refill(time.monotonic())
+            return dict(self.stats, rate=self.rate, burst=self.burst,
+                        remaining=max(0.0, self.tokens), queued=len(self._waiters))
+
+# === Lanes ===
+@contextmanager
+def lane(name: str) -> Iterator[str]:
+    """Run the block's requests in lane `name` ("interactive" or "background")."""
+    if name not in LANES:
+        raise ValueError(f"unknown lane {name!r}; expected one of {sorted(LANES)}")
+    token = _lane.set(name)
+    try:
+        yield name
+    finally:
+        _lane.reset(token)
+
+def current_lane() -> str:
+    return _lane.get()
+
+# === Buckets ===
+def set_enabled(flag: bool):
+    global _ENABLED
+    _ENABLED = bool(flag)
+
+def is_enabled() -> bool:
+    return _ENABLED
+
+def configure(endpoint: Optional[str] = None, rate: Optional[float] = None, burst: Optional[float] = None):
+    """Set the default rate/burst, or one endpoint's (path prefix); existing buckets pick it up."""
+    global DEFAULT_RATE, DEFAULT_BURST
+    with _lock:
+        if endpoint is None:
+            DEFAULT_RATE = DEFAULT_RATE if rate is None else float(rate)
+            DEFAULT_BURST = DEFAULT_BURST if burst is None else float(burst)
+        else:
+            old_rate, old_burst = LIMITS.get(endpoint, (DEFAULT_RATE, DEFAULT_BURST))
+            LIMITS[endpoint] = (old_rate if rate is None else float(rate),
+                                old_burst if burst is None else float(burst))
+        for (_, path), bucket in _buckets.items():
+            bucket.rate, bucket.burst = _limits_for(path)
+
+def _limits_for(path: str) -> Tuple[float, float]:
+    matches = [p for p in LIMITS if path.startswith(p)]
+    return LIMITS[max(matches, key=len)] if matches else (DEFAULT_RATE, DEFAULT_BURST)
+
+def _key_id(url: str, params: Optional[Dict], headers: Optional[Dict[str, str]]) -> str:
+    """Short hash of the credential in use (header, auth_token param, or the URL's query)."""
+    secret = (headers or {}).get("x-api-key") or (params or {}).get("auth_token")
+    if not secret:
+        secret = (parse_qs(urlsplit(url).query).get("auth_token") or [""])[-1]
+    return hashlib.blake2b(str(secret).encode(), digest_size=4).hexdigest() if secret else "anonymous"
+
+def bucket_for(url: str, params: Optional[Dict] = None,
+               headers: Optional[Dict[str, str]] = None) -> TokenBucket:
+    parts = urlsplit(url)
+    endpoint = parts.path or "/"
+    key = (_key_id(url, params, headers), f"{parts.netloc}{endpoint}")
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(*_limits_for(endpoint))
+        return bucket
+
+def acquire(url: str, params: Optional[Dict] = None, headers: Optional[Dict[str, str]] = None) -> float:
+    """Wait for a request slot in the current lane; returns seconds waited (0 when disabled)."""
+    if not _ENABLED:
+        return 0.0
+    priority, max_wait = LANES[_lane.get()]
+    return bucket_for(url, params, headers).acquire(priority, max_wait)
+
+async def acquire_async(url: str, params: Optional[Dict] = None,
+                        headers: Optional[Dict[str, str]] = None) -> float:
+    if not _ENABLED:
+        return 0.0
+    priority, max_wait = LANES[_lane.get()]
+    return await bucket_for(url, params, headers).acquire_async(priority, max_wait)
+
+def penalize(url: str, seconds: float, params: Optional[Dict] = None,
+             headers: Optional[Dict[str, str]] = None):
+    if _ENABLED:
+        bucket_for(url, params, headers).penalize(seconds)
+
+def stats() -> List[Dict]:
+    """Per bucket: key id, endpoint, granted / throttled / rejected counts, wait time, budget left."""
+    with _lock:
+        items = list(_buckets.items())
+    return [dict(key=k, endpoint=e, **b.snapshot()) for (k, e), b in items]
+
+def totals() -> Dict:
+    rows = stats()
+    out = {k: sum(r[k] for r in rows) for k in ("granted", "throttled", "rejected", "wait_s", "upstream_429", "queued")}
+    out["buckets"] = len(rows)
+    out["enabled"] = _ENABLED
+    return out
+
+def reset():
+    """Drop all buckets (budgets and counters)."""
+    with _lock:
+        _buckets.clear()
@@ -0,0 +1,217 @@
+import os
+import time
+import asyncio
+import threading
+import pandas as pd
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from . import tracing
+from .disk_cache import make_key
+
+# === Config ===
+MAX_BYTES = int(float(os.getenv("VANDA_MEMO_MAX_MB", "256")) * 1024 * 1024)
+TTL_S = float(os.getenv("VANDA_MEMO_TTL", "900"))
+_ENABLED = os.getenv("VANDA_MEMO", "1") not in ("0", "false", "False")
+
+_lock = threading.Lock()
+# key -> {"df", "bytes", "expires"}, least recently used first
+_entries: "OrderedDict[str, Dict]" = OrderedDict()
+_inflight: Dict[str, "_Flight"] = {}
+_ainflight: Dict[Tuple[int, str], "asyncio.Future"] = {}  # (event loop id, key) -> load task
+_bytes = 0
+_stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "errors": 0}
+
+Loader = Callable[[], pd.DataFrame]
+AsyncLoader = Callable[[], Awaitable[pd.DataFrame]]
+# Seconds, or frame -> seconds (None for the default) for data-dependent expiry
+Ttl = Union[float, Callable[[pd.DataFrame], Optional[float]]]
+
+class _Flight:
+    """One in-progress upstream call that identical concurrent requests wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[pd.DataFrame] = None
+        self.error: Optional[BaseException] = None
+
+def set_enabled(flag: bool):
+    global _ENABLED
+    _ENABLED = bool(flag)
+
+def is_enabled() -> bool:
+    return _ENABLED
+
+def configure(max_mb: Optional[float] = None, ttl: Optional[float] = None):
+    global MAX_BYTES, TTL_S
+    with _lock:
+        if max_mb is not None:
+            MAX_BYTES = int(float(max_mb) * 1024 * 1024)
+            _evict()
+        if ttl is not None:
+            TTL_S = float(ttl)
+
+def _size(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def _evict():
+    """Drop least recently used entries until within budget (caller holds _lock)."""
+    global _bytes
+    while _entries and _bytes > MAX_BYTES:
+        _, entry = _entries.popitem(last=False)
+        _bytes -= entry["bytes"]
+        _stats["evictions"] += 1
+
+def _store(key: str, df: pd.DataFrame, ttl: float):
+    global _bytes
+    size = _size(df)
+    if size > MAX_BYTES:
+        return
+    with _lock:
+        old = _entries.pop(key, None)
+        if old is not None:
+            _bytes -= old["bytes"]
+        _entries[key] = {"df": df, "bytes": size, "expires": time.monotonic() + ttl}
+        _bytes += size
+        _evict()
+
+def _fresh(key: str) -> Optional[pd.DataFrame]:
+    """Shallow copy of a fresh entry, counted as a hit (caller holds _lock)."""
+    entry = _entries.get(key)
+    if entry is None or entry["expires"] <= time.monotonic():
+        return None
+    _entries.move_to_end(key)
+    _stats["hits"] += 1
+    tracing.annotate(memo="hit")
+    return entry["df"].copy(deep=False)
+
+def _keep(key: str, df: Optional[pd.DataFrame], ttl: Optional[Ttl]):
+    if df is not None and not df.empty:
+        secs = ttl(df) if callable(ttl) else ttl
+        _store(key, df, TTL_S if secs is None else secs)
+
+def get_or_load(namespace: str, params: Dict, load: Loader, ttl: Optional[Ttl] = None) -> pd.DataFrame:
+    """
+    Process-wide memo in front of an upstream fetch, shared by all sessions.
+      - params: everything that identifies the request (dates included)
+      - load(): performs the fetch and raises on failure; errors are not cached
+    A fresh entry is returned without calling load(). Concurrent callers with the same key
+    while a load is in flight wait for it and share its result (or its exception) instead of
+    issuing their own request. Non-empty results are kept for `ttl` seconds (TTL_S by
+    default; a callable gets the loaded frame, see freshness.ttl_for), within MAX_BYTES,
+    least recently used evicted first.
+    Returned frames are shallow copies: callers can add/replace columns freely.
+    """
+    if not _ENABLED:
+        return load()
+    key = make_key(namespace, params)
+    with _lock:
+        hit = _fresh(key)
+        if hit is not None:
+            return hit
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+            _stats["misses"] += 1
+        else:
+            _stats["coalesced"] += 1
+
+    if not leader:
+        with tracing.span("memo.wait", namespace=namespace):
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result.copy(deep=False) if flight.result is not None else None
+
+    try:
+        df = load()
+        flight.result = df
+        _keep(key, df, ttl)
+        return df.copy(deep=False) if df is not None else df
+    except BaseException as e:
+        flight.error = e
+        with _lock:
+            _stats["errors"] += 1
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        flight.done.set()
+
+async def get_or_load_async(namespace: str, params: Dict, load: AsyncLoader,
+                            ttl: Optional[Ttl] = None) -> pd.DataFrame:
+    """
+    get_or_load() for coroutines: the same entries, so sync and async callers share results.
+    Identical concurrent calls on one event loop await a single load() task.
+    """
+    if not _ENABLED:
+        return await load()
+    key = make_key(namespace, params)
+    flight_key = (id(asyncio.get_running_loop()), key)
+    with _lock:
+        hit = _fresh(key)
+        if hit is not None:
+            return hit
+        task = _ainflight.get(flight_key)
+        leader = task is None
+        if leader:
+            task = _ainflight[flight_key] = asyncio.ensure_future(load())
+            _stats["misses"] += 1
+        else:
+            _stats["coalesced"] += 1
+
+    if not leader:
+        df = await asyncio.shield(task)
+        return df.copy(deep=False) if df is not None else df
+
+    try:
+        df = await task
+        _keep(key, df, ttl)
+        return df.copy(deep=False) if df is not None else df
+    except BaseException:
+        with _lock:
+            _stats["errors"] += 1
+        raise
+    finally:
+        with _lock:
+            _ainflight.pop(flight_key, None)
+
+def peek(namespace: str, params: Dict) -> Optional[pd.DataFrame]:
+    """A fresh entry (shallow copy) without loading anything, or None."""
+    if not _ENABLED:
+        return None
+    with _lock:
+        return _fresh(make_key(namespace, params))
+
+def put(namespace: str, params: Dict, df: pd.DataFrame, ttl: Optional[Ttl] = None):
+    """Store a frame obtained some other way (e.g. one ticker's slice of a multi-ticker response)."""
+    if _ENABLED:
+        _keep(make_key(namespace, params), df, ttl)
+
+def invalidate(namespace: str, params: Dict):
+    global _bytes
+    with _lock:
+        entry = _entries.pop(make_key(namespace, params), None)
+        if entry is not None:
+            _bytes -= entry["bytes"]
+
+def clear():
+    global _bytes
+    with _lock:
+        _entries.clear()
+        _bytes = 0
+
+def stats() -> Dict:
+    with _lock:
+        out = dict(_stats)
+        out.update(entries=len(_entries), bytes=_bytes, max_bytes=MAX_BYTES,
+                   inflight=len(_inflight) + len(_ainflight), enabled=_ENABLED)
+    lookups = out["hits"] + out["misses"] + out["coalesced"]
+    out["hit_rate"] = (out["hits"] + out["coalesced"]) / lookups if lookups else 0.0
+    return out
+
+def reset_stats():
+    with _lock:
+        for k in _stats:
+            _stats[k] = 0
@@ -0,0 +1,82 @@
+import os
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import disk_cache, tracing
+
+# === Config ===
+# "" (off), "year" or "quarter"; process-wide, so a deployment setting rather than a per-session one
+SHARD_UNIT = os.getenv("VANDA_SHARD", "").lower()
+SHARD_WORKERS = int(os.getenv("VANDA_SHARD_WORKERS", "4"))
+MIN_SHARDS = 2  # ranges that fit in fewer shards are fetched in one request
+
+_FREQ = {"year": "YS", "quarter": "QS"}
+
+def configure(unit: Optional[str] = None, workers: Optional[int] = None):
+    global SHARD_UNIT, SHARD_WORKERS
+    if unit is not None:
+        SHARD_UNIT = unit.lower() if unit.lower() in _FREQ else ""
+    if workers is not None:
+        SHARD_WORKERS = max(1, int(workers))
+
+def split_range(start: str, end: str, unit: str = "year") -> List[Tuple[str, str]]:
+    """
+    Split [start, end] into calendar year/quarter shards as inclusive (from, to) strings.
+    Shards are aligned to full periods (the first may begin before `start`) so they are
+    reusable across requests; only the last one is clipped at `end`.
+    """
+    s, e = pd.Timestamp(start), pd.Timestamp(end)
+    if e < s:
+        return []
+    first = s.to_period("Y" if unit == "year" else "Q").start_time
+    bounds = list(pd.date_range(first, e, freq=_FREQ[unit]))
+    shards = []
+    for i, b in enumerate(bounds):
+        stop = bounds[i + 1] - pd.Timedelta(days=1) if i + 1 < len(bounds) else e
+        shards.append((b.strftime("%Y-%m-%d"), stop.strftime("%Y-%m-%d")))
+    return shards
+
+def _stitch(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    out = pd.concat(frames, ignore_index=True)
+    if "date" not in out.columns:
+        return out
+    keys = [c for c in ("date", "ticker") if c in out.columns]
+    return out.drop_duplicates(subset=keys, keep="last").sort_values(keys).reset_index(drop=True)
+
+def get_range(namespace: str,
+              params: Dict,
+              start: Optional[str],
+              end: Optional[str],
+              fetch: disk_cache.Fetcher,
+              incremental: bool = True,
+              ttl: Optional[Callable[[pd.DataFrame], Optional[float]]] = None) -> pd.DataFrame:
+    """
+    Drop-in for disk_cache.get_range that, when SHARD_UNIT is set, splits long ranges into
+    year/quarter shards fetched concurrently and stitched/deduplicated on date.
+    Each shard is its own cache entry, so closed historical shards are fetched once and
+    then served from disk; only the open (latest) shard keeps refreshing its tail.
+    Open-ended starts and window-dependent (non-incremental) requests are not sharded.
+    """
+    end = end or pd.Timestamp.today().strftime("%Y-%m-%d")
+    shards = split_range(start, end, SHARD_UNIT) if SHARD_UNIT and start and incremental else []
+    if len(shards) < MIN_SHARDS:
+        return disk_cache.get_range(namespace, params, start, end, fetch, incremental=incremental, ttl=ttl)
+
+    def one(shard: Tuple[str, str]) -> pd.DataFrame:
+        s, e = shard
+        # Keyed by period start: the open shard's growing end is an incremental tail fetch
+        return disk_cache.get_range(f"{namespace}.shard", {**params, "__shard": f"{SHARD_UNIT}:{s}"}, s, e, fetch,
+                                    ttl=ttl)
+
+    tracing.annotate(shards=len(shards))
+    workers = max(1, min(SHARD_WORKERS, len(shards)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vanda-shard") as ex:
+        frames = list(ex.map(tracing.bind(one), shards))
+    out = _stitch(frames)
+    if not out.empty and "date" in out.columns:
+        out = out[out["date"] >= pd.Timestamp(start)].reset_index(drop=True)
+    return out
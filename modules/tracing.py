@@ -0,0 +1,178 @@
+"""
+Lightweight named spans for profiling a render: API calls, bytes received, parsing,
+merging, figure building and serialization.
+
+    trace = tracing.start("rerun")
+    with tracing.span("merge", series=len(dfs)) as sp:
+        merged = outer_merge_on_date(dfs)
+        sp["rows"] = len(merged)
+
+Spans are only recorded while a trace is active in the current context, so library code
+can be instrumented unconditionally. Work handed to thread pools keeps its trace when the
+callable is wrapped with bind(). Traces export as JSON or as Chrome trace events
+(chrome://tracing, https://ui.perfetto.dev).
+"""
+import os
+import json
+import time
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+# === Config ===
+ENABLED = os.getenv("VANDA_TRACE", "1") not in ("0", "false", "False")
+MAX_SPANS = 5000  # per trace; later spans are counted but not stored
+
+_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("vanda_trace", default=None)
+_span: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("vanda_span", default=None)
+
+class Trace:
+    """Spans recorded during one unit of work (a Streamlit rerun, a batch run)."""
+
+    def __init__(self, name: str = "trace"):
+        self.name = name
+        self.started_at = time.time()
+        self.dropped = 0
+        self.ended_ms: Optional[float] = None
+        self.spans: List[Dict] = []
+        self._t0 = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000.0
+
+    def _add(self, span: Dict):
+        with self._lock:
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def finish(self) -> "Trace":
+        """Freeze the trace's duration (spans still open keep recording)."""
+        if self.ended_ms is None:
+            self.ended_ms = self._now_ms()
+        return self
+
+    def elapsed_ms(self) -> float:
+        return self.ended_ms if self.ended_ms is not None else self._now_ms()
+
+    def summary(self) -> List[Dict]:
+        """Per span name: count, total and max milliseconds, and bytes where recorded."""
+        out: Dict[str, Dict] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            row = out.setdefault(s["name"], {"span": s["name"], "count": 0, "total_ms": 0.0,
+                                             "max_ms": 0.0, "bytes": 0})
+            row["count"] += 1
+            row["total_ms"] += s["dur_ms"]
+            row["max_ms"] = max(row["max_ms"], s["dur_ms"])
+            row["bytes"] += int(s["attrs"].get("bytes", 0) or 0)
+        return sorted(out.values(), key=lambda r: -r["total_ms"])
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "elapsed_ms": round(self.elapsed_ms(), 3),
+            "dropped": self.dropped,
+            "spans": spans,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2, default=str)
+
+    def to_chrome_trace(self) -> str:
+        """Chrome trace event format: one complete ("X") event per span, one row per thread."""
+        with self._lock:
+            spans = list(self.spans)
+        tids: Dict[str, int] = {}
+        events = []
+        for s in spans:
+            tid = tids.setdefault(s["thread"], len(tids) + 1)
+            events.append({
+                "name": s["name"], "cat": s["name"].split(".")[0], "ph": "X",
+                "ts": round(s["start_ms"] * 1000.0, 1), "dur": round(s["dur_ms"] * 1000.0, 1),
+                "pid": 1, "tid": tid, "args": s["attrs"],
+            })
+        events += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+                   for name, tid in tids.items()]
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms",
+                           "otherData": {"trace": self.name, "started_at": self.started_at}}, default=str)
+
+# === Activation ===
+def start(name: str = "trace") -> Optional[Trace]:
+    """Begin a new trace in the current context (replacing any previous one)."""
+    trace = Trace(name) if ENABLED else None
+    _trace.set(trace)
+    _span.set(None)
+    return trace
+
+def current() -> Optional[Trace]:
+    return _trace.get()
+
+@contextmanager
+def activate(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """Record into `trace` for the duration of the block."""
+    t1, t2 = _trace.set(trace), _span.set(None)
+    try:
+        yield trace
+    finally:
+        _span.reset(t2)
+        _trace.reset(t1)
+
+def bind(fn: Callable) -> Callable:
+    """
+    Wrap `fn` so it runs in the caller's context on any thread: it records into the caller's
+    trace, under the caller's span, and sees its other context variables (e.g. the
+    rate-limit lane).
+    """
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+    return run
+
+# === Recording ===
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict]:
+    """
+    Time the block as a named span. Yields its attribute dict, which the block may fill in
+    (e.g. sp["bytes"] = len(body)). A no-op when no trace is active.
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield attrs
+        return
+    parent = _span.get()
+    rec = {
+        "id": next(trace._ids),
+        "parent": parent["id"] if parent else None,
+        "name": name,
+        "thread": threading.current_thread().name,
+        "start_ms": trace._now_ms(),
+        "dur_ms": 0.0,
+        "attrs": attrs,
+    }
+    token = _span.set(rec)
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _span.reset(token)
+        rec["dur_ms"] = trace._now_ms() - rec["start_ms"]
+        trace._add(rec)
+
+def annotate(**attrs):
+    """Attach attributes to the innermost open span (ignored outside a trace)."""
+    rec = _span.get()
+    if rec is not None and _trace.get() is not None:
+        rec["attrs"].update(attrs)
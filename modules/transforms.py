@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+# === Transform vocabularies (same values the XAsset API accepts) ===
+RESAMPLE_RULES = {"weekly": "W-FRI", "monthly": "ME", "quarterly": "QE"}
+CHANGE_OFFSETS = {
+    "dod": pd.DateOffset(days=1),
+    "wow": pd.DateOffset(weeks=1),
+    "mom": pd.DateOffset(months=1),
+    "yoy": pd.DateOffset(years=1),
+}
+ROLLING_WINDOWS = {
+    "1m": pd.DateOffset(months=1),
+    "3m": pd.DateOffset(months=3),
+    "6m": pd.DateOffset(months=6),
+    "12m": pd.DateOffset(months=12),
+}
+Z_WINDOWS = {"2y": "731D", "5y": "1827D"}
+
+# How resampling aggregates and how changes are expressed; flip if the parity check disagrees
+RESAMPLE_AGG = "last"
+CHANGE_MODE = "diff"
+
+def lookback(frequency: Optional[str] = None,
+             rolling_sum: Optional[str] = None,
+             z_score: Optional[str] = None) -> Optional[pd.Timedelta]:
+    """
+    History needed before the requested start so the first output row is fully formed.
+    Returns None when the whole history is needed (all-years z-score).
+    """
+    if z_score == "all":
+        return None
+    ref = pd.Timestamp("2000-01-01")
+    days = 7  # slack for weekends / holidays
+    for table, key in ((CHANGE_OFFSETS, frequency), (ROLLING_WINDOWS, rolling_sum)):
+        if key in table:
+            days += ((ref + table[key]) - ref).days + 1
+    if z_score in Z_WINDOWS:
+        days += pd.Timedelta(Z_WINDOWS[z_score]).days
+    return pd.Timedelta(days=days)
+
+def _window_sum(dates: np.ndarray, values: np.ndarray, window: pd.DateOffset) -> np.ndarray:
+    """Trailing sum over (t - window, t], via one cumulative sum and a searchsorted."""
+    filled = np.where(np.isnan(values), 0.0, values)
+    cs = np.concatenate([[0.0], np.cumsum(filled)])
+    left = np.searchsorted(dates, (pd.DatetimeIndex(dates) - window).to_numpy(), side="right")
+    return cs[1:] - cs[left]
+
+def change(s: pd.Series, frequency: str, mode: str = CHANGE_MODE) -> pd.Series:
+    """Change vs the last observation on or before t - offset (dod/wow/mom/yoy)."""
+    offset = CHANGE_OFFSETS[frequency]
+    idx = s.index
+    prev = s.reindex(idx - offset, method="ffill").to_numpy()
+    cur = s.to_numpy()
+    out = cur / prev - 1.0 if mode == "pct" else cur - prev
+    return pd.Series(out, index=idx, name=s.name)
+
+def resample(s: pd.Series, frequency: str, how: str = RESAMPLE_AGG) -> pd.Series:
+    r = s.resample(RESAMPLE_RULES[frequency])
+    return (r.sum(min_count=1) if how == "sum" else r.last()).dropna()
+
+def rolling(s: pd.Series, rolling_sum: str) -> pd.Series:
+    vals = _window_sum(s.index.to_numpy(), s.to_numpy(dtype="float64"), ROLLING_WINDOWS[rolling_sum])
+    return pd.Series(vals, index=s.index, name=s.name)
+
+def zscore(s: pd.Series, z_score: str) -> pd.Series:
+    if z_score == "all":
+        std = s.std(skipna=True)
+        return (s - s.mean(skipna=True)) / (std if std else np.nan)
+    roll = s.rolling(Z_WINDOWS[z_score], min_periods=2)
+    return (s - roll.mean()) / roll.std().replace(0.0, np.nan)
+
+def apply(df: pd.DataFrame,
+          frequency: Optional[str] = None,
+          rolling_sum: Optional[str] = None,
+          z_score: Optional[str] = None,
+          start_date: Optional[str] = None,
+          end_date: Optional[str] = None) -> pd.DataFrame:
+    """
+    Derive a frequency / rolling-sum / z-score variant from a base daily frame ('date' + value columns).
+    Order matches the API: frequency (resample or change) -> rolling sum -> z-score,
+    then the result is trimmed to [start_date, end_date].
+    """
+    if df is None or df.empty or "date" not in df.columns:
+        return df
+    base = df.set_index(pd.to_datetime(df["date"], errors="coerce")).drop(columns="date")
+    base = base[base.index.notna()].sort_index()
+    base = base[~base.index.duplicated(keep="last")]
+
+    out = {}
+    for col in base.columns:
+        s = pd.to_numeric(base[col], errors="coerce")
+        if frequency in RESAMPLE_RULES:
+            s = resample(s, frequency)
+        elif frequency in CHANGE_OFFSETS:
+            s = change(s, frequency)
+        if rolling_sum in ROLLING_WINDOWS:
+            s = rolling(s, rolling_sum)
+        if z_score in ("all", *Z_WINDOWS):
+            s = zscore(s, z_score)
+        out[col] = s
+    res = pd.DataFrame(out)
+    res.index.name = "date"
+    if start_date:
+        res = res[res.index >= pd.Timestamp(start_date)]
+    if end_date:
+        res = res[res.index <= pd.Timestamp(end_date)]
+    return res.reset_index()
+
+def parity_report(local: pd.DataFrame, remote: pd.DataFrame, tol: float = 1e-6) -> Dict:
+    """
+    Compare a locally derived variant with the API's own output for the same request
+    (both 'date' + one value column). Use it to validate RESAMPLE_AGG / CHANGE_MODE per series.
+    """
+    a = local.set_index("date").iloc[:, 0]
+    b = remote.set_index(pd.to_datetime(remote["date"])).drop(columns="date").iloc[:, 0]
+    both = pd.concat([a, b], axis=1, join="inner").dropna()
+    diff = (both.iloc[:, 0] - both.iloc[:, 1]).abs()
+    return {
+        "rows_compared": int(len(both)),
+        "max_abs_diff": float(diff.max()) if len(diff) else None,
+        "match": bool(len(diff)) and bool((diff <= tol).all()),
+    }
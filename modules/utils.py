@@ -1,4 +1,6 @@
+import numpy as np
 import pandas as pd
+from typing import Optional
 
 def try_parse_dates(series: pd.Series):
     try:
@@ -6,6 +8,10 @@ def try_parse_dates(series: pd.Series):
     except Exception:
         return series
 
+def is_mock(df) -> bool:
+    """True for the placeholder frames the API modules return when a fetch fails (_mock_ts)."""
+    return df is not None and bool(getattr(df, "attrs", {}).get("mock"))
+
 def is_timeseries(series: pd.Series) -> bool:
     try:
         s = pd.to_datetime(series, errors="coerce")
@@ -13,29 +19,130 @@ def is_timeseries(series: pd.Series) -> bool:
     except Exception:
         return False
 
-def outer_merge_on_date(dfs):
+def _as_datetime(s: pd.Series) -> pd.Series:
+    # to_datetime is not free even on datetime64 input; skip it when already converted
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    return pd.to_datetime(s, errors="coerce")
+
+def _unique_label(label, seen: dict):
+    """Deterministic de-duplication: the 2nd 'X' becomes 'X (2)', the 3rd 'X (3)', ..."""
+    n = seen.get(label, 0) + 1
+    seen[label] = n
+    if n == 1:
+        return label
+    new = f"{label} ({n})"
+    while new in seen:
+        n += 1
+        new = f"{label} ({n})"
+    seen[new] = 1
+    return new
+
+def _drop_duplicate_keys(keep: np.ndarray, dup: np.ndarray, df: pd.DataFrame, on, duplicates: str) -> np.ndarray:
+    """Apply the `duplicates` policy to one frame's repeated keys (dup marks all but the last)."""
+    n = int(dup.sum())
+    if n:
+        cols = [c for c in df.columns if c not in on]
+        msg = f"{n} rows of {cols} repeat a {'/'.join(on)} key already in the frame"
+        if duplicates == "raise":
+            raise ValueError(msg + "; pass a key that identifies rows (e.g. add 'ticker')")
+        if duplicates == "warn":
+            print(f"[WARN] {msg}; keeping the last row of each")
+    return keep & ~dup
+
+def align_frames(dfs, on=("date",), duplicates: str = "warn") -> Optional[pd.DataFrame]:
+    """
+    Single-pass N-way outer alignment of frames on key column(s).
+      - builds the union (sorted) key index once
+      - places every value column into one preallocated float block (non-numeric columns
+        get their own preallocated object arrays) via positional indexing; no pairwise merges
+      - duplicate column labels across frames become 'label (2)', 'label (3)', ... in input order
+      - duplicate keys within one frame: duplicates="warn" (default) keeps the last row and prints
+        a warning, "raise" raises ValueError, "last" keeps the last row silently
+      - rows with an unparseable date are dropped
+    Frames missing a key column (e.g. empty results) are skipped. Input frames are not modified.
+    """
+    on = list(on)
+    single = on == ["date"]
+    parts = []
+    for df in dfs or []:
+        if df is None or df.empty or any(k not in df.columns for k in on):
+            continue
+        if single:
+            keys = _as_datetime(df["date"]).to_numpy().astype("datetime64[ns]")
+            keep = ~np.isnat(keys)
+            if not pd.Index(keys).is_unique:
+                keep = _drop_duplicate_keys(keep, pd.Index(keys).duplicated(keep="last") & keep, df, on, duplicates)
+        else:
+            keys = pd.DataFrame({k: (_as_datetime(df[k]) if k == "date" else df[k]) for k in on})
+            keep = np.ones(len(keys), dtype=bool)
+            if "date" in on:
+                keep &= keys["date"].notna().to_numpy()
+            keep = _drop_duplicate_keys(keep, keys.duplicated(keep="last").to_numpy() & keep, df, on, duplicates)
+        if not keep.all():
+            keys = keys[keep]
+        parts.append((keys, df, keep))
+    if not parts:
+        return None
+
+    # 1) union key index, built once
+    if single:
+        union = np.unique(np.concatenate([k for k, _, _ in parts]))
+    else:
+        union = pd.MultiIndex.from_frame(pd.concat([k for k, _, _ in parts], ignore_index=True)).unique().sort_values()
+    n = len(union)
+
+    # 2) plan columns: positions into the union, unique labels, numeric vs object storage
+    seen, plan = {}, []
+    for keys, df, keep in parts:
+        pos = np.searchsorted(union, keys) if single else union.get_indexer(pd.MultiIndex.from_frame(keys))
+        subset = not keep.all()
+        for col in df.columns:
+            if col in on:
+                continue
+            s = df[col]
+            numeric = pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s)
+            vals = s.to_numpy(dtype="float64", na_value=np.nan) if numeric else s.to_numpy(dtype=object)
+            plan.append((_unique_label(col, seen), pos, vals[keep] if subset else vals, numeric))
+
+    # 3) fill one preallocated float block + object arrays
+    num_cols = [p for p in plan if p[3]]
+    block = np.full((n, len(num_cols)), np.nan, dtype="float64")
+    for j, (_, pos, vals, _) in enumerate(num_cols):
+        block[pos, j] = vals
+    obj_data = {}
+    for label, pos, vals, numeric in plan:
+        if not numeric:
+            arr = np.full(n, None, dtype=object)
+            arr[pos] = vals
+            obj_data[label] = arr
+
+    keys_df = pd.DataFrame({"date": union}) if single else union.to_frame(index=False)
+    out = pd.concat([keys_df,
+                     pd.DataFrame(block, columns=[p[0] for p in num_cols], copy=False),
+                     pd.DataFrame(obj_data, index=keys_df.index)], axis=1)
+    if obj_data:
+        out = out[on + [p[0] for p in plan]]
+    return out
+
+def outer_merge_on_date(dfs, duplicates: str = "warn"):
     """
-    Safely outer merge a list of dataframes on 'date',
+    Outer-align a list of dataframes on 'date' (see align_frames),
     coercing all date columns to datetime64 and ensuring unique column names.
+    A frame with several rows per date (e.g. long-format, one row per ticker) keeps
+    only the last of each, with a warning; duplicates="raise" makes that an error.
     """
     if not dfs:
         return None
+    return align_frames(dfs, on=("date",), duplicates=duplicates)
 
-    # Normalize 'date' column types
-    for i, df in enumerate(dfs):
-        if "date" not in df.columns:
+def zscore_normalize(merged: pd.DataFrame) -> pd.DataFrame:
+    """Client-side z-score of every numeric column except 'date' (in place; returns the frame)."""
+    for c in merged.columns:
+        if c == "date":
             continue
-        df = df.copy()
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
-        dfs[i] = df
-
-    base = dfs[0]
-    for df in dfs[1:]:
-        try:
-            base = pd.merge(base, df, on="date", how="outer")
-        except ValueError:
-            # Force datetime for both sides
-            base["date"] = pd.to_datetime(base["date"], errors="coerce")
-            df["date"] = pd.to_datetime(df["date"], errors="coerce")
-            base = pd.merge(base, df, on="date", how="outer")
-    return base.sort_values("date").reset_index(drop=True)
\ No newline at end of file
+        s = merged[c]
+        if pd.api.types.is_numeric_dtype(s):
+            std = s.std(skipna=True)
+            merged[c] = (s - s.mean(skipna=True)) / (std if std else 1.0)
+    return merged
@@ -1,12 +1,27 @@
 import os
+import asyncio
 import pandas as pd
 import numpy as np
-import requests
-from typing import Optional, Union, List, Dict
+from itertools import chain, product
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional, Tuple, Union, List, Dict
+
+from . import http_client, rate_limit, series_cache, sharding, tracing
+from .utils import align_frames
 
 # === API Base URLs ===
-VT_BASE_TICKERS = "https://www.vandatrack.com/tickers/api/"
-VT_BASE_OPTIONS = "https://www.vandatrack.com/option/api/"
+VT_BASE = os.getenv("VANDATRACK_BASE_URL", "https://www.vandatrack.com").rstrip("/")
+VT_BASE_TICKERS = f"{VT_BASE}/tickers/api/"
+VT_BASE_OPTIONS = f"{VT_BASE}/option/api/"
+
+# Net retail flow is buy minus sell: when all three are requested, fetch two and derive net
+DERIVE_NET = os.getenv("VANDATRACK_DERIVE_NET", "1") not in ("0", "false", "False")
+
+# Concurrent requests per options_grid() call
+OPTIONS_GRID_WORKERS = int(os.getenv("VANDATRACK_GRID_WORKERS", "6"))
+
+# Opt-in paginated streaming (retail_flow(stream=True)); page number query parameter
+PAGE_PARAM = "page"
 
 # === Global API Key Handling ===
 _API_KEY = os.getenv("VANDATRACK_API_KEY", "")
@@ -24,7 +39,9 @@ def have_key() -> bool:
 def _mock_ts(n=250, name="mock_series"):
     rng = np.random.default_rng(42)
     idx = pd.date_range(end=pd.Timestamp.today().normalize(), periods=n, freq="D")
-    return pd.DataFrame({"date": idx, name: rng.normal(0, 1, n).cumsum()})
+    df = pd.DataFrame({"date": idx, name: rng.normal(0, 1, n).cumsum()})
+    df.attrs["mock"] = True  # placeholder data: see utils.is_mock
+    return df
 
 def _build_params(base_params: Dict) -> Dict:
     """Attach auth and defaults."""
@@ -34,94 +51,432 @@ def _build_params(base_params: Dict) -> Dict:
     p.setdefault("pagination", "false")
     return p
 
+def _flatten_ticker_dict(data: Dict):
+    """{ ticker: { date: value } } -> (tickers, lengths, dates, values) as flat arrays, in one pass."""
+    series = [(tkr, s) for tkr, s in data.items() if isinstance(s, dict)]
+    lens = [len(s) for _, s in series]
+    dates = pd.to_datetime(pd.Index(list(chain.from_iterable(s.keys() for _, s in series)), dtype=object),
+                           errors="coerce")
+    values = np.array(list(chain.from_iterable(s.values() for _, s in series)), dtype="float64")
+    return [t for t, _ in series], lens, dates, values
+
+def _parse_ticker_dict(data: Dict, ftype: str) -> pd.DataFrame:
+    """
+    { "NVDA": { "YYYY-MM-DD": value, ... }, ... } -> one long frame [date, ftype, ticker]
+    built from flat arrays in a single pass (no per-ticker DataFrames / concat).
+    """
+    tickers, lens, dates, values = _flatten_ticker_dict(data)
+    return pd.DataFrame({
+        "date": dates,
+        ftype: values,
+        "ticker": np.repeat(np.array(tickers, dtype=object), lens),
+    })
+
+# === Paginated streaming ===
+class _FlowBuffer:
+    """
+    Columnar [date, value, ticker-code] buffer that pages are appended into.
+    Preallocated from the API's row count when known, otherwise grown geometrically,
+    so peak memory is the final columns plus one page.
+    """
+
+    def __init__(self, capacity: int = 0):
+        self.n = 0
+        self.dates = np.empty(capacity, dtype="datetime64[ns]")
+        self.values = np.empty(capacity, dtype="float64")
+        self.codes = np.empty(capacity, dtype="int32")
+        self.tickers: Dict[str, int] = {}
+
+    def _reserve(self, extra: int):
+        need = self.n + extra
+        if need <= len(self.values):
+            return
+        cap = max(need, 2 * len(self.values), 1024)
+        for name in ("dates", "values", "codes"):
+            old = getattr(self, name)
+            new = np.empty(cap, dtype=old.dtype)
+            new[: self.n] = old[: self.n]
+            setattr(self, name, new)
+
+    def append(self, data: Dict) -> int:
+        tickers, lens, dates, values = _flatten_ticker_dict(data)
+        k = len(values)
+        self._reserve(k)
+        codes = [self.tickers.setdefault(t, len(self.tickers)) for t in tickers]
+        self.dates[self.n:self.n + k] = dates.to_numpy(dtype="datetime64[ns]")
+        self.values[self.n:self.n + k] = values
+        self.codes[self.n:self.n + k] = np.repeat(np.array(codes, dtype="int32"), lens)
+        self.n += k
+        return k
+
+    def to_frame(self, ftype: str) -> pd.DataFrame:
+        df = pd.DataFrame({"date": self.dates[: self.n], ftype: self.values[: self.n]})
+        if len(self.tickers) > 1:
+            names = np.array(list(self.tickers), dtype=object)
+            df["ticker"] = names[self.codes[: self.n]]
+        return df
+
+def iter_pages(url: str, params: Dict) -> Iterator[Tuple[object, Optional[int]]]:
+    """
+    Yield (payload, total_count) per page using the API's pagination.
+    Assumes the paginated envelope {"count", "next", "results"}; a non-paginated
+    response is yielded once as-is.
+    """
+    p = {**params, "pagination": "true", PAGE_PARAM: 1}
+    next_url: Optional[str] = url
+    while next_url:
+        r = http_client.get(next_url, params=p, timeout=60)
+        r.raise_for_status()
+        data = r.json()
+        if not (isinstance(data, dict) and "results" in data):
+            yield data, None
+            return
+        yield data["results"], data.get("count")
+        next_url, p = data.get("next"), None  # "next" already carries the query string
+
+def _fetch_retail_stream(params: Dict, ftype: str,
+                         on_page: Optional[Callable[[int, int], None]] = None) -> pd.DataFrame:
+    """Paginated variant of _fetch_retail: pages go straight into a columnar buffer."""
+    buf = None
+    for pages, (payload, count) in enumerate(iter_pages(VT_BASE_TICKERS, params), start=1):
+        if buf is None:
+            buf = _FlowBuffer(capacity=int(count or 0))
+        with tracing.span("parse.retail_page", type=ftype, page=pages):
+            if isinstance(payload, dict):
+                buf.append(payload)
+            elif isinstance(payload, list) and payload and isinstance(payload[0], dict) and "date" in payload[0]:
+                # list-of-records pages: [{"date", "value", ("ticker")}, ...]
+                recs = {}
+                for rec in payload:
+                    recs.setdefault(rec.get("ticker", ""), {})[rec["date"]] = rec.get("value")
+                buf.append(recs)
+        if on_page:
+            on_page(pages, buf.n)
+    return buf.to_frame(ftype) if buf is not None and buf.n else pd.DataFrame()
+
+def _fetch_retail(params: Dict, ftype: str) -> pd.DataFrame:
+    """Raw /tickers/api/ call for one flow type; raises on any failure."""
+    r = http_client.get(VT_BASE_TICKERS, params=params, timeout=60)
+    r.raise_for_status()
+    with tracing.span("parse.retail", tickers=len(params.get("tickers") or []), type=ftype) as sp:
+        df = _parse_retail(r.json(), ftype)
+        sp["rows"] = len(df)
+    return df
+
+def _parse_retail(data, ftype: str) -> pd.DataFrame:
+    # Expect structure: { "NVDA": { "YYYY-MM-DD": value, ... } }
+    if isinstance(data, dict) and any(isinstance(v, dict) for v in data.values()):
+        df = _parse_ticker_dict(data, ftype)
+        # One ticker: plain [date, ftype] frame
+        if len(data) == 1:
+            df = df.drop(columns="ticker")
+        return df
+
+    # fallback for list-based structure
+    if isinstance(data, list) and data and isinstance(data[0], dict):
+        df = pd.DataFrame(data)
+        if "date" in df.columns:
+            df["date"] = pd.to_datetime(df["date"], errors="coerce")
+            df = df.rename(columns={"value": ftype})
+            return df[["date", ftype]]
+
+    return pd.DataFrame()
+
 # === RETAIL FLOW ===
+def _normalize_tickers(tickers: Optional[Union[str, List[str]]]) -> List[str]:
+    if isinstance(tickers, str):
+        return [tickers.strip()]
+    return list(tickers) if tickers else []
+
+def _flow_types(flow_type: str) -> Tuple[List[str], bool]:
+    """Types to request and whether net is derived from buy and sell."""
+    # "All" flow types: fetch buy and sell concurrently and derive net from them
+    derive_net = DERIVE_NET and flow_type not in ["net", "buy", "sell"]
+    if flow_type in ["net", "buy", "sell"]:
+        return [flow_type], False
+    return (["buy", "sell"] if derive_net else ["net", "buy", "sell"]), derive_net
+
+def _combine_flows(flows: Dict[str, pd.DataFrame], derive_net: bool, tickers: List[str],
+                   label: Optional[str]) -> pd.DataFrame:
+    """Per-type frames -> one labelled wide frame (mock series when nothing came back)."""
+    if not flows:
+        return _mock_ts(name=label or f"{tickers or 'Aggregate'} (mock)")
+
+    frames = list(flows.values())
+    keys = ("date", "ticker") if all("ticker" in df.columns for df in frames) else ("date",)
+    combined = align_frames(frames, on=keys)
+    if derive_net:
+        combined.insert(len(keys), "net", combined["buy"] - combined["sell"])
+    else:
+        # Keep the net, buy, sell column order regardless of completion order
+        order = [f for f in ["net", "buy", "sell"] if f in combined.columns]
+        combined = combined[list(keys) + order + [c for c in combined.columns if c not in keys and c not in order]]
+    label_prefix = label or (",".join(tickers) if tickers else "Aggregate Retail Flow")
+    combined = combined.rename(columns={c: f"{label_prefix} {c}" for c in combined.columns if c != "date"})
+    return combined
+
 def retail_flow(
     tickers: Optional[Union[str, List[str]]] = None,
     flow_type: str = "net",
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
-    label: Optional[str] = None
+    label: Optional[str] = None,
+    stream: bool = False,
+    on_page: Optional[Callable[[int, int], None]] = None,
 ) -> pd.DataFrame:
+    """
+    Fetch retail flow for tickers (or the aggregate when none).
+      - flow_type: 'net', 'buy', 'sell', or anything else for all three
+      - stream: use the API's pagination and append pages into a columnar buffer, so
+        peak memory follows page size; on_page(pages_done, rows_so_far) reports progress
+    """
     if not have_key():
         raise ValueError("No VandaTrack API key set. Please save it in the sidebar.")
 
-    url = VT_BASE_TICKERS
-    if isinstance(tickers, str):
-        tickers = [tickers.strip()]
-    elif tickers is None:
-        tickers = []
-
+    tickers = _normalize_tickers(tickers)
     params_base = {
         "tickers": tickers,
         "saved_list": "false",
-        "from_date": from_date or "2014-01-01",
-        "to_date": to_date or pd.Timestamp.today().strftime("%Y-%m-%d"),
         "auth_token": _API_KEY,
     }
+    from_date = from_date or "2014-01-01"
+    to_date = to_date or pd.Timestamp.today().strftime("%Y-%m-%d")
+    flow_types, derive_net = _flow_types(flow_type)
 
-    flow_types = [flow_type] if flow_type in ["net", "buy", "sell"] else ["net", "buy", "sell"]
-    flows = {}
-
-    for ftype in flow_types:
+    def fetch_type(ftype: str) -> Optional[pd.DataFrame]:
         params = params_base.copy()
         params["type"] = ftype
-        try:
-            print(f"Calling VandaTrack with tickers={tickers}, type={ftype}")  # debug
-            r = requests.get(url, params=params, timeout=60)
-            r.raise_for_status()
-            data = r.json()
-
-            # Expect structure: { "NVDA": { "YYYY-MM-DD": value, ... } }
-            if isinstance(data, dict):
-                # Handle one ticker
-                if len(data) == 1 and isinstance(next(iter(data.values())), dict):
-                    tkr, series = next(iter(data.items()))
-                    df = pd.DataFrame(
-                        list(series.items()), columns=["date", ftype]
-                    )
-                    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-                    flows[ftype] = df
-                    continue
-
-                # Handle multiple tickers
-                frames = []
-                for tkr, series in data.items():
-                    if isinstance(series, dict):
-                        dft = pd.DataFrame(list(series.items()), columns=["date", ftype])
-                        dft["ticker"] = tkr
-                        frames.append(dft)
-                if frames:
-                    df = pd.concat(frames, ignore_index=True)
-                    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-                    flows[ftype] = df
-                    continue
-
-            # fallback for list-based structure
-            if isinstance(data, list) and data and isinstance(data[0], dict):
-                df = pd.DataFrame(data)
-                if "date" in df.columns:
-                    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-                    df = df.rename(columns={"value": ftype})
-                    flows[ftype] = df[["date", ftype]]
 
+        def fetch(start, end):
+            p = {**params, "from_date": start, "to_date": end}
+            return _fetch_retail_stream(p, ftype, on_page) if stream else _fetch_retail(p, ftype)
+
+        try:
+            key = {"tickers": tickers, "type": ftype}
+            df = series_cache.get_or_load(
+                "track.retail_flow", {**key, "__from": from_date, "__to": to_date},
+                lambda: sharding.get_range("track.retail_flow", key, from_date, to_date, fetch)
+            )
+            return df if df is not None and not df.empty else None
+        except rate_limit.RateLimited:
+            raise
         except Exception as e:
             print(f"[WARN] retail_flow {ftype} failed: {e}")
+            return None
 
-    if not flows:
-        return _mock_ts(name=label or f"{tickers or 'Aggregate'} (mock)")
+    def fetch_all(types: List[str]) -> Dict[str, pd.DataFrame]:
+        if len(types) == 1:
+            results = [fetch_type(types[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(types), thread_name_prefix="vt-flow") as ex:
+                results = list(ex.map(tracing.bind(fetch_type), types))
+        return {f: df for f, df in zip(types, results) if df is not None}
+
+    flows = fetch_all(flow_types)
+    if derive_net and not ("buy" in flows and "sell" in flows):
+        # Can't derive: ask the API for net directly
+        flows.update(fetch_all(["net"]))
+        derive_net = False
+    return _combine_flows(flows, derive_net, tickers, label)
+
+def retail_flow_many(
+    tickers: List[str],
+    flow_type: str = "net",
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    labels: Optional[Dict[str, Optional[str]]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    retail_flow() for several single tickers with one multi-ticker request per flow type,
+    split back out: result[t] is what retail_flow(t, flow_type, from_date, to_date,
+    label=labels[t]) returns. Tickers already in the memo are not requested again, and each
+    ticker's slice is stored under its single-ticker key for later calls. Response keys are
+    matched case-insensitively; a ticker the response doesn't cover is fetched on its own.
+    """
+    if not have_key():
+        raise ValueError("No VandaTrack API key set. Please save it in the sidebar.")
 
-    combined = None
-    for ftype, df in flows.items():
-        combined = df if combined is None else pd.merge(combined, df, on="date", how="outer")
+    tickers = list(dict.fromkeys(t.strip() for t in tickers if t and t.strip()))
+    labels = labels or {}
+    from_date = from_date or "2014-01-01"
+    to_date = to_date or pd.Timestamp.today().strftime("%Y-%m-%d")
+    flow_types, derive_net = _flow_types(flow_type)
+
+    def single(t: str, ftype: str) -> Dict:
+        return {"tickers": [t], "type": ftype, "__from": from_date, "__to": to_date}
+
+    def fetch_type(ftype: str) -> Dict[str, pd.DataFrame]:
+        out = {}
+        for t in tickers:
+            df = series_cache.peek("track.retail_flow", single(t, ftype))
+            if df is not None:
+                out[t] = df
+        missing = [t for t in tickers if t not in out]
+        if not missing:
+            return out
+        params = {"tickers": missing, "saved_list": "false", "auth_token": _API_KEY, "type": ftype}
+
+        def fetch(start, end):
+            return _fetch_retail({**params, "from_date": start, "to_date": end}, ftype)
 
-    combined = combined.sort_values("date").reset_index(drop=True)
-    label_prefix = label or (",".join(tickers) if tickers else "Aggregate Retail Flow")
-    combined = combined.rename(columns={c: f"{label_prefix} {c}" for c in combined.columns if c != "date"})
-    return combined
+        try:
+            key = {"tickers": missing, "type": ftype}
+            df = series_cache.get_or_load(
+                "track.retail_flow", {**key, "__from": from_date, "__to": to_date},
+                lambda: sharding.get_range("track.retail_flow", key, from_date, to_date, fetch))
+        except rate_limit.RateLimited:
+            raise
+        except Exception as e:
+            print(f"[WARN] retail_flow {ftype} failed for {','.join(missing)}: {e}")
+            return out
+        if df is None or df.empty:
+            return out
+        if "ticker" not in df.columns:  # one ticker: the API's plain shape
+            parts = {missing[0]: df} if len(missing) == 1 else {}
+        else:
+            # The API may echo "aapl" back as "AAPL"
+            wanted: Dict[str, List[str]] = {}
+            for t in missing:
+                wanted.setdefault(t.upper(), []).append(t)
+            parts = {}
+            for key, g in df.groupby("ticker", sort=False):
+                for t in wanted.get(str(key).strip().upper(), []):
+                    parts[t] = g.drop(columns="ticker").reset_index(drop=True)
+        for t, part in parts.items():
+            if not part.empty:
+                series_cache.put("track.retail_flow", single(t, ftype), part)
+                out[t] = part
+        return out
+
+    def fetch_all(types: List[str]) -> Dict[str, Dict[str, pd.DataFrame]]:
+        if len(types) == 1:
+            return {types[0]: fetch_type(types[0])}
+        with ThreadPoolExecutor(max_workers=len(types), thread_name_prefix="vt-flow") as ex:
+            return dict(zip(types, ex.map(tracing.bind(fetch_type), types)))
+
+    by_type = fetch_all(flow_types)
+    results = {}
+    for t in tickers:
+        flows = {f: frames[t] for f, frames in by_type.items() if t in frames}
+        if len(flows) < len(flow_types):
+            # Not (fully) in the shared response: the single-ticker path, never mock data here
+            results[t] = retail_flow(t, flow_type, from_date, to_date, label=labels.get(t))
+            continue
+        results[t] = _combine_flows(flows, derive_net, [t], labels.get(t))
+    return results
+
+def _fetch_options(params: Dict) -> pd.DataFrame:
+    """Raw /option/api/ call; raises on any failure."""
+    r = http_client.get(VT_BASE_OPTIONS, params=params, timeout=60)
+    r.raise_for_status()
+    with tracing.span("parse.options", tickers=len(params.get("tickers") or [])) as sp:
+        df = _parse_options(r.json())
+        sp["rows"] = len(df)
+    return df
+
+def _parse_options(data) -> pd.DataFrame:
+    # Invalid response (an empty one is just an empty range, e.g. a shard before the series starts)
+    if isinstance(data, (str, int, float)):
+        raise ValueError(f"Invalid response: {type(data)}")
+    if not data:
+        return pd.DataFrame()
+
+    # Handle multi-ticker dicts
+    if isinstance(data, dict):
+        frames = []
+        for tkr, values in data.items():
+            if isinstance(values, list):
+                df_tkr = pd.DataFrame(values)
+            elif isinstance(values, dict):
+                df_tkr = pd.DataFrame([values])
+            else:
+                continue
+            if not df_tkr.empty:
+                df_tkr["ticker"] = tkr
+                frames.append(df_tkr)
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    elif isinstance(data, list):
+        df = pd.DataFrame(data)
+    else:
+        raise ValueError(f"Unexpected data type: {type(data)}")
 
+    if df.empty:
+        return df
 
+    # Fix date column
+    if "date" not in df.columns:
+        for c in ["time", "timestamp", "dt"]:
+            if c in df.columns:
+                df = df.rename(columns={c: "date"})
+                break
+
+    if "date" not in df.columns:
+        raise ValueError("No date column found in response")
+
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    return df
 
 # === OPTIONS FLOW ===
+def _options_request(tickers, callput, moneyness, size, thematic_list, from_date, to_date) -> Tuple[Dict, str]:
+    """Upstream params and default label for one options_flow() call."""
+    params = _build_params({
+        "from_date": from_date or "2014-01-01",
+        "to_date": to_date or pd.Timestamp.today().strftime("%Y-%m-%d"),
+        "callput": callput,
+        "moneyness": moneyness,
+        "size": size,
+    })
+
+    if thematic_list:
+        params["thematic_list"] = thematic_list
+        default_label = f"Aggregate Options Flow ({callput}, {moneyness}, {size})"
+    elif tickers:
+        if isinstance(tickers, str):
+            tickers = [s.strip() for s in tickers.split(",") if s.strip()]
+        params["tickers"] = tickers
+        default_label = f"{','.join(tickers)} ({callput},{moneyness},{size}) (Options)"
+    else:
+        default_label = f"Aggregate Options Flow ({callput},{moneyness},{size})"
+    return params, default_label
+
+def _options_memo(params: Dict) -> Tuple[Dict, Dict]:
+    """(cache key params, memo params): everything but the credentials and the range."""
+    key_params = {k: v for k, v in params.items()
+                  if k not in ("auth_token", "from_date", "to_date")}
+    return key_params, {**key_params, "__from": params["from_date"], "__to": params["to_date"]}
+
+def _options_value_cols(df: pd.DataFrame) -> List[str]:
+    value_cols = [c for c in df.columns if c.lower() not in ["date", "ticker", "symbol", "type"]]
+    if not value_cols:
+        raise ValueError("No value columns found")
+    return value_cols
+
+def _load_options(params: Dict) -> pd.DataFrame:
+    """Every column /option/api/ returned for one request, through the memo and disk cache; raises on failure."""
+    def fetch(start, end):
+        return _fetch_options({**params, "from_date": start, "to_date": end})
+
+    key_params, memo_params = _options_memo(params)
+    df = series_cache.get_or_load(
+        "track.options_flow", memo_params,
+        lambda: sharding.get_range("track.options_flow", key_params,
+                                   params["from_date"], params["to_date"], fetch))
+    if df is None or df.empty:
+        raise ValueError("Empty DataFrame after parsing")
+    return df
+
+class UnknownField(ValueError):
+    """The requested options value column is not in the API's response."""
+
+def _finish_options(df: pd.DataFrame, label: str, field: Optional[str] = None) -> pd.DataFrame:
+    if df is None or df.empty:
+        raise ValueError("Empty DataFrame after parsing")
+    value_cols = _options_value_cols(df)
+    if field and field not in value_cols:
+        raise UnknownField(f"value column {field!r} not returned; available: {', '.join(value_cols)}")
+    col = field or value_cols[0]
+    return df[["date", col]].rename(columns={col: label})
+
 def options_flow(
     tickers: Optional[Union[str, List[str]]] = None,
     callput: str = "put",
@@ -130,7 +485,8 @@ def options_flow(
     thematic_list: Optional[List[str]] = None,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
-    label: Optional[str] = None
+    label: Optional[str] = None,
+    field: Optional[str] = None
 ) -> pd.DataFrame:
     """
     Fetch options flow data (call/put, moneyness, size).
@@ -139,82 +495,171 @@ def options_flow(
       - moneyness: 'ITM', 'OTM', etc.
       - size: 'small', 'medium', 'large'
       - thematic_list: e.g. ['ADRs', 'All ETFs'] for aggregated option data
+      - field: value column to return (default: the first one); the others stay cached
     """
     if not have_key():
         return _mock_ts(name=label or "Options Flow (mock)")
 
-    params = _build_params({
-        "from_date": from_date or "2014-01-01",
-        "to_date": to_date or pd.Timestamp.today().strftime("%Y-%m-%d"),
-        "callput": callput,
-        "moneyness": moneyness,
-        "size": size,
-    })
+    params, default_label = _options_request(tickers, callput, moneyness, size, thematic_list, from_date, to_date)
+    try:
+        return _finish_options(_load_options(params), label or default_label, field)
+    except (rate_limit.RateLimited, UnknownField):
+        raise  # a wrong column name is the caller's to fix, not a reason for mock data
+    except Exception as e:
+        print(f"[WARN] options_flow failed: {e}")
+        return _mock_ts(name=label or default_label)
 
-    if thematic_list:
-        params["thematic_list"] = thematic_list
-        default_label = f"Aggregate Options Flow ({callput}, {moneyness}, {size})"
-    elif tickers:
-        if isinstance(tickers, str):
-            tickers = [s.strip() for s in tickers.split(",") if s.strip()]
-        params["tickers"] = tickers
-        default_label = f"{','.join(tickers)} ({callput},{moneyness},{size}) (Options)"
-    else:
-        default_label = f"Aggregate Options Flow ({callput},{moneyness},{size})"
+# === OPTIONS GRID ===
+GRID_LEVELS = ["callput", "moneyness", "size", "ticker", "field"]
 
-    try:
-        r = requests.get(VT_BASE_OPTIONS, params=params, timeout=60)
-        r.raise_for_status()
-        data = r.json()
+def _as_list(value: Union[str, List[str], Tuple[str, ...]]) -> List[str]:
+    return [value] if isinstance(value, str) else list(value)
 
-        # Empty or invalid response
-        if not data or isinstance(data, (str, int, float)):
-            raise ValueError(f"Empty or invalid response: {type(data)}")
-
-        # Handle multi-ticker dicts
-        if isinstance(data, dict):
-            frames = []
-            for tkr, values in data.items():
-                if isinstance(values, list):
-                    df_tkr = pd.DataFrame(values)
-                elif isinstance(values, dict):
-                    df_tkr = pd.DataFrame([values])
-                else:
-                    continue
-                if not df_tkr.empty:
-                    df_tkr["ticker"] = tkr
-                    frames.append(df_tkr)
-            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
-        elif isinstance(data, list):
-            df = pd.DataFrame(data)
-        elif isinstance(data, dict):
-            df = pd.DataFrame([data])
-        else:
-            raise ValueError(f"Unexpected data type: {type(data)}")
+def _options_wide(df: pd.DataFrame, default_ticker: str) -> pd.DataFrame:
+    """Long [date, (ticker), values...] -> date x (ticker, field), keeping every value column."""
+    value_cols = _options_value_cols(df)
+    if "ticker" not in df.columns:
+        df = df.assign(ticker=default_ticker)
+    df = df.dropna(subset=["date"]).drop_duplicates(subset=["date", "ticker"], keep="last")
+    return pd.concat({t: g.set_index("date")[value_cols] for t, g in df.groupby("ticker", sort=False)}, axis=1)
 
-        if df.empty:
-            raise ValueError("Empty DataFrame after parsing")
+def options_grid(
+    tickers: Optional[Union[str, List[str]]] = None,
+    callput: Union[str, List[str]] = ("call", "put"),
+    moneyness: Union[str, List[str]] = ("ITM", "OTM"),
+    size: Union[str, List[str]] = ("small", "medium", "large"),
+    thematic_list: Optional[List[str]] = None,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Options flow for every callput x moneyness x size combination as one wide frame: indexed
+    by date, columns (callput, moneyness, size, ticker, field) holding every value column the
+    API returned. Distinct combinations are fetched concurrently and cached exactly like
+    options_flow() calls, so charting any cell or field afterwards needs no request.
+    Combinations that fail are left out (with a warning); use options_series() to pick one.
+    """
+    if not have_key():
+        raise ValueError("No VandaTrack API key set. Please save it in the sidebar.")
 
-        # Fix date column
-        if "date" not in df.columns:
-            for c in ["time", "timestamp", "dt"]:
-                if c in df.columns:
-                    df = df.rename(columns={c: "date"})
-                    break
+    cells = list(dict.fromkeys(product(_as_list(callput), _as_list(moneyness), _as_list(size))))
+    if not cells:
+        return pd.DataFrame()
+    default_ticker = ",".join(_as_list(tickers)) if tickers else "Aggregate"
 
-        if "date" not in df.columns:
-            raise ValueError("No date column found in response")
+    def one(cell: Tuple[str, str, str]) -> Optional[pd.DataFrame]:
+        params, _ = _options_request(tickers, *cell, thematic_list, from_date, to_date)
+        try:
+            return _options_wide(_load_options(params), default_ticker)
+        except rate_limit.RateLimited:
+            raise
+        except Exception as e:
+            print(f"[WARN] options_grid {cell} failed: {e}")
+            return None
+
+    workers = max(1, min(OPTIONS_GRID_WORKERS, len(cells)))
+    with tracing.span("options_grid", cells=len(cells)):
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vt-options") as ex:
+            results = list(ex.map(tracing.bind(one), cells))
+        pieces = {cell: wide for cell, wide in zip(cells, results) if wide is not None}
+        if not pieces:
+            return pd.DataFrame()
+        return pd.concat(pieces, axis=1, names=GRID_LEVELS).sort_index()
+
+def options_series(grid: pd.DataFrame, callput: str, moneyness: str, size: str,
+                   ticker: Optional[str] = None, field: Optional[str] = None,
+                   label: Optional[str] = None) -> pd.DataFrame:
+    """One [date, label] series out of an options_grid() frame (first ticker / field by default)."""
+    cell = grid.xs((callput, moneyness, size), axis=1, level=[0, 1, 2])
+    ticker = ticker or cell.columns.get_level_values("ticker")[0]
+    values = cell[ticker]
+    field = field or values.columns[0]
+    s = values[field].dropna()
+    name = label or f"{ticker} ({callput},{moneyness},{size}) {field}"
+    return pd.DataFrame({"date": s.index, name: s.to_numpy()})
+
+# === Async ===
+# Same results as retail_flow / options_flow, for services fanning out many requests on one
+# event loop (http_client.aget). They share the process-wide memo; disk cache, sharding and
+# paginated streaming are left to the sync path.
+async def _fetch_retail_async(params: Dict, ftype: str) -> pd.DataFrame:
+    r = await http_client.aget(VT_BASE_TICKERS, params=params, timeout=60)
+    r.raise_for_status()
+    with tracing.span("parse.retail", tickers=len(params.get("tickers") or []), type=ftype) as sp:
+        df = _parse_retail(r.json(), ftype)
+        sp["rows"] = len(df)
+    return df
+
+async def retail_flow_async(
+    tickers: Optional[Union[str, List[str]]] = None,
+    flow_type: str = "net",
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    label: Optional[str] = None,
+) -> pd.DataFrame:
+    if not have_key():
+        raise ValueError("No VandaTrack API key set. Please save it in the sidebar.")
 
-        # Identify numeric value columns
-        value_cols = [c for c in df.columns if c.lower() not in ["date", "ticker", "symbol", "type"]]
-        if not value_cols:
-            raise ValueError("No value columns found")
+    tickers = _normalize_tickers(tickers)
+    from_date = from_date or "2014-01-01"
+    to_date = to_date or pd.Timestamp.today().strftime("%Y-%m-%d")
+    flow_types, derive_net = _flow_types(flow_type)
 
-        col = value_cols[0]
-        label_final = label or default_label
-        df = df[["date", col]].rename(columns={col: label_final})
+    async def fetch_type(ftype: str) -> Optional[pd.DataFrame]:
+        params = {"tickers": tickers, "saved_list": "false", "auth_token": _API_KEY, "type": ftype,
+                  "from_date": from_date, "to_date": to_date}
+        try:
+            key = {"tickers": tickers, "type": ftype}
+            df = await series_cache.get_or_load_async(
+                "track.retail_flow", {**key, "__from": from_date, "__to": to_date},
+                lambda: _fetch_retail_async(params, ftype))
+            return df if df is not None and not df.empty else None
+        except rate_limit.RateLimited:
+            raise
+        except Exception as e:
+            print(f"[WARN] retail_flow {ftype} failed: {e}")
+            return None
+
+    async def fetch_all(types: List[str]) -> Dict[str, pd.DataFrame]:
+        results = await asyncio.gather(*(fetch_type(t) for t in types))
+        return {f: df for f, df in zip(types, results) if df is not None}
+
+    flows = await fetch_all(flow_types)
+    if derive_net and not ("buy" in flows and "sell" in flows):
+        flows.update(await fetch_all(["net"]))
+        derive_net = False
+    return _combine_flows(flows, derive_net, tickers, label)
+
+async def options_flow_async(
+    tickers: Optional[Union[str, List[str]]] = None,
+    callput: str = "put",
+    moneyness: str = "OTM",
+    size: str = "small",
+    thematic_list: Optional[List[str]] = None,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    label: Optional[str] = None,
+    field: Optional[str] = None
+) -> pd.DataFrame:
+    if not have_key():
+        return _mock_ts(name=label or "Options Flow (mock)")
+
+    params, default_label = _options_request(tickers, callput, moneyness, size, thematic_list, from_date, to_date)
+
+    async def fetch() -> pd.DataFrame:
+        r = await http_client.aget(VT_BASE_OPTIONS, params=params, timeout=60)
+        r.raise_for_status()
+        with tracing.span("parse.options", tickers=len(params.get("tickers") or [])) as sp:
+            df = _parse_options(r.json())
+            sp["rows"] = len(df)
         return df
 
+    try:
+        _, memo_params = _options_memo(params)
+        df = await series_cache.get_or_load_async("track.options_flow", memo_params, fetch)
+        return _finish_options(df, label or default_label, field)
+    except (rate_limit.RateLimited, UnknownField):
+        raise
     except Exception as e:
         print(f"[WARN] options_flow failed: {e}")
-        return _mock_ts(name=label or default_label)
\ No newline at end of file
+        return _mock_ts(name=label or default_label)
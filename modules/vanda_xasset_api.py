@@ -1,14 +1,36 @@
 import os
+import time
+import threading
 import pandas as pd
 import numpy as np
-import requests
 from typing import Optional, Dict, List
 
+from . import freshness, http_client, rate_limit, series_cache, sharding, tracing, transforms
+
 BASE = os.getenv("VANDA_BASE_URL", "https://api.vandaxasset.com")
 _API_KEY = os.getenv("VANDA_XASSET_API_KEY", os.getenv("VANDA_API_KEY",""))
 
+# Derive frequency / rolling-sum / z-score variants locally from the base daily series
+# (modules/transforms.py) instead of one upstream request per combination. Off, and it
+# stays off: the parity check against the API has NOT been done. No API responses are
+# recorded in tests/fixtures/transforms yet (python -m bench.record_parity needs a real key),
+# so tests/test_transforms.py skips it. Enable only once that test runs and passes.
+LOCAL_TRANSFORMS = os.getenv("VANDA_LOCAL_TRANSFORMS", "0") not in ("0", "false", "False")
+if LOCAL_TRANSFORMS:
+    print("[WARN] VANDA_LOCAL_TRANSFORMS is on, but local transforms are not verified against the API")
+
+# Field lookup index (see field_index)
+FIELD_INDEX_TTL = float(os.getenv("VANDA_FIELD_INDEX_TTL", "3600"))
+_FIELD_INDEX_RETRY = 60.0
+_ALL_SERIES = "*"
+_field_lock = threading.Lock()
+_field_index: Dict[str, List[str]] = {}
+_field_index_expires = 0.0
+
 def set_key(key: str):
-    global _API_KEY
+    global _API_KEY, _field_index_expires
+    if key != _API_KEY:
+        _field_index_expires = 0.0  # new credentials may see a different catalog
     _API_KEY = key
     os.environ["VANDA_XASSET_API_KEY"] = key
 
@@ -21,17 +43,25 @@ def _headers() -> Dict[str,str]:
 def _mock_ts(n=250, name="xasset_value"):
     rng = np.random.default_rng(0)
     idx = pd.date_range(end=pd.Timestamp.today().normalize(), periods=n, freq="D")
-    return pd.DataFrame({"date": idx, name: rng.normal(0,1,n).cumsum()})
+    df = pd.DataFrame({"date": idx, name: rng.normal(0,1,n).cumsum()})
+    df.attrs["mock"] = True  # placeholder data: see utils.is_mock
+    return df
 
-def filter_list(asset: Optional[str]=None, geography: Optional[str]=None, sector: Optional[str]=None) -> pd.DataFrame:
+def _filter_params(asset: Optional[str], geography: Optional[str], sector: Optional[str]) -> Dict:
     params = {}
     if asset: params["asset"] = asset
     if geography: params["geography"] = geography
     if sector: params["sector"] = sector
+    return params
+
+def filter_list(asset: Optional[str]=None, geography: Optional[str]=None, sector: Optional[str]=None) -> pd.DataFrame:
     try:
-        r = requests.get(f"{BASE}/filter-list", params=params, headers=_headers(), timeout=30)
+        r = http_client.get(f"{BASE}/filter-list", params=_filter_params(asset, geography, sector),
+                            headers=_headers(), timeout=30)
         r.raise_for_status()
         return pd.DataFrame(r.json())
+    except rate_limit.RateLimited:
+        raise
     except Exception:
         return _mock_ts()
 
@@ -39,33 +69,132 @@ def field_mappings(model: Optional[str]=None) -> pd.DataFrame:
     params = {}
     if model: params["model"] = model
     try:
-        r = requests.get(f"{BASE}/field-mappings", params=params, headers=_headers(), timeout=30)
+        r = http_client.get(f"{BASE}/field-mappings", params=params, headers=_headers(), timeout=30)
         r.raise_for_status()
         return pd.DataFrame(r.json())
+    except rate_limit.RateLimited:
+        raise
     except Exception:
         return pd.DataFrame()
 
+def _build_field_index(df: pd.DataFrame) -> Dict[str, List[str]]:
+    """series_id (upper-cased) -> distinct field names, in catalog order."""
+    if df.empty:
+        return {}
+    if "series_id" not in df.columns:
+        for c in ["_id","timeseries_id","series","id"]:
+            if c in df.columns:
+                df = df.rename(columns={c:"series_id"})
+                break
+    candidates = [c for c in df.columns if c.lower() in ("field","field_name","name")]
+    if not candidates:
+        return {}
+    if "series_id" not in df.columns:
+        # No per-series key: every series shares the full field list
+        fields = pd.unique(df[candidates].T.stack().dropna().astype(str)).tolist()
+        return {_ALL_SERIES: fields}
+    long = df[["series_id"] + candidates].melt(id_vars="series_id", value_name="_field").dropna()
+    long["series_id"] = long["series_id"].astype(str).str.upper()
+    long["_field"] = long["_field"].astype(str)
+    long = long.drop_duplicates(subset=["series_id", "_field"])
+    return {sid: grp.tolist() for sid, grp in long.groupby("series_id", sort=False)["_field"]}
+
+def field_index(force: bool = False) -> Dict[str, List[str]]:
+    """
+    Process-wide series_id -> [fields] index built from field_mappings(), shared by all sessions.
+    Rebuilt after FIELD_INDEX_TTL seconds; an empty result (no key / API down) is retried sooner.
+    """
+    global _field_index, _field_index_expires
+    with _field_lock:
+        if force or time.monotonic() >= _field_index_expires:
+            try:
+                idx = _build_field_index(field_mappings())
+            except rate_limit.RateLimited as e:
+                print(f"[WARN] field index not refreshed, keeping the previous one: {e}")
+                _field_index_expires = time.monotonic() + _FIELD_INDEX_RETRY
+                return _field_index
+            except Exception:
+                idx = {}
+            _field_index = idx
+            _field_index_expires = time.monotonic() + (FIELD_INDEX_TTL if idx else _FIELD_INDEX_RETRY)
+        return _field_index
+
 def fields_for_series(series_id: str) -> List[str]:
-    try:
-        df = field_mappings()
-        if df.empty:
-            return []
-        if "series_id" not in df.columns:
-            for c in ["_id","timeseries_id","series","id"]:
+    idx = field_index()
+    return list(idx.get(str(series_id).upper()) or idx.get(_ALL_SERIES, []))
+
+def _fetch_timeseries(params: Dict) -> pd.DataFrame:
+    """Raw /timeseries call; raises on any failure so callers decide on fallbacks."""
+    r = http_client.get(f"{BASE}/timeseries", params=params, headers=_headers(), timeout=60)
+    r.raise_for_status()
+    return _parse_timeseries(r.json(), params.get("series_id"))
+
+def _parse_timeseries(data, series_id: Optional[str]) -> pd.DataFrame:
+    with tracing.span("parse.timeseries", series_id=series_id) as sp:
+        df = pd.DataFrame(data)
+        if "date" not in df.columns:
+            for c in ["time","timestamp","dt"]:
                 if c in df.columns:
-                    df = df.rename(columns={c:"series_id"})
+                    df = df.rename(columns={c:"date"})
                     break
-        candidates = [c for c in df.columns if c.lower() in ("field","field_name","name")]
-        if "series_id" in df.columns:
-            sub = df[df["series_id"].astype(str).str.upper()==str(series_id).upper()]
-        else:
-            sub = df
-        fields = []
-        for c in candidates:
-            fields += sub[c].dropna().astype(str).unique().tolist()
-        return list(dict.fromkeys(fields))
-    except Exception:
-        return []
+        if "date" in df.columns:
+            df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        sp["rows"] = len(df)
+    return df
+
+def _range_params(params: Dict, start: Optional[str], end: Optional[str]) -> Dict:
+    p = dict(params)
+    if start: p["start_date"] = start
+    if end: p["end_date"] = end
+    return p
+
+def _plan_timeseries(series_id: str, field_name: Optional[str], start_date: Optional[str],
+                     end_date: Optional[str], frequency: Optional[str], rolling_sum: Optional[str],
+                     z_score: Optional[str]) -> Dict:
+    """
+    What timeseries() fetches for its arguments: upstream params and range, and whether the
+    frequency / rolling-sum / z-score variant is derived locally from the base daily series.
+    """
+    params = {"series_id": series_id}
+    if field_name: params["field_name"] = field_name
+    base_params = dict(params)
+    if frequency: params["frequency"] = frequency
+    if rolling_sum: params["rolling_sum"] = rolling_sum
+    if z_score: params["z_score"] = z_score
+
+    # Window-dependent server-side transforms can't be stitched from partial ranges
+    incremental = frequency in (None, "daily") and not rolling_sum and not z_score
+    # ...so derive them locally from the (incrementally cached) base daily series instead
+    local = LOCAL_TRANSFORMS and not incremental
+
+    plan = {"series_id": series_id, "field_name": field_name, "frequency": frequency,
+            "rolling_sum": rolling_sum, "z_score": z_score, "from": start_date, "to": end_date,
+            "local": local, "incremental": incremental or local}
+    if local:
+        lb = transforms.lookback(frequency, rolling_sum, z_score)
+        base_start = None if lb is None or not start_date else (pd.Timestamp(start_date) - lb).strftime("%Y-%m-%d")
+        plan.update(params=base_params, start=base_start, end=end_date)
+    else:
+        plan.update(params=params, start=start_date, end=end_date)
+    plan["memo"] = {**plan["params"], "__from": plan["start"], "__to": plan["end"]}
+    return plan
+
+def _finish_timeseries(df: pd.DataFrame, plan: Dict, label: Optional[str]) -> pd.DataFrame:
+    """Fetched frame -> the labelled [date, value] frame timeseries() returns."""
+    value_cols = [c for c in df.columns if c != "date"]
+    if not value_cols:
+        return pd.DataFrame()
+    series_id, field_name = plan["series_id"], plan["field_name"]
+    out_label = label or f"{series_id}{'·'+field_name if field_name else ''} (XAsset)"
+    z_cols = [c for c in value_cols if 'z' in c.lower()]
+    col = z_cols[0] if z_cols else value_cols[0]
+    df = df[["date", col]]
+    if plan["local"]:
+        with tracing.span("transform.local", frequency=plan["frequency"], rolling_sum=plan["rolling_sum"],
+                          z_score=plan["z_score"]):
+            df = transforms.apply(df, plan["frequency"], plan["rolling_sum"], plan["z_score"],
+                                  plan["from"], plan["to"])
+    return df.rename(columns={col: out_label})
 
 def timeseries(series_id: str,
                field_name: Optional[str]=None,
@@ -75,29 +204,75 @@ def timeseries(series_id: str,
                frequency: Optional[str]=None,
                rolling_sum: Optional[str]=None,
                z_score: Optional[str]=None) -> pd.DataFrame:
-    params = {"series_id": series_id}
-    if field_name: params["field_name"] = field_name
-    if start_date: params["start_date"] = start_date
-    if end_date: params["end_date"] = end_date
-    if frequency: params["frequency"] = frequency
-    if rolling_sum: params["rolling_sum"] = rolling_sum
-    if z_score: params["z_score"] = z_score
+    plan = _plan_timeseries(series_id, field_name, start_date, end_date, frequency, rolling_sum, z_score)
+
+    def fetch(start: Optional[str], end: Optional[str]) -> pd.DataFrame:
+        return _fetch_timeseries(_range_params(plan["params"], start, end))
+
+    # Cached copies stay fresh until the series' next publication (data/mapping.csv schedule)
+    ttl = freshness.ttl_for(series_id, end_date)
+
+    try:
+        df = series_cache.get_or_load(
+            "xasset.timeseries", plan["memo"],
+            lambda: sharding.get_range("xasset.timeseries", plan["params"], plan["start"], plan["end"],
+                                         fetch, incremental=plan["incremental"], ttl=ttl),
+            ttl=ttl)
+        return _finish_timeseries(df, plan, label)
+    except rate_limit.RateLimited:
+        raise  # over our own request budget: report it rather than chart mock data
+    except Exception:
+        return _mock_ts(name=label or f"{series_id} (mock)")
 
+# === Async ===
+# Same results as the functions above, for services fanning out many requests on one event
+# loop (http_client.aget). They share the process-wide memo; disk cache and sharding are
+# left to the sync path.
+async def filter_list_async(asset: Optional[str]=None, geography: Optional[str]=None,
+                            sector: Optional[str]=None) -> pd.DataFrame:
     try:
-        r = requests.get(f"{BASE}/timeseries", params=params, headers=_headers(), timeout=60)
+        r = await http_client.aget(f"{BASE}/filter-list", params=_filter_params(asset, geography, sector),
+                                   headers=_headers(), timeout=30)
         r.raise_for_status()
-        df = pd.DataFrame(r.json())
-        if "date" not in df.columns:
-            for c in ["time","timestamp","dt"]:
-                if c in df.columns:
-                    df = df.rename(columns={c:"date"})
-                    break
-        value_cols = [c for c in df.columns if c != "date"]
-        if not value_cols:
-            return pd.DataFrame()
-        out_label = label or f"{series_id}{'·'+field_name if field_name else ''} (XAsset)"
-        z_cols = [c for c in value_cols if 'z' in c.lower()]
-        col = z_cols[0] if z_cols else value_cols[0]
-        return df[["date", col]].rename(columns={col: out_label})
+        return pd.DataFrame(r.json())
+    except rate_limit.RateLimited:
+        raise
+    except Exception:
+        return _mock_ts()
+
+async def field_mappings_async(model: Optional[str]=None) -> pd.DataFrame:
+    params = {"model": model} if model else {}
+    try:
+        r = await http_client.aget(f"{BASE}/field-mappings", params=params, headers=_headers(), timeout=30)
+        r.raise_for_status()
+        return pd.DataFrame(r.json())
+    except rate_limit.RateLimited:
+        raise
+    except Exception:
+        return pd.DataFrame()
+
+async def _fetch_timeseries_async(params: Dict) -> pd.DataFrame:
+    r = await http_client.aget(f"{BASE}/timeseries", params=params, headers=_headers(), timeout=60)
+    r.raise_for_status()
+    return _parse_timeseries(r.json(), params.get("series_id"))
+
+async def timeseries_async(series_id: str,
+                           field_name: Optional[str]=None,
+                           start_date: Optional[str]=None,
+                           end_date: Optional[str]=None,
+                           label: Optional[str]=None,
+                           frequency: Optional[str]=None,
+                           rolling_sum: Optional[str]=None,
+                           z_score: Optional[str]=None) -> pd.DataFrame:
+    plan = _plan_timeseries(series_id, field_name, start_date, end_date, frequency, rolling_sum, z_score)
+    ttl = freshness.ttl_for(series_id, end_date)
+    try:
+        df = await series_cache.get_or_load_async(
+            "xasset.timeseries", plan["memo"],
+            lambda: _fetch_timeseries_async(_range_params(plan["params"], plan["start"], plan["end"])),
+            ttl=ttl)
+        return _finish_timeseries(df, plan, label)
+    except rate_limit.RateLimited:
+        raise  # over our own request budget: report it rather than chart mock data
     except Exception:
         return _mock_ts(name=label or f"{series_id} (mock)")
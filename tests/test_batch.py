@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from bench import mock_server
+from modules import batch, http_client
+
+EQ = {"api": "xasset", "series_id": "BENCHEQU000000", "from": "2024-01-01", "to": "2024-03-29", "label": "EQ"}
+AAPL = {"api": "vandatrack", "endpoint": "retail", "ticker": "AAPL", "type": "net",
+        "from": "2024-01-01", "to": "2024-03-29", "label": "AAPL"}
+
+@pytest.fixture
+def configs(tmp_path):
+    path = tmp_path / "charts.json"
+    path.write_text(json.dumps({"charts": [{"name": "eq", "items": [EQ]},
+                                           {"name": "both", "items": [EQ, AAPL]},
+                                           {"name": "aapl", "items": [AAPL]}]}))
+    return str(path)
+
+def test_batch_writes_every_chart(apis, configs, tmp_path):
+    out = tmp_path / "out"
+    assert batch.main([configs, "--out", str(out), "--formats", "csv", "--workers", "1"]) == 0
+    assert sorted(p.name for p in out.iterdir()) == ["aapl.csv", "both.csv", "eq.csv"]
+
+def test_upstream_500_fails_the_chart_instead_of_writing_placeholder_data(apis, configs, tmp_path, monkeypatch):
+    monkeypatch.setattr(mock_server, "ERRORS", {"/timeseries": 500})
+    monkeypatch.setattr(http_client, "MAX_RETRIES", 0)
+    charts = batch.load_charts([configs])
+
+    frames, errors = batch.fetch_shared(charts)
+    assert list(errors) == [batch.series_key(EQ)] and "placeholder" in errors[batch.series_key(EQ)]
+
+    out = tmp_path / "out"
+    results = batch.run_batch(charts, str(out), ["csv"], workers=1)
+    assert [(r["chart"], r["error"]) for r in results] == [
+        ("eq", "fetch failed for EQ"), ("both", "fetch failed for EQ"), ("aapl", None)]
+    assert [p.name for p in out.iterdir()] == ["aapl.csv"]
+    assert batch.main([configs, "--out", str(tmp_path / "cli"), "--formats", "csv", "--workers", "1"]) == 1
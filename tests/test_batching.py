@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from modules import fetch, http_client
+from modules import vanda_track_api as vt
+from modules.fetch import fetch_items, plan_batches
+from modules.utils import is_mock
+
+def _retail(ticker, label, type_="net"):
+    return {"api": "track", "endpoint": "retail", "ticker": ticker, "type": type_,
+            "from": "2024-01-01", "to": "2024-03-29", "label": label}
+
+def _count_requests(monkeypatch):
+    sent = []
+    real_get = http_client.get
+    monkeypatch.setattr(http_client, "get", lambda url, params=None, **kw: sent.append(params) or real_get(url, params, **kw))
+    return sent
+
+@pytest.mark.parametrize("type_", ["net", "buy", "All"])
+def test_batched_items_equal_the_per_item_path(apis, monkeypatch, type_):
+    items = [_retail(t, f"{t} flow", type_) for t in ["AAPL", "MSFT", "NVDA", "TSLA"]]
+    items.insert(2, {"api": "xasset", "series_id": "BENCHEQU000000", "from": "2024-01-01", "to": "2024-03-29", "label": "EQ"})
+    sent = _count_requests(monkeypatch)
+    batched = fetch_items(items)
+    n_batched = len(sent)
+    single = [(fetch.fetch_item(it, track_use=False), None) for it in items]
+    assert n_batched < len(sent) - n_batched
+    for (a, err), (b, _) in zip(batched, single):
+        assert err is None and not is_mock(a)
+        pd.testing.assert_frame_equal(a, b)
+
+def test_duplicate_tickers_with_different_labels_keep_their_labels(apis):
+    items = [_retail("AAPL", "A1"), _retail("aapl", "A2"), _retail("MSFT", "M")]
+    assert plan_batches(items, coalesce=True) == [[0], [1, 2]]
+    (a1, _), (a2, _), (m, _) = fetch_items(items)
+    assert list(a1.columns) == ["date", "A1 net"]
+    assert list(a2.columns) == ["date", "A2 net"]
+    assert list(m.columns) == ["date", "M net"]
+
+def test_response_keys_are_matched_case_insensitively(apis, monkeypatch):
+    real = vt._fetch_retail
+
+    def shouting(params, ftype):
+        df = real(params, ftype)
+        if "ticker" in df.columns:
+            df["ticker"] = df["ticker"].str.upper()
+        return df
+    monkeypatch.setattr(vt, "_fetch_retail", shouting)
+    frames = vt.retail_flow_many(["aapl", "msft"], "net", "2024-01-01", "2024-03-29", {"aapl": "a", "msft": "m"})
+    for t, label in [("aapl", "a"), ("msft", "m")]:
+        assert not is_mock(frames[t])
+        pd.testing.assert_frame_equal(frames[t], vt.retail_flow(t, "net", "2024-01-01", "2024-03-29", label=label))
+
+def test_a_ticker_missing_from_the_response_is_fetched_on_its_own(apis, monkeypatch):
+    real = vt._fetch_retail
+
+    def drops_msft(params, ftype):
+        df = real(params, ftype)
+        if len(params["tickers"]) > 1:
+            df = df[df["ticker"] != "MSFT"]
+        return df
+    monkeypatch.setattr(vt, "_fetch_retail", drops_msft)
+    sent = _count_requests(monkeypatch)
+    frames = vt.retail_flow_many(["AAPL", "MSFT"], "net", "2024-01-01", "2024-03-29")
+    assert not is_mock(frames["MSFT"])
+    assert [p["tickers"] for p in sent] == [["AAPL", "MSFT"], ["MSFT"]]
@@ -0,0 +1,61 @@
+
+import pandas as pd
+import pytest
+
+from modules import dashboards, http_client
+from modules import vanda_xasset_api as xa
+from modules.utils import is_mock
+
+ITEMS = [{"api": "xasset", "series_id": "BENCHEQU000000", "from": "2024-01-01", "to": "2024-03-29", "label": "EQ"},
+         {"api": "xasset", "series_id": "BENCHFX0000001", "from": "2024-01-01", "to": "2024-03-29", "label": "FX"}]
+
+@pytest.fixture
+def dash_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(dashboards, "DASHBOARD_DIR", str(tmp_path))
+    return tmp_path
+
+def _snapshot():
+    return pd.DataFrame({"date": pd.bdate_range("2023-01-02", periods=5), "EQ": [1.0, 2, 3, 4, 5]})
+
+def test_refresh_rewrites_the_snapshot_when_every_item_succeeds(apis, dash_dir):
+    dashboards.save_dashboard("desk", ITEMS, {}, _snapshot())
+    result = dashboards._refresh("desk")
+    assert result["saved"] and not result["errors"]
+    data = dashboards.load_dashboard("desk")["data"]
+    assert list(data.columns) == ["date", "EQ", "FX"]
+    assert data["date"].min() >= pd.Timestamp("2024-01-01")
+
+def test_refresh_keeps_the_snapshot_when_the_api_is_unreachable(apis, dash_dir, monkeypatch):
+    dashboards.save_dashboard("desk", ITEMS, {}, _snapshot())
+    before = dashboards.load_dashboard("desk")
+    monkeypatch.setattr(xa, "BASE", "http://127.0.0.1:9")  # refused: xa.timeseries falls back to mock data
+    monkeypatch.setattr(http_client, "MAX_RETRIES", 0)
+    result = dashboards._refresh("desk")
+    assert not result["saved"] and len(result["errors"]) == 2
+    after = dashboards.load_dashboard("desk")
+    pd.testing.assert_frame_equal(after["data"], before["data"])
+    assert after["snapshot_at"] == before["snapshot_at"]
+
+def test_refresh_keeps_the_snapshot_when_one_item_errors(apis, dash_dir, monkeypatch):
+    dashboards.save_dashboard("desk", ITEMS, {}, _snapshot())
+    good = pd.DataFrame({"date": pd.bdate_range("2024-01-01", periods=3), "EQ": [1.0, 2, 3]})
+    monkeypatch.setattr(dashboards, "fetch_items", lambda items: [(good, None), (None, TimeoutError("slow"))])
+    result = dashboards._refresh("desk")
+    assert result["errors"] == ["FX: slow"] and not result["saved"]
+    pd.testing.assert_frame_equal(dashboards.load_dashboard("desk")["data"], _snapshot())
+
+    fut = dashboards.refresh_in_background("desk")
+    fut.result()
+    assert dashboards.refresh_status("desk").startswith("failed, previous snapshot kept: FX: slow")
+
+def test_mock_fallback_frames_are_marked():
+    assert is_mock(xa._mock_ts(name="x"))
+    assert not is_mock(_snapshot())
+
+def test_names_that_slugify_alike_get_separate_files(dash_dir):
+    dashboards.save_dashboard("a b", [{"label": "one"}], {})
+    dashboards.save_dashboard("a_b", [{"label": "two"}], {})
+    assert dashboards.load_dashboard("a b")["items"] == [{"label": "one"}]
+    assert dashboards.load_dashboard("a_b")["items"] == [{"label": "two"}]
+    assert sorted(dashboards.list_dashboards()) == ["a b", "a_b"]
+
@@ -0,0 +1,85 @@
+import time
+
+import pandas as pd
+import pytest
+
+from modules import disk_cache
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(disk_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(disk_cache, "_index", None)
+    monkeypatch.setattr(disk_cache, "_ENABLED", True)
+    return tmp_path
+
+class Upstream:
+    """fetch(start, end) over business days up to `published`, recording each call."""
+
+    def __init__(self, published: str):
+        self.published = published
+        self.calls = []
+
+    def __call__(self, start, end):
+        self.calls.append((start, end))
+        dates = pd.bdate_range(start or "2024-01-01", min(end, self.published))
+        return pd.DataFrame({"date": dates, "v": range(len(dates))})
+
+def _today(offset=0):
+    return (pd.Timestamp.today().normalize() + pd.Timedelta(days=offset)).strftime("%Y-%m-%d")
+
+def _entry():
+    (entry,) = disk_cache._load_index().values()
+    return entry
+
+def test_open_tail_is_served_until_it_expires(cache):
+    up = Upstream(_today())
+    start = _today(-30)
+    disk_cache.get_range("t", {"s": "X"}, start, None, up)
+    disk_cache.get_range("t", {"s": "X"}, start, None, up)
+    assert len(up.calls) == 1
+    assert _entry()["fetched_at"] <= time.time() < _entry()["fresh_until"]
+
+    _entry()["fresh_until"] = time.time() - 1
+    disk_cache.get_range("t", {"s": "X"}, start, None, up)
+    assert up.calls[-1] == (_today(), _today())  # only the open last day again
+
+def test_ttl_drives_the_tail_refresh_within_the_day(cache):
+    up = Upstream(_today())
+    start = _today(-30)
+    disk_cache.get_range("t", {"s": "X"}, start, None, up, ttl=lambda df: 0)
+    disk_cache.get_range("t", {"s": "X"}, start, None, up, ttl=lambda df: 0)
+    assert len(up.calls) == 2
+
+    disk_cache.get_range("t", {"s": "X"}, start, None, up, ttl=lambda df: 3600)
+    disk_cache.get_range("t", {"s": "X"}, start, None, up, ttl=lambda df: 3600)
+    assert len(up.calls) == 3
+
+def test_closed_ranges_are_not_refetched(cache):
+    up = Upstream(_today())
+    disk_cache.get_range("t", {"s": "X"}, "2024-01-01", "2024-03-29", up, ttl=lambda df: 0)
+    disk_cache.get_range("t", {"s": "X"}, "2024-01-01", "2024-03-29", up, ttl=lambda df: 0)
+    assert len(up.calls) == 1
+    disk_cache.get_range("t", {"s": "X"}, "2024-01-01", "2024-04-30", up)
+    assert up.calls[-1] == ("2024-03-29", "2024-04-30")
+
+def test_non_incremental_entries_expire(cache):
+    up = Upstream(_today())
+    start = _today(-30)
+    disk_cache.get_range("t", {"s": "X"}, start, None, up, incremental=False)
+    disk_cache.get_range("t", {"s": "X"}, start, None, up, incremental=False)
+    assert len(up.calls) == 1
+
+    _entry()["fresh_until"] = time.time() - 1
+    df = disk_cache.get_range("t", {"s": "X"}, start, None, up, incremental=False)
+    assert up.calls == [(start, _today())] * 2 and not df.empty
+
+def test_a_failed_refresh_serves_the_cached_frame(cache):
+    up = Upstream(_today())
+    start = _today(-30)
+    first = disk_cache.get_range("t", {"s": "X"}, start, None, up, incremental=False)
+    _entry()["fresh_until"] = time.time() - 1
+
+    def down(start, end):
+        raise ConnectionError("down")
+    again = disk_cache.get_range("t", {"s": "X"}, start, None, down, incremental=False)
+    pd.testing.assert_frame_equal(again, first)
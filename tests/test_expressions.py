@@ -0,0 +1,92 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import expressions
+from modules.expressions import ExpressionError, apply_derived, compile_expression
+
+def _frame(n=300):
+    return pd.DataFrame({"date": pd.bdate_range("2024-01-01", periods=n),
+                         "A": np.arange(n, dtype="float64") + 1,
+                         "B x": np.full(n, 2.0)})
+
+def _eval(text, frame=None):
+    return compile_expression(text).evaluate(_frame() if frame is None else frame)
+
+# === Evaluation ===
+@pytest.mark.parametrize("text, expected", [
+    ("A + 1", 301.0),
+    ("`B x` * A - A", 300.0),
+    ("A ** 2", 90000.0),
+    ("2 ** -1 * A", 150.0),
+    ("-A + -2", -302.0),
+    ("A / `B x` * 100", 15000.0),
+    ("shift(A, 2)", 298.0),
+    ("diff(A)", 1.0),
+    ("rolling_mean(A, 5)", 298.0),
+])
+def test_last_value(text, expected):
+    assert _eval(text).iloc[-1] == pytest.approx(expected)
+
+def test_period_and_date_arguments():
+    frame = _frame()
+    rebased = _eval('rebase(A, 100, "2024-01-03")', frame)
+    assert rebased[frame["date"] == "2024-01-03"].iloc[0] == pytest.approx(100.0)
+    monthly = _eval('pct_change(A, "1m")', frame)
+    assert np.isnan(monthly.iloc[0]) and monthly.iloc[-1] > 0
+
+def test_division_by_zero_and_overflow_are_gaps():
+    assert _eval("A / 0").isna().all()
+    assert _eval("`B x` ** (A * 10)").isna().iloc[-1]
+
+def test_constants_fold_to_float_at_compile_time():
+    expr = compile_expression("A * (2 + 3) ** 2")
+    assert expr.refs == ["A"]
+    assert _eval("A * (2 + 3) ** 2").iloc[0] == 25.0
+
+@pytest.mark.parametrize("text", ["A + 0 * 9**9**8", "A ** 9**9**8", "A * 10**10**10**10"])
+def test_huge_powers_return_quickly(text):
+    t0 = time.monotonic()
+    out = _eval(text)
+    assert time.monotonic() - t0 < 1
+    assert out.dtype == "float64" and len(out) == 300
+
+def test_derived_series_build_on_each_other():
+    frame, errors = apply_derived(_frame(), [{"label": "D", "expr": "A - `B x`"},
+                                             {"label": "E", "expr": "D * 2"}])
+    assert not errors
+    assert frame["E"].iloc[0] == -2.0
+
+# === Rejection ===
+@pytest.mark.parametrize("text, message", [
+    ("A + 'x'", "only allowed as a period or date"),
+    ('shift("1m", A)', "only allowed as a period or date"),
+    ('rebase(A, "100")', "only allowed as a period or date"),
+    ('log("x")', "only allowed as a period or date"),
+    ("3 + 4", "at least one series"),
+    ("1" + "0" * 400 + " + A", "number too large"),
+    ("A.__class__", "unsupported syntax"),
+    ("__import__('os')", "unknown function"),
+    ("rolling_mean(A, window=5)", "positional only"),
+    ("rolling_mean(A)", "takes 2 arguments"),
+    ("A if A else A", "unsupported syntax"),
+    ("True + A", "unsupported syntax"),
+    ("`A", "unbalanced backtick"),
+    ("A +", "syntax error"),
+    ("-" * 1990 + "A", "nested too deeply"),
+])
+def test_rejected(text, message):
+    with pytest.raises(ExpressionError, match=message):
+        compile_expression(text)
+
+def test_bad_period_and_unknown_series_fail_at_evaluation():
+    with pytest.raises(ExpressionError, match="bad period"):
+        _eval('shift(A, "soon")')
+    _, errors = apply_derived(_frame(), [{"label": "D", "expr": "Z + 1"}, {"label": "A", "expr": "A * 2"}])
+    assert errors == ["D: unknown series: Z", "A: label 'A' is already on the chart"]
+
+def test_compiled_expressions_are_cached(monkeypatch):
+    monkeypatch.setattr(expressions, "_compiled", {})
+    assert compile_expression(" A + 1 ") is compile_expression("A + 1")
@@ -0,0 +1,62 @@
+import time
+
+import pandas as pd
+import pytest
+
+from bench import mock_server
+from modules import disk_cache, freshness, http_client
+from modules import vanda_track_api as vt
+from modules.fetch import fetch_item
+
+def _day(offset=0):
+    return (pd.Timestamp.today().normalize() + pd.Timedelta(days=offset)).strftime("%Y-%m-%d")
+
+@pytest.fixture
+def warm(apis, tmp_path, monkeypatch):
+    """Disk cache on (memo off), usage in a temp file, upstream requests counted."""
+    monkeypatch.setattr(disk_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(disk_cache, "_index", None)
+    monkeypatch.setattr(disk_cache, "_ENABLED", True)
+    monkeypatch.setattr(freshness, "USAGE_PATH", str(tmp_path / "usage.json"))
+    monkeypatch.setattr(freshness, "_usage", {})
+    monkeypatch.setattr(freshness, "PREFETCH_GIVE_UP_S", 30 * 86400.0)
+    sent = []
+    real_get = http_client.get
+    monkeypatch.setattr(http_client, "get", lambda url, params=None, **kw: sent.append(params) or real_get(url, params, **kw))
+    return sent
+
+def test_open_ended_item_is_moved_to_today_and_closed_one_is_not():
+    used = time.time() - 10 * 86400
+    item = {"api": "vandatrack", "endpoint": "retail", "ticker": "AAPL", "from": "2024-01-01", "to": _day(-10)}
+    assert freshness._as_of_today({"item": item, "used_at": used})["to"] == _day()
+    closed = dict(item, to="2024-06-28")
+    assert freshness._as_of_today({"item": closed, "used_at": used}) == closed
+
+def test_due_item_fetches_today_and_updates_the_cache(warm, monkeypatch):
+    # Used ten days ago with a range ending that day; data has been published since
+    used_day = _day(-10)
+    monkeypatch.setattr(mock_server, "HISTORY_END", used_day)
+    item = {"api": "vandatrack", "endpoint": "retail", "ticker": "AAPL", "type": "net",
+            "from": _day(-60), "to": used_day, "label": "AAPL"}
+    fetch_item(item)
+    (entry,) = freshness._load_usage().values()
+    entry["used_at"] = entry["fetched_at"] = time.time() - 10 * 86400
+    recorded_last = entry["last_date"]
+    assert freshness.due(entry)
+
+    monkeypatch.setattr(mock_server, "HISTORY_END", _day())
+    sent = warm
+    sent.clear()
+    pre = freshness.Prefetcher(workers=1)
+    assert pre.run_once() == 1
+    pre._pool.shutdown(wait=True)
+    assert pre.warmed == 1 and pre.failed == 0
+    assert [p["to_date"] for p in sent] == [_day()]
+
+    # The usage entry that was due is the one updated, so due() stops firing
+    assert entry["last_date"] > recorded_last and not freshness.due(entry)
+    # Today's request is now served from the cache
+    sent.clear()
+    df = vt.retail_flow("AAPL", "net", from_date=_day(-60), to_date=_day(), label="AAPL")
+    assert not sent
+    assert df["date"].max() == pd.Timestamp(entry["last_date"])
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from modules import catalog, http_client, rate_limit, series_cache, sharding
+from modules import vanda_xasset_api as xa
+
+def _drain(bucket: rate_limit.TokenBucket):
+    bucket.tokens = 0.0
+    bucket._updated = time.monotonic()
+
+def test_interactive_waiters_go_before_background():
+    bucket = rate_limit.TokenBucket(rate=20, burst=1)
+    _drain(bucket)
+    bucket.tokens = -1.0  # the first token comes only once every waiter is queued
+    order = []
+
+    def wait(name, priority):
+        bucket.acquire(priority=priority, max_wait=5)
+        order.append(name)
+
+    threads = [threading.Thread(target=wait, args=(f"bg{i}", 1)) for i in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.02)
+    fg = threading.Thread(target=wait, args=("fg", 0))
+    fg.start()
+    for t in threads + [fg]:
+        t.join(5)
+    assert order[0] == "fg"
+    assert sorted(order[1:]) == ["bg0", "bg1", "bg2"]
+
+def test_penalty_is_a_floor_not_a_sum():
+    bucket = rate_limit.TokenBucket(rate=10, burst=10)
+    for _ in range(3):
+        bucket.penalize(20)
+    assert bucket.tokens == pytest.approx(-200, abs=1)  # 20 s of budget, not 60
+    assert bucket.stats["upstream_429"] == 3
+
+def test_penalty_does_not_shorten_a_longer_one():
+    bucket = rate_limit.TokenBucket(rate=10, burst=10)
+    bucket.penalize(30)
+    bucket.penalize(5)
+    assert bucket.tokens == pytest.approx(-300, abs=1)
+
+def test_full_queue_and_long_waits_fail_fast(monkeypatch):
+    monkeypatch.setattr(rate_limit, "MAX_QUEUE", 0)
+    bucket = rate_limit.TokenBucket(rate=1, burst=1)
+    _drain(bucket)
+    with pytest.raises(rate_limit.RateLimited, match="queue full"):
+        bucket.acquire(max_wait=1)
+
+    monkeypatch.setattr(rate_limit, "MAX_QUEUE", 8)
+    bucket.penalize(60)
+    t0 = time.monotonic()
+    with pytest.raises(rate_limit.RateLimited, match="within"):
+        bucket.acquire(max_wait=0.05)
+    assert time.monotonic() - t0 < 1
+    assert not bucket._waiters and bucket.stats["rejected"] == 2
+
+def test_async_acquire_waits_for_a_token():
+    bucket = rate_limit.TokenBucket(rate=50, burst=1)
+    _drain(bucket)
+    waited = asyncio.run(bucket.acquire_async(max_wait=2))
+    assert 0 < waited < 1
+
+# === Upstream that keeps answering 429 ===
+class _TooMany(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(429)
+        self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def throttled_api(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TooMany)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(xa, "BASE", base)
+    monkeypatch.setattr(xa, "_API_KEY", "test")
+    monkeypatch.setattr(http_client, "MAX_RETRIES", 1)
+    monkeypatch.setattr(rate_limit, "_ENABLED", False)
+    monkeypatch.setattr(series_cache, "_ENABLED", False)
+    monkeypatch.setattr(sharding, "SHARD_UNIT", "")
+    yield base
+    server.shutdown()
+
+def test_persistent_429_raises_instead_of_returning(throttled_api):
+    with pytest.raises(rate_limit.RateLimited, match="429"):
+        http_client.get(f"{throttled_api}/timeseries")
+    with pytest.raises(rate_limit.RateLimited, match="429"):
+        asyncio.run(http_client.aget(f"{throttled_api}/timeseries"))
+
+def test_persistent_429_is_not_charted_as_mock_data(throttled_api):
+    with pytest.raises(rate_limit.RateLimited):
+        xa.timeseries("BENCHEQU000000", start_date="2024-01-01", end_date="2024-03-29")
+    with pytest.raises(rate_limit.RateLimited):
+        xa.filter_list()
+    with pytest.raises(rate_limit.RateLimited):
+        xa.field_mappings()
+    with pytest.raises(rate_limit.RateLimited):
+        asyncio.run(xa.field_mappings_async())
+
+def test_catalog_and_field_index_survive_a_persistent_429(throttled_api, monkeypatch):
+    monkeypatch.setattr(xa, "_field_index", {"SPX": ["net_flow"]})
+    assert xa.field_index(force=True) == {"SPX": ["net_flow"]}
+    idx = catalog.build_index(include_live=True)
+    assert len(idx.df) == len(catalog.load_mapping())
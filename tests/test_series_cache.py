@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from modules import series_cache
+
+@pytest.fixture
+def memo(monkeypatch):
+    monkeypatch.setattr(series_cache, "_ENABLED", True)
+    series_cache.clear()
+    yield
+    series_cache.clear()
+
+def _coalesced(load, callers=4):
+    """Run get_or_load from several threads while the first load is held open."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return load()
+
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(series_cache.get_or_load("t", {"k": 1}, slow))
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    deadline = time.monotonic() + 5
+    while series_cache.stats()["coalesced"] < callers - 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+    return results, errors
+
+def test_waiters_share_the_leaders_frame(memo):
+    series_cache.reset_stats()
+    results, errors = _coalesced(lambda: pd.DataFrame({"v": [1.0]}))
+    assert not errors and len(results) == 4
+    assert all(r["v"].tolist() == [1.0] for r in results)
+
+def test_waiters_get_none_when_the_loader_returns_none(memo):
+    series_cache.reset_stats()
+    results, errors = _coalesced(lambda: None)
+    assert not errors and results == [None] * 4
+    assert series_cache.peek("t", {"k": 1}) is None  # nothing kept
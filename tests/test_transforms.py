@@ -0,0 +1,93 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import http_client, transforms
+from modules import vanda_xasset_api as xa
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "fixtures", "transforms", "*.json")))
+
+def _daily(values, start="2024-01-01"):
+    idx = pd.bdate_range(start, periods=len(values))
+    return pd.Series(np.asarray(values, dtype="float64"), index=idx, name="v")
+
+# === Parity with the API's server-side variants (recorded with bench/record_parity.py) ===
+@pytest.mark.parametrize("path", FIXTURES or [None], ids=[os.path.basename(p) for p in FIXTURES] or ["none"])
+def test_local_variant_matches_recorded_api(path, monkeypatch):
+    if path is None:
+        pytest.skip("parity NOT checked: no recorded API responses in tests/fixtures/transforms "
+                    "(python -m bench.record_parity); VANDA_LOCAL_TRANSFORMS stays off until this passes")
+    with open(path, encoding="utf-8") as f:
+        fx = json.load(f)
+    variant = (fx["frequency"], fx["rolling_sum"], fx["z_score"])
+    monkeypatch.setattr(xa, "_fetch_timeseries", lambda params: xa._parse_timeseries(fx["base"], fx["series_id"]))
+    monkeypatch.setattr(xa, "LOCAL_TRANSFORMS", True)
+    local = xa.timeseries(fx["series_id"], fx["field_name"], fx["start_date"], fx["end_date"], "v", *variant)
+
+    monkeypatch.setattr(xa, "LOCAL_TRANSFORMS", False)
+    plan = xa._plan_timeseries(fx["series_id"], fx["field_name"], fx["start_date"], fx["end_date"], *variant)
+    remote = xa._finish_timeseries(xa._parse_timeseries(fx["api"], fx["series_id"]), plan, "v")
+
+    report = transforms.parity_report(local, remote, tol=fx.get("tol", 1e-6))
+    assert report["rows_compared"] > 0
+    assert report["match"], report
+
+# === Server-side variants unless enabled ===
+def test_variants_are_requested_from_the_api_by_default(apis, monkeypatch):
+    monkeypatch.setattr(xa, "LOCAL_TRANSFORMS", False)
+    sent = []
+    real_get = http_client.get
+    monkeypatch.setattr(http_client, "get", lambda url, params=None, **kw: sent.append(params) or real_get(url, params, **kw))
+    xa.timeseries("BENCHEQU000000", start_date="2024-01-01", end_date="2024-06-30", frequency="weekly", z_score="2y")
+    assert [(p.get("frequency"), p.get("z_score")) for p in sent] == [("weekly", "2y")]
+
+def test_local_transforms_are_off_by_default():
+    assert os.getenv("VANDA_LOCAL_TRANSFORMS") or not xa.LOCAL_TRANSFORMS
+
+def test_local_flag_fetches_only_the_base_series(apis, monkeypatch):
+    monkeypatch.setattr(xa, "LOCAL_TRANSFORMS", True)
+    plan = xa._plan_timeseries("S", None, "2024-01-01", "2024-06-30", "weekly", "3m", None)
+    assert plan["local"] and "frequency" not in plan["params"] and "rolling_sum" not in plan["params"]
+    assert pd.Timestamp(plan["start"]) < pd.Timestamp("2024-01-01")  # lookback for the 3m window
+
+# === Local semantics ===
+def test_resample_weekly_takes_the_last_value_of_each_friday_week():
+    s = _daily(range(10))  # Mon 2024-01-01 .. Fri 2024-01-12
+    out = transforms.resample(s, "weekly")
+    assert list(out.index) == [pd.Timestamp("2024-01-05"), pd.Timestamp("2024-01-12")]
+    assert out.tolist() == [4.0, 9.0]
+
+def test_change_is_the_difference_to_the_last_value_on_or_before_the_offset():
+    s = _daily(range(30))
+    out = transforms.change(s, "wow")
+    # 2024-01-08 (Mon, value 5) vs 2024-01-01 (value 0)
+    assert out.loc["2024-01-08"] == 5.0
+    assert np.isnan(out.iloc[0])
+
+def test_rolling_sum_covers_the_trailing_window():
+    s = _daily([1.0] * 60)
+    out = transforms.rolling(s, "1m")
+    feb1 = out.loc["2024-02-01"]
+    assert feb1 == len(pd.bdate_range("2024-01-02", "2024-02-01"))  # (t - 1 month, t]
+
+def test_zscore_all_and_windowed():
+    s = _daily(np.arange(100.0))
+    z = transforms.zscore(s, "all")
+    assert abs(z.mean()) < 1e-12 and abs(z.std() - 1.0) < 1e-12
+    zw = transforms.zscore(s, "2y")
+    assert np.isnan(zw.iloc[0]) and zw.iloc[1:].notna().all()
+
+def test_apply_trims_to_the_requested_range_after_deriving():
+    df = _daily(range(60)).rename_axis("date").reset_index()
+    out = transforms.apply(df, rolling_sum="1m", start_date="2024-02-01", end_date="2024-02-29")
+    assert out["date"].min() == pd.Timestamp("2024-02-01")
+    assert out["date"].max() == pd.Timestamp("2024-02-29")
+    assert out["v"].iloc[0] == transforms.rolling(_daily(range(60)), "1m").loc["2024-02-01"]
+
+def test_lookback_needs_full_history_for_all_years_zscore():
+    assert transforms.lookback(z_score="all") is None
+    assert transforms.lookback("yoy", "12m") >= pd.Timedelta(days=730)